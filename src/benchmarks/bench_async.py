@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares the fan-outs of the tag approach on the sync clients (serial
+GetObjectTagging, fan-out thread pool) against the async pipeline, for
+GET /object (one tag check per object), GET /tenant/objects (one listing
+and tag checks per user) and PUT /objects. Token check and policy
+rendering run for real; AssumeRole, S3 and the async clients are local
+stand-ins with injected latency.
+    python benchmarks/bench_async.py --objects 1000 --users 50 --in-flight 256
+"""
+
+import argparse
+import json
+import os
+
+import bench_env
+from local_s3 import AsyncLocalS3, LocalS3
+
+import apis
+import async_pipeline
+import constants
+import helper
+import token_manager as tkmgr
+
+BUCKET = "{0}-{1}".format(constants.BUCKET_NAME_TAG, os.environ["AWS_ACCOUNT_ID"])
+
+
+def make_event(token, body=None):
+    return {"headers": {"x-token": token},
+            "queryStringParameters": {"partition": "tag"},
+            "body": json.dumps(body) if body is not None else None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=1000,
+                        help="objects of the user and of the PUT batch")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--in-flight", type=int, default=256,
+                        help="ASYNC_MAX_IN_FLIGHT")
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="seconds per S3 request")
+    args = parser.parse_args()
+    os.environ["ASYNC_MAX_IN_FLIGHT"] = str(args.in_flight)
+
+    objects = [("TenantA/user0/obj-{0:06d}.txt".format(index), b"x")
+               for index in range(args.objects)] + \
+              [("TenantA/user{0}/obj-{1:02d}.txt".format(user, index), b"x")
+               for user in range(1, args.users) for index in range(20)]
+    s3_client = LocalS3(latency=args.latency)
+    s3_client.load(BUCKET, objects)
+    async_client = AsyncLocalS3(LocalS3(), latency=args.latency)
+    async_client.s3_client.load(BUCKET, objects)
+
+    helper.get_assumed_role_creds = lambda service_name, policy: {
+        "AccessKeyId": "AKIA", "SecretAccessKey": "", "SessionToken": ""}
+    helper.get_boto3_client = lambda service_name, sts_creds: s3_client
+
+    async def create_client(service_name, sts_creds):
+        return async_client
+
+    token = tkmgr.vend("TenantA", "user0")
+    admin_token = tkmgr.vend("TenantA", "user0", role=constants.ROLE_TENANT_ADMIN)
+    items = [{"key": "new-{0:06d}.txt".format(index), "value": "x" * 256}
+             for index in range(args.objects)]
+    calls = (("GET /object", lambda: apis.get_object(make_event(token), {})),
+             ("GET /tenant/objects",
+              lambda: apis.get_tenant_object(make_event(admin_token), {})),
+             ("PUT /objects",
+              lambda: apis.put_objects(make_event(token, {"items": items}), {})))
+
+    rows = []
+    for name, call in calls:
+        for pipeline, factory in (("sync", None), ("async", create_client)):
+            async_pipeline.set_client_factory(factory)
+            async_client.max_in_flight = 0
+            elapsed, response = bench_env.timed(call)
+            rows.append((name, pipeline, response["statusCode"],
+                         "{0:.2f}".format(elapsed),
+                         async_client.max_in_flight or "-"))
+
+    print("{0} objects, {1} users, {2} fan-out workers, {3} ms per S3 request".format(
+        args.objects, args.users, helper.get_max_workers(), args.latency * 1000))
+    bench_env.print_table(("api", "pipeline", "status", "seconds", "async in flight"),
+                          rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares parse time and peak memory of the previous body parsing
+(replace quotes, json.loads) with request_body.decode_body for JSON,
+base64 binary and raw bodies of 1 KB, 1 MB and 6 MB.
+    python benchmarks/bench_body.py --repeat 5
+"""
+
+import argparse
+import base64
+import gc
+import json
+import time
+import tracemalloc
+
+import bench_env
+
+import request_body
+
+SIZES = (("1 KB", 1 << 10), ("1 MB", 1 << 20), ("6 MB", 6 << 20))
+
+
+def legacy_parse(event):
+    body_json = json.loads(event.get("body").replace("'", "\""))
+    return {"object_key": body_json.get("key", ""),
+            "object_value": body_json.get("value", "")}
+
+
+def build_events(size):
+    text = ("x" * size)
+    binary = bytes(index % 251 for index in range(size))
+    encoded = base64.b64encode(binary).decode("ascii")
+    return (
+        ("json", json.dumps({"key": "object1", "value": text}), False, None),
+        ("base64 binary", encoded, True, "application/octet-stream"),
+        ("raw text", text, False, "text/plain"),
+    )
+
+
+def measure(func, event, repeat):
+    """
+    Returns (best seconds, peak bytes) of func(event)
+        :param func:
+        :param event:
+        :param repeat:
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(event)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    func(event)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for size_name, size in SIZES:
+        for kind, body, is_base64, content_type in build_events(size):
+            event = {"body": body, "isBase64Encoded": is_base64,
+                     "headers": {"content-type": content_type} if content_type else {},
+                     "queryStringParameters": {"key": "object1"}}
+            parsers = [("decode_body", request_body.decode_body)]
+            if kind == "json":
+                parsers.insert(0, ("replace + json.loads", legacy_parse))
+            for name, func in parsers:
+                seconds, peak = measure(func, event, args.repeat)
+                rows.append((size_name, kind, name,
+                             "{0:.3f}".format(seconds * 1e3),
+                             "{0:.2f}".format(peak / size)))
+
+    print("JSON backend: {0}".format("orjson" if request_body.orjson else "json"))
+    bench_env.print_table(("body", "payload", "parser", "ms", "peak / body"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Replays a GET/PUT workload spread over several simulated containers and
+reports hit ratio and lookup latency for each listing cache backend.
+Per-container memory caches only see their own traffic, while the sqlite
+and redis backends are shared by all containers.
+    python benchmarks/bench_cache.py --requests 20000 --containers 16
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import bench_env
+from local_redis import LocalRedisServer
+
+import cache_backends
+from listing_cache import VersionedCache
+
+
+def build_workload(requests, users, put_ratio, containers, seed=7):
+    """
+    Returns (container, operation, user) tuples with Zipf-like user popularity
+    """
+    rnd = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(users)]
+    user_ids = rnd.choices(range(users), weights, k=requests)
+    return [(rnd.randrange(containers),
+             "put" if rnd.random() < put_ratio else "get",
+             {"tenant_id": "tenant{0}".format(user % 10),
+              "user_id": "user{0}".format(user)})
+            for user in user_ids]
+
+
+def replay(workload, caches, listing):
+    lookup_seconds, lookups = 0.0, 0
+    for container, operation, req_header in workload:
+        cache = caches[container]
+        if operation == "put":
+            cache.bump("prefix", req_header)
+            continue
+        start = time.perf_counter()
+        cache.get("prefix", req_header, lambda: listing)
+        lookup_seconds += time.perf_counter() - start
+        lookups += 1
+
+    hits = sum(cache.counters["hits"] for cache in set(caches))
+    misses = sum(cache.counters["misses"] for cache in set(caches))
+    return hits / (hits + misses), lookup_seconds / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--containers", type=int, default=16)
+    parser.add_argument("--put-ratio", type=float, default=0.05)
+    parser.add_argument("--keys", type=int, default=200,
+                        help="object names per cached listing")
+    args = parser.parse_args()
+
+    workload = build_workload(args.requests, args.users, args.put_ratio,
+                              args.containers)
+    listing = ["object-{0:06d}.txt".format(i) for i in range(args.keys)]
+    ttl = 300
+
+    redis_server = LocalRedisServer().start()
+    sqlite_dir = tempfile.mkdtemp()
+
+    backends = (
+        ("memory (per container)",
+         lambda: [VersionedCache(cache_backends.MemoryBackend(64 << 20, ttl), ttl)
+                  for _ in range(args.containers)]),
+        ("sqlite (shared file)",
+         lambda: [VersionedCache(cache_backends.SQLiteBackend(
+             os.path.join(sqlite_dir, "cache.db")), ttl)] * args.containers),
+        ("redis (local stand-in)",
+         lambda: [VersionedCache(cache_backends.RedisBackend(redis_server.url), ttl)]
+         * args.containers),
+    )
+
+    rows = []
+    for name, build in backends:
+        caches = build()
+        hit_ratio, lookup_us = replay(workload, caches, listing)
+        rows.append((name, "{0:.3f}".format(hit_ratio), "{0:.1f}".format(lookup_us)))
+
+    print("{0} requests, {1} users, {2} containers, {3:.0%} PUT".format(
+        args.requests, args.users, args.containers, args.put_ratio))
+    bench_env.print_table(("backend", "hit ratio", "lookup us"), rows)
+    redis_server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
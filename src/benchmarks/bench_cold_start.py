@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Cold-start cost of the token layer: import of token_manager plus the first
+get_header, each run in a fresh interpreter. "lazy" is the layer as
+shipped; "eager" then touches every registered algorithm (and has_crypto),
+which is what get_default_algorithms used to do at import time.
+    python benchmarks/bench_cold_start.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+import bench_env
+
+PROBE = """
+import json, sys, time, tracemalloc
+tracemalloc.start()
+start = time.perf_counter()
+import token_manager
+token_manager.get_header({token_manager.X_TOKEN: token_manager.vend("TenantA", "user1")})
+if sys.argv[1] == "eager":
+    from packages.jwt import algorithms
+    registry = algorithms.get_default_algorithms()
+    [registry[alg] for alg in list(registry)]
+    algorithms.has_crypto
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed,
+                  "bytes": tracemalloc.get_traced_memory()[0],
+                  "modules": len(sys.modules),
+                  "cryptography": "cryptography" in sys.modules}))
+"""
+
+
+def run(mode):
+    output = subprocess.check_output([sys.executable, "-c", PROBE, mode],
+                                     env=dict(os.environ,
+                                              PYTHONPATH=os.pathsep.join(sys.path)))
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    for mode in ("lazy", "eager"):
+        samples = [run(mode) for _ in range(args.runs)]
+        rows.append((mode,
+                     "{0:.1f}".format(statistics.median(s["seconds"] for s in samples) * 1000),
+                     "{0:.0f}".format(statistics.median(s["bytes"] for s in samples) / 1024),
+                     samples[0]["modules"], samples[0]["cryptography"]))
+
+    print("median of {0} fresh interpreters".format(args.runs))
+    bench_env.print_table(("registry", "import+first call ms", "KiB allocated",
+                           "modules", "cryptography loaded"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares memory and throughput of the cached listing representations:
+the list_objects_v2 Contents (list of dicts), the list of names the GET
+APIs used to cache, and compact_listing.CompactListing.
+    python benchmarks/bench_compact_listing.py --keys 200000
+"""
+
+import argparse
+import datetime
+import gc
+import json
+import tracemalloc
+
+import bench_env
+
+import cache_backends
+from compact_listing import CompactListing
+
+PREFIX = "tenanta/user1/"
+
+
+def build_contents(key_count):
+    modified = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+    return [{"Key": "{0}obj-{1:08d}.txt".format(PREFIX, index),
+             "LastModified": modified,
+             "ETag": '"d41d8cd98f00b204e9800998ecf8427e"',
+             "Size": index,
+             "StorageClass": "STANDARD"}
+            for index in range(key_count)]
+
+
+def measure(build):
+    """
+    Returns (bytes held, result) of build() as seen by tracemalloc
+        :param build:
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=1000,
+                        help="names per page for the pagination timing")
+    args = parser.parse_args()
+
+    representations = (
+        ("list of dicts", lambda: build_contents(args.keys),
+         lambda value: json.dumps([obj["Key"].rsplit("/", 1)[-1] for obj in value]),
+         lambda value: json.dumps([obj["Key"].rsplit("/", 1)[-1]
+                                   for obj in value[:args.page]]),
+         lambda value, key: any(obj["Key"] == key for obj in value)),
+        ("list of names", lambda: [obj["Key"].rsplit("/", 1)[-1]
+                                   for obj in build_contents(args.keys)],
+         json.dumps,
+         lambda value: json.dumps(value[:args.page]),
+         lambda value, key: key[len(PREFIX):] in value),
+        ("CompactListing", lambda: CompactListing.from_objects(build_contents(args.keys)),
+         lambda value: value.names_json(),
+         lambda value: value[:args.page].names_json(),
+         lambda value, key: key in value),
+        ("CompactListing+sizes",
+         lambda: CompactListing.from_objects(build_contents(args.keys), True, True),
+         lambda value: value.names_json(),
+         lambda value: value[:args.page].names_json(),
+         lambda value, key: key in value),
+    )
+
+    rows = []
+    expected = None
+    last_key = "{0}obj-{1:08d}.txt".format(PREFIX, args.keys - 1)
+    for name, build, respond, paginate, contains in representations:
+        held, value = measure(build)
+        build_seconds, _ = bench_env.timed(build)
+        respond_seconds, body = bench_env.timed(respond, value)
+        names = json.loads(body)
+        expected = expected or names
+        page_seconds, _ = bench_env.timed(paginate, value)
+        lookup_seconds, found = bench_env.timed(contains, value, last_key)
+        cached = cache_backends.serialize(value) if not isinstance(value, list) \
+            or isinstance(value[0], str) else None
+        rows.append((name, "{0:.1f}".format(held / 2 ** 20),
+                     "{0:.0f}".format(held / args.keys),
+                     "{0:.3f}".format(build_seconds),
+                     "{0:.1f}".format(respond_seconds * 1000),
+                     "{0:.3f}".format(page_seconds * 1000),
+                     "{0:.1f}".format(lookup_seconds * 1e6),
+                     "{0:.1f}".format(len(cached) / 2 ** 20) if cached else "-",
+                     names == expected and found))
+        del value
+
+    print("{0} keys under {1}".format(args.keys, PREFIX))
+    bench_env.print_table(("representation", "MiB", "B/key", "build s", "body ms",
+                           "page ms", "lookup us", "shared MiB", "correct"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares reading objects of 10 MiB to 1 GiB with one GET stream against
+download_engine ranged reads, into one buffer (read_all) and streamed in
+order (iter_chunks), on a local S3 with per-connection bandwidth shaping.
+    python benchmarks/bench_download.py --sizes 10,100,1000 --bandwidth 80
+"""
+
+import argparse
+
+import bench_env
+from local_s3 import LocalS3
+
+import download_engine
+
+BUCKET = "aws-saas-s3-prefix-123456789012"
+
+
+def single_get(s3_client, key):
+    return len(s3_client.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+
+
+def ranged_read_all(s3_client, key, args):
+    return len(download_engine.RangedDownload(
+        s3_client, BUCKET, key, part_size=args.part_size << 20,
+        max_workers=args.workers).read_all())
+
+
+def ranged_iter_chunks(s3_client, key, args):
+    return sum(len(chunk) for chunk in download_engine.RangedDownload(
+        s3_client, BUCKET, key, part_size=args.part_size << 20,
+        max_workers=args.workers).iter_chunks())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000", help="MiB, comma separated")
+    parser.add_argument("--part-size", type=int, default=8, help="MiB")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--bandwidth", type=float, default=80.0,
+                        help="MiB/s per connection")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds per S3 request")
+    args = parser.parse_args()
+
+    s3_client = LocalS3(latency=args.latency, bandwidth=args.bandwidth * (1 << 20))
+    rows = []
+    for size in (int(size) for size in args.sizes.split(",")):
+        key = "TenantA/user1/object-{0}".format(size)
+        s3_client.load(BUCKET, [(key, bytes(size << 20))])
+        for name, func in (("single GET", lambda: single_get(s3_client, key)),
+                           ("read_all", lambda: ranged_read_all(s3_client, key, args)),
+                           ("iter_chunks", lambda: ranged_iter_chunks(s3_client, key, args))):
+            seconds, length = bench_env.timed(func)
+            assert length == size << 20
+            rows.append(("{0} MiB".format(size), name, "{0:.2f}".format(seconds),
+                         "{0:.0f}".format(size / seconds)))
+        s3_client.load(BUCKET, [(key, b"")])
+
+    print("{0} workers, {1} MiB parts, {2:.0f} MiB/s per connection".format(
+        args.workers, args.part_size, args.bandwidth))
+    bench_env.print_table(("object", "read", "s", "MiB/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
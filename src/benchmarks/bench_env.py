@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Puts the Lambda sources and layers on sys.path and provides placeholder
+environment variables so that benchmarks can import the modules locally
+"""
+
+import os
+import sys
+import time
+from os.path import abspath, dirname, join
+
+SRC_DIR = dirname(dirname(abspath(__file__)))
+LAYER_SITE_PACKAGES = join("python", "lib", "python3.7", "site-packages")
+
+for path in (join(SRC_DIR, "s3_manager", "src"),
+             join(SRC_DIR, "layers", "token_manager", LAYER_SITE_PACKAGES),
+             join(SRC_DIR, "layers", "policy_manager", LAYER_SITE_PACKAGES),
+             dirname(abspath(__file__))):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+for name, value in (("AWS_ACCOUNT_ID", "123456789012"),
+                    ("AWS_REGION", "us-east-1"),
+                    ("NOSQL_DBTABLE_NAME", "aws-saas-s3-tenantmd"),
+                    ("IAMROLE_LMDEXEC_ARN",
+                     "arn:aws:iam::123456789012:role/aws-saas-s3-lambdaexec")):
+    os.environ.setdefault(name, value)
+
+
+def timed(func, *args, **kwargs):
+    """
+    Returns (elapsed seconds, result) of a single call
+        :param func:
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def print_table(header, rows):
+    """
+    Prints rows as a fixed width table
+        :param header:
+        :param rows:
+    """
+    widths = [max(len(str(cell)) for cell in column)
+              for column in zip(header, *rows)]
+    for row in [header] + list(rows):
+        print("  ".join(str(cell).ljust(width)
+                        for cell, width in zip(row, widths)))
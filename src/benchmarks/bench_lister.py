@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares the sequential paginator with lister.list_objects on a local
+S3 stand-in with injected per-request latency.
+    python benchmarks/bench_lister.py --keys 200000 --latency 0.02
+"""
+
+import argparse
+
+import bench_env
+from local_s3 import LocalS3
+
+import helper
+import lister
+
+BUCKET = "aws-saas-s3-prefix-123456789012"
+PREFIX = "tenanta/user1"
+
+
+def populate(s3_client, key_count, folders):
+    items = []
+    for index in range(key_count):
+        if folders:
+            key = "{0}/{1:03d}/obj-{2:08d}.txt".format(PREFIX, index % folders, index)
+        else:
+            key = "{0}/obj-{1:08d}.txt".format(PREFIX, index)
+        items.append((key, b""))
+    s3_client.load(BUCKET, items)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--folders", type=int, default=32,
+                        help="sub-prefixes per user for the delimiter split")
+    args = parser.parse_args()
+
+    rows = []
+    for folders in (0, args.folders):
+        s3_client = LocalS3(latency=args.latency)
+        populate(s3_client, args.keys, folders)
+        layout = "{0} folders".format(folders) if folders else "flat"
+
+        candidates = (
+            ("sequential", lambda: helper.list_objects(s3_client, BUCKET, PREFIX)),
+            ("start_after", lambda: lister.list_objects(
+                s3_client, BUCKET, PREFIX, lister.SPLIT_START_AFTER, args.workers)),
+            ("delimiter", lambda: lister.list_objects(
+                s3_client, BUCKET, PREFIX, lister.SPLIT_DELIMITER, args.workers)),
+        )
+        expected = None
+        for name, func in candidates:
+            s3_client.requests.clear()
+            elapsed, contents = bench_env.timed(func)
+            keys = [obj["Key"] for obj in contents]
+            expected = expected or keys
+            rows.append((layout, name, len(keys), keys == expected,
+                         sum(s3_client.requests.values()),
+                         "{0:.2f}".format(elapsed)))
+
+    bench_env.print_table(("layout", "lister", "keys", "ordered", "requests", "seconds"),
+                          rows)
+
+
+if __name__ == "__main__":
+    main()
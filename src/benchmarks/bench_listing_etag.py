@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Measures a client polling an unchanged cached listing: the full 200
+response against the 304 returned for a matching If-None-Match, and the
+cost the digest adds to building the listing.
+    python benchmarks/bench_listing_etag.py --keys 10000 --polls 2000
+"""
+
+import argparse
+import datetime
+
+import bench_env
+
+import helper
+from compact_listing import CompactListing, digest_objects
+
+PREFIX = "tenanta/user1/"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--polls", type=int, default=2000)
+    args = parser.parse_args()
+
+    modified = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+    contents = [{"Key": "{0}obj-{1:08d}.txt".format(PREFIX, index),
+                 "LastModified": modified, "Size": index,
+                 "ETag": '"{0:032x}"'.format(index)} for index in range(args.keys)]
+    build_seconds, listing = bench_env.timed(CompactListing.from_objects, contents)
+    digest_seconds, _ = bench_env.timed(digest_objects, contents)
+
+    etag = helper.get_listing_etag(listing)
+    rows = []
+    for name, if_none_match in (("no If-None-Match", None), ("matching ETag", etag)):
+        req_header = {"if_none_match": if_none_match}
+        elapsed, responses = bench_env.timed(lambda: [
+            helper.listing_response(listing, req_header) for _ in range(args.polls)])
+        rows.append((name, responses[0]["statusCode"],
+                     "{0:.1f}".format(elapsed / args.polls * 1e6),
+                     len(responses[0]["body"])))
+
+    print("{0} keys: from_objects {1:.1f} ms, of which digest {2:.1f} ms".format(
+        args.keys, build_seconds * 1000, digest_seconds * 1000))
+    bench_env.print_table(("poll", "status", "us/poll", "body bytes"), rows)
+
+
+if __name__ == "__main__":
+    main()
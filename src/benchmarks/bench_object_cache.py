@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Replays skewed content reads of a hot set of objects through
+helper.object_content_response without and with the /tmp object cache,
+on a local S3 with request latency and per-connection bandwidth.
+    python benchmarks/bench_object_cache.py --objects 40 --size 1024 --cache 16
+"""
+
+import argparse
+import os
+import random
+import tempfile
+
+import bench_env
+from local_s3 import LocalS3
+
+import helper
+import object_cache
+
+BUCKET = "aws-saas-s3-prefix-123456789012"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=400)
+    parser.add_argument("--objects", type=int, default=40)
+    parser.add_argument("--size", type=int, default=1024, help="KiB per object")
+    parser.add_argument("--cache", type=int, default=16, help="MiB of /tmp")
+    parser.add_argument("--bandwidth", type=float, default=80.0,
+                        help="MiB/s per connection")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds per S3 request")
+    args = parser.parse_args()
+
+    s3_client = LocalS3(latency=args.latency, bandwidth=args.bandwidth * (1 << 20))
+    keys = ["TenantA/user1/object-{0}".format(index) for index in range(args.objects)]
+    s3_client.load(BUCKET, [(key, bytes([index % 256]) * (args.size << 10))
+                            for index, key in enumerate(keys)])
+    # Zipf-like popularity: the n-th object is read 1/n as often as the first
+    rnd = random.Random(7)
+    reads = rnd.choices(keys, weights=[1.0 / rank for rank in range(1, len(keys) + 1)],
+                        k=args.reads)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, max_bytes in (("uncached", 0), ("cached", args.cache << 20)):
+            object_cache._STATE.update({
+                "cache": object_cache.ObjectCache(directory, max_bytes, max_bytes or 1),
+                "pid": os.getpid()})
+            elapsed, _ = bench_env.timed(lambda: [
+                helper.object_content_response(s3_client, BUCKET, key) for key in reads])
+            stats = object_cache.stats()
+            rows.append((name, "{0:.2f}".format(elapsed),
+                         "{0:.1f}".format(elapsed / args.reads * 1000),
+                         "{0:.2f}".format(stats["hit_ratio"]),
+                         "{0:.0f}".format(stats["bytes_saved"] / (1 << 20)),
+                         stats["evictions"]))
+
+    print("{0} reads of {1} x {2} KiB objects, {3} MiB cache".format(
+        args.reads, args.objects, args.size, args.cache))
+    bench_env.print_table(("reads", "s", "ms/read", "hit ratio", "MiB saved", "evictions"),
+                          rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares presigning a batch of download URLs with boto3
+generate_presigned_url (s3v4) against presigner.Presigner, and the
+response size of the URLs against returning the object contents.
+    python benchmarks/bench_presign.py --objects 10000 --size 65536
+"""
+
+import argparse
+import json
+
+import bench_env
+
+import boto3
+from botocore.config import Config
+
+import presigner
+
+BUCKET = "aws-saas-s3-prefix-123456789012"
+CREDS = {"AccessKeyId": "AKIDEXAMPLE",
+         "SecretAccessKey": "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+         "SessionToken": "x" * 700}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=10000)
+    parser.add_argument("--size", type=int, default=65536,
+                        help="bytes per object for the response size comparison")
+    args = parser.parse_args()
+
+    keys = [("object{0}.txt".format(index), "TenantA/user1/object{0}.txt".format(index))
+            for index in range(args.objects)]
+    s3_client = boto3.client("s3", region_name="us-east-1",
+                             aws_access_key_id=CREDS["AccessKeyId"],
+                             aws_secret_access_key=CREDS["SecretAccessKey"],
+                             aws_session_token=CREDS["SessionToken"],
+                             config=Config(signature_version="s3v4",
+                                           s3={"addressing_style": "virtual"}))
+
+    def boto3_presign():
+        return [{"key": name,
+                 "url": s3_client.generate_presigned_url(
+                     "get_object", Params={"Bucket": BUCKET, "Key": key_name},
+                     ExpiresIn=300)}
+                for name, key_name in keys]
+
+    def local_presign():
+        return presigner.Presigner(CREDS, "us-east-1", 300).presign_all(
+            "GET", BUCKET, keys)
+
+    rows = []
+    for name, func in (("boto3 generate_presigned_url", boto3_presign),
+                       ("Presigner.presign_all", local_presign)):
+        seconds, urls = bench_env.timed(func)
+        rows.append((name, "{0:.3f}".format(seconds),
+                     "{0:.0f}".format(args.objects / seconds),
+                     "{0:.1f}".format(len(json.dumps(urls)) / 1024 / 1024)))
+    bench_env.print_table(("signer", "s", "urls / s", "response MB"), rows)
+    print("Contents of {0} objects of {1} bytes: {2:.1f} MB".format(
+        args.objects, args.size, args.objects * args.size / 1024 / 1024))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares uploading small objects with one PUT /object request each
+against PUT /objects batches. Token check and policy rendering run for
+real; AssumeRole and S3 are local stand-ins with injected latency.
+    python benchmarks/bench_put_batch.py --objects 1000 --batch 500
+"""
+
+import argparse
+import json
+import time
+
+import bench_env
+from local_s3 import LocalS3
+
+import apis
+import helper
+import token_manager as tkmgr
+
+BUCKET = "aws-saas-s3-prefix-123456789012"
+
+
+def make_event(token, body):
+    return {"headers": {"x-token": token},
+            "queryStringParameters": {"partition": "prefix"},
+            "body": json.dumps(body)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--objects", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="seconds per S3 request")
+    parser.add_argument("--sts-latency", type=float, default=0.05,
+                        help="seconds per AssumeRole")
+    args = parser.parse_args()
+
+    s3_client = LocalS3(latency=args.latency)
+    s3_client.create_bucket(Bucket=BUCKET)
+    assume_roles = []
+
+    def get_assumed_role_creds(service_name, policy):
+        assume_roles.append(service_name)
+        time.sleep(args.sts_latency)
+        return {"AccessKeyId": "", "SecretAccessKey": "", "SessionToken": ""}
+
+    helper.get_assumed_role_creds = get_assumed_role_creds
+    helper.get_boto3_client = lambda service_name, sts_creds: s3_client
+
+    token = tkmgr.vend("TenantA", "user1")
+    items = [{"key": "obj-{0:06d}.txt".format(index), "value": "x" * 256}
+             for index in range(args.objects)]
+
+    def one_per_request():
+        return [apis.put_object(make_event(token, item), {})["statusCode"]
+                for item in items]
+
+    def batched():
+        return [apis.put_objects(make_event(token, {"items": items[start:start + args.batch]}),
+                                 {})["statusCode"]
+                for start in range(0, len(items), args.batch)]
+
+    rows = []
+    for name, func in (("PUT /object", one_per_request),
+                       ("PUT /objects", batched)):
+        s3_client.requests.clear()
+        del assume_roles[:]
+        elapsed, statuses = bench_env.timed(func)
+        rows.append((name, len(statuses), len(assume_roles),
+                     sum(s3_client.requests.values()),
+                     "{0:.2f}".format(elapsed),
+                     "{0:.0f}".format(args.objects / elapsed)))
+
+    print("{0} objects, batches of {1}, {2} fan-out workers".format(
+        args.objects, args.batch, helper.get_max_workers()))
+    bench_env.print_table(("api", "requests", "AssumeRole", "S3 calls", "seconds",
+                           "objects/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
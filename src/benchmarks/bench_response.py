@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Measures response size and encoding time of a 10k-key listing for each
+serialization and content coding, and the size of a PUT response before
+and after projection.
+    python benchmarks/bench_response.py --keys 10000
+"""
+
+import argparse
+import json
+from http import HTTPStatus
+
+import bench_env
+
+import helper
+import response_body
+from compact_listing import CompactListing
+
+PREFIX = "tenanta/user1/"
+# A PutObject response as boto3 returns it
+API_PUT_RESP = {
+    "ResponseMetadata": {
+        "RequestId": "7XK2M0C3H4B9QZ1D",
+        "HostId": "Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4",
+        "HTTPStatusCode": 200,
+        "HTTPHeaders": {
+            "x-amz-id-2": "Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4",
+            "x-amz-request-id": "7XK2M0C3H4B9QZ1D",
+            "date": "Mon, 19 Oct 2026 10:00:00 GMT",
+            "x-amz-server-side-encryption": "AES256",
+            "etag": '"9e3669d19b675bd57058fd4664205d2a"',
+            "server": "AmazonS3",
+            "content-length": "0"
+        },
+        "RetryAttempts": 0
+    },
+    "ETag": '"9e3669d19b675bd57058fd4664205d2a"',
+    "ServerSideEncryption": "AES256"
+}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    contents = [{"Key": "{0}obj-{1:08d}.txt".format(PREFIX, index), "ETag": '"e"'}
+                for index in range(args.keys)]
+    listing = CompactListing.from_objects(contents)
+    names = list(listing.names())
+
+    rows = []
+    cases = (("json.dumps names", lambda: json.dumps({"status": "OK", "result": names})),
+             ("response_body.dumps names",
+              lambda: response_body.dumps({"status": "OK", "result": names})),
+             ("CompactListing", lambda: helper.success_response(listing, HTTPStatus.OK)["body"]))
+    for name, func in cases:
+        elapsed, bodies = bench_env.timed(lambda: [func() for _ in range(args.repeat)])
+        rows.append((name, "identity", "{0:.2f}".format(elapsed / args.repeat * 1000),
+                     len(bodies[0])))
+
+    for coding in response_body.CONTENT_CODINGS:
+        event = {"headers": {"Accept-Encoding": coding}}
+        elapsed, responses = bench_env.timed(lambda: [response_body.encode(
+            helper.success_response(listing, HTTPStatus.OK), event) for _ in range(args.repeat)])
+        rows.append(("CompactListing", coding + " + base64",
+                     "{0:.2f}".format(elapsed / args.repeat * 1000), len(responses[0]["body"])))
+
+    print("{0} keys, JSON backend: {1}".format(
+        args.keys, "orjson" if response_body.orjson else "json"))
+    bench_env.print_table(("listing", "coding", "ms", "body bytes"), rows)
+    print("PUT response body: {0} bytes as returned by boto3, {1} bytes projected".format(
+        len(json.dumps({"status": "Created", "result": API_PUT_RESP})),
+        len(helper.success_response(helper.put_result(API_PUT_RESP))["body"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Memory, check latency and observed false-positive rate of the token
+revocation list for several list sizes and configured FP rates.
+    python benchmarks/bench_revocation.py --checks 100000
+"""
+
+import argparse
+import os
+import random
+
+import bench_env
+
+import token_revocation
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=100000)
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--fp-rates", default="0.01,0.001")
+    args = parser.parse_args()
+
+    rnd = random.Random(7)
+    tokens = ["token-{0:032x}".format(rnd.getrandbits(128)) for _ in range(args.checks)]
+
+    rows = []
+    for size in [int(value) for value in args.sizes.split(",")]:
+        digests = [os.urandom(token_revocation.DIGEST_SIZE) for _ in range(size)]
+        for fp_rate in [float(value) for value in args.fp_rates.split(",")]:
+            revocations = token_revocation.RevocationList(digests, fp_rate=fp_rate,
+                                                          capacity=size)
+            elapsed, _ = bench_env.timed(lambda: [revocations.is_revoked(token)
+                                                  for token in tokens])
+            stats = revocations.stats()
+            rows.append((size, fp_rate, stats["num_hashes"],
+                         "{0:.1f}".format(stats["bloom_bytes"] / 1024),
+                         "{0:.1f}".format(stats["exact_bytes"] / 1024),
+                         "{0:.5f}".format(stats["estimated_fp_rate"]),
+                         "{0:.5f}".format(stats["false_positives"] / stats["checks"]),
+                         "{0:.2f}".format(elapsed / args.checks * 1e6)))
+
+    print("{0} checks of tokens that are not revoked".format(args.checks))
+    bench_env.print_table(("entries", "fp rate", "hashes", "bloom KiB", "exact KiB",
+                           "expected fp", "observed fp", "us/check"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Measures the throughput of the HTTP service mode (server.serve) in
+requests per second and per CPU second of the server processes, for
+GET /object and PUT /object of the prefix approach, with and without
+the session cache. The server runs in a subprocess whose AssumeRole and
+S3 are local stand-ins with injected latency; boto3 clients are still
+constructed for real, so that their cost is part of a cache miss.
+    python benchmarks/bench_server.py --requests 2000 --clients 16 --processes 2
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bench_env
+
+BUCKET = "aws-saas-s3-prefix-123456789012"
+USERS = 20
+
+
+def serve(args):
+    """
+    Runs server.serve with local stand-ins for STS and S3
+        :param args:
+    """
+    import datetime
+
+    from local_s3 import LocalS3
+
+    import helper
+    import server
+
+    s3_client = LocalS3(latency=args.latency)
+    s3_client.load(BUCKET, [("TenantA/user{0}/obj-{1:04d}.txt".format(user, index), b"x")
+                            for user in range(USERS) for index in range(100)])
+
+    def assume_role(policy):
+        time.sleep(args.sts_latency)
+        return {"AccessKeyId": os.urandom(8).hex(), "SecretAccessKey": "s",
+                "SessionToken": "t",
+                "Expiration": datetime.datetime.now(datetime.timezone.utc) +
+                datetime.timedelta(hours=1)}
+
+    create_boto3_client = helper.create_boto3_client
+
+    def create_client(service_name, sts_creds):
+        create_boto3_client(service_name, sts_creds)
+        return s3_client
+
+    helper.assume_role = assume_role
+    helper.create_boto3_client = create_client
+    server.serve("127.0.0.1", args.port, args.threads, args.processes)
+
+
+def cpu_seconds(pid):
+    """
+    Returns user + system CPU seconds of a process and its children
+        :param pid:
+    """
+    ticks = os.sysconf("SC_CLK_TCK")
+    total = 0.0
+    pids = [pid]
+    while pids:
+        current = pids.pop()
+        try:
+            with open("/proc/{0}/stat".format(current)) as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+            total += (int(fields[11]) + int(fields[12])) / ticks
+            with open("/proc/{0}/task/{0}/children".format(current)) as children:
+                pids.extend(int(child) for child in children.read().split())
+        except (IOError, OSError):
+            pass
+    return total
+
+
+def request(port, method, path, headers, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def start_server(args, session_cache_size):
+    env = dict(os.environ, SESSION_CACHE_SIZE=str(session_cache_size))
+    if args.processes > 1:
+        # Processes share the listing cache so that PUTs invalidate all of them
+        env.setdefault("CACHE_BACKEND", "sqlite")
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve",
+                                "--port", str(args.port),
+                                "--threads", str(args.threads),
+                                "--processes", str(args.processes),
+                                "--latency", str(args.latency),
+                                "--sts-latency", str(args.sts_latency)],
+                               env=env, stdout=subprocess.DEVNULL)
+    for _ in range(200):
+        try:
+            request(args.port, "GET", "/health", {})
+            return process
+        except (IOError, OSError):
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="seconds per S3 request")
+    parser.add_argument("--sts-latency", type=float, default=0.05,
+                        help="seconds per AssumeRole")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args)
+
+    import token_manager as tkmgr
+    tokens = [tkmgr.vend("TenantA", "user{0}".format(user)) for user in range(USERS)]
+    body = json.dumps({"key": "new.txt", "value": "x" * 256})
+    calls = (("GET /object", "GET", None), ("PUT /object", "PUT", body))
+
+    rows = []
+    for cache_name, session_cache_size in (("off", 0), ("on", 1024)):
+        process = start_server(args, session_cache_size)
+        try:
+            for name, method, data in calls:
+                def call(index):
+                    return request(args.port, method, "/object?partition=prefix",
+                                   {"x-token": tokens[index % USERS],
+                                    "Content-Type": "application/json"}, data)
+
+                with ThreadPoolExecutor(max_workers=args.clients) as executor:
+                    # Warms the caches of every user before measuring
+                    list(executor.map(call, range(USERS * args.processes)))
+                    cpu_start = cpu_seconds(process.pid)
+                    elapsed, statuses = bench_env.timed(
+                        lambda: list(executor.map(call, range(args.requests))))
+                    cpu = cpu_seconds(process.pid) - cpu_start
+                errors = sum(1 for status in statuses if status >= 300)
+                rows.append((name, cache_name, errors, "{0:.0f}".format(args.requests / elapsed),
+                             "{0:.1f}".format(cpu), "{0:.0f}".format(args.requests / cpu)))
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+    print("{0} requests from {1} clients, {2} processes x {3} threads, {4} CPUs".format(
+        args.requests, args.clients, args.processes, args.threads, os.cpu_count()))
+    bench_env.print_table(("api", "session cache", "errors", "req/s", "server CPU s",
+                           "req/CPU s"), rows)
+
+
+if __name__ == "__main__":
+    main()
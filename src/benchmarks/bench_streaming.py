@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Measures time to first byte, total time and peak memory of a large
+listing returned buffered (lister + CompactListing, as bucket.get_object
+does on a cache miss) and streamed page by page, on a local S3 with
+request latency.
+    python benchmarks/bench_streaming.py --keys 100000 --latency 0.02
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import bench_env
+from local_s3 import LocalS3
+
+import helper
+import lister
+import response_body
+import streaming
+from compact_listing import CompactListing
+
+BUCKET = "aws-saas-s3-bucket-tenanta-123456789012"
+PREFIX = "user1"
+
+
+def buffered(s3_client):
+    listing = CompactListing.from_objects(lister.list_objects(s3_client, BUCKET, PREFIX))
+    response = helper.listing_response(listing, {})
+    yield response["body"].encode("utf-8")
+
+
+def streamed(s3_client, stream_format, accept_encoding=None):
+    response = streaming.listing_response(streaming.s3_pages(s3_client, BUCKET, PREFIX),
+                                          streaming.object_names, stream_format)
+    response = response_body.encode(response, {"headers": {"Accept-Encoding": accept_encoding}})
+    for chunk in response["body"]:
+        yield chunk
+
+
+def measure(get_chunks):
+    """
+    Returns (seconds to first chunk, total seconds, bytes, peak MiB) of
+    consuming the chunks of get_chunks(). Memory is traced in a second
+    pass, tracing slows the first one down
+        :param get_chunks:
+    """
+    start = time.perf_counter()
+    first_byte, size = None, 0
+    for chunk in get_chunks():
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in get_chunks():
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, size, peak / (1 << 20)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds per S3 request")
+    args = parser.parse_args()
+
+    s3_client = LocalS3(latency=args.latency)
+    s3_client.load(BUCKET, [("{0}/obj-{1:08d}.txt".format(PREFIX, index), b"")
+                            for index in range(args.keys)])
+
+    rows = []
+    for name, chunks in (("buffered", lambda: buffered(s3_client)),
+                         ("stream json", lambda: streamed(s3_client, streaming.STREAM_JSON)),
+                         ("stream ndjson", lambda: streamed(s3_client, streaming.STREAM_NDJSON)),
+                         ("stream ndjson gzip",
+                          lambda: streamed(s3_client, streaming.STREAM_NDJSON, "gzip"))):
+        first_byte, total, size, peak = measure(chunks)
+        rows.append((name, "{0:.0f}".format(first_byte * 1000), "{0:.2f}".format(total),
+                     size, "{0:.1f}".format(peak)))
+
+    print("{0} keys, {1:.0f} ms per list_objects_v2 request".format(
+        args.keys, args.latency * 1000))
+    bench_env.print_table(("listing", "TTFB ms", "total s", "body bytes", "peak MiB"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Measures token_manager.get_header throughput with and without the
+verified-token cache, for a pool of clients replaying their tokens.
+    python benchmarks/bench_token_cache.py --requests 50000 --clients 200
+"""
+
+import argparse
+import random
+
+import bench_env
+
+import token_manager
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--clients", type=int, default=200)
+    args = parser.parse_args()
+
+    tokens = [token_manager.vend("tenant{0}".format(index % 10),
+                                 "user{0}".format(index))
+              for index in range(args.clients)]
+    rnd = random.Random(7)
+    events = [{token_manager.X_TOKEN: rnd.choice(tokens)} for _ in range(args.requests)]
+
+    rows = []
+    baseline = None
+    for name, size in (("uncached", 0), ("cached", token_manager.TOKEN_CACHE_SIZE)):
+        token_manager._TOKEN_CACHE = token_manager.TokenCache(size)
+        elapsed, _ = bench_env.timed(lambda: [token_manager.get_header(event)
+                                              for event in events])
+        rate = args.requests / elapsed
+        baseline = baseline or rate
+        rows.append((name, "{0:.0f}".format(rate),
+                     "{0:.2f}".format(elapsed / args.requests * 1e6),
+                     "{0:.1f}x".format(rate / baseline),
+                     token_manager.token_cache_stats()["hits"]))
+
+    print("{0} requests from {1} clients".format(args.requests, args.clients))
+    bench_env.print_table(("get_header", "tokens/s", "us/token", "speedup", "hits"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Single-core token throughput of the vendored PyJWT path versus the
+specialized HS256 path in the token layer, for verifying and for vending
+single tokens or batches, and keyset verification as the keyset grows.
+The verified-token cache is bypassed so every call verifies.
+    python benchmarks/bench_tokens.py --tokens 20000
+"""
+
+import argparse
+
+import json
+
+import bench_env
+
+import hs256
+import packages.jwt as jwt
+import token_keyset
+import token_manager
+
+SECRET_KEY = "aws-saas-factory"
+
+
+def rate(func, items):
+    elapsed, _ = bench_env.timed(lambda: [func(item) for item in items])
+    return len(items) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--batch", type=int, default=500)
+    args = parser.parse_args()
+
+    users = [{"tenant_id": "tenant{0}".format(index % 10), "user_id": "user{0}".format(index)}
+             for index in range(args.tokens)]
+    tokens = [token_manager.vend(user["tenant_id"], user["user_id"]) for user in users]
+    batches = [users[start:start + args.batch]
+               for start in range(0, len(users), args.batch)]
+
+    candidates = (
+        ("verify", "PyJWT decode",
+         lambda token: jwt.decode(jwt=token, key=SECRET_KEY, algorithm="HS256")),
+        ("verify", "hs256 fast path", lambda token: hs256.decode(token, SECRET_KEY)),
+        ("verify", "get_decoded_token", token_manager.get_decoded_token),
+        ("vend", "PyJWT encode", lambda user: jwt.encode(
+            token_manager.get_payload(user["tenant_id"], user["user_id"], expires_in=3600),
+            SECRET_KEY, algorithm="HS256")),
+        ("vend", "vend", lambda user: token_manager.vend(
+            user["tenant_id"], user["user_id"], expires_in=3600)),
+        ("vend", "vend_batch", None),
+    )
+
+    rows = []
+    baselines = {}
+    for operation, name, func in candidates:
+        if func is None:
+            tokens_per_second = rate(lambda batch: token_manager.vend_batch(
+                batch, expires_in=3600), batches) * args.batch
+        else:
+            tokens_per_second = rate(func, tokens if operation == "verify" else users)
+        baseline = baselines.setdefault(operation, tokens_per_second)
+        rows.append((operation, name, "{0:.0f}".format(tokens_per_second),
+                     "{0:.1f}x".format(tokens_per_second / baseline)))
+
+    print("{0} distinct tokens, batches of {1}, single thread".format(args.tokens,
+                                                                   args.batch))
+    bench_env.print_table(("operation", "path", "tokens/s", "speedup"), rows)
+
+    rows = []
+    for key_count in (1, 10, 1000):
+        keyset = token_keyset.Keyset.from_json(json.dumps({
+            "active": "key-0",
+            "keys": [{"kid": "key-{0}".format(index), "secret": "secret-{0}".format(index)}
+                     for index in range(key_count)]}))
+        signed = [keyset.sign(token_manager.get_payload(user["tenant_id"], user["user_id"]))
+                  for user in users]
+        rows.append((key_count, "{0:.0f}".format(rate(keyset.decode, signed))))
+    print()
+    bench_env.print_table(("keyset size", "verify tokens/s"), rows)
+
+
+if __name__ == "__main__":
+    main()
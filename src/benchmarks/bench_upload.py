@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compares uploading a large base64 request body with one put_object of
+the decoded body against upload_engine multipart uploads, for throughput
+and peak RSS above the request body itself. Each case runs in its own
+process against a bandwidth-limited local S3 that discards the data.
+    python benchmarks/bench_upload.py --size 256 --bandwidth 50
+"""
+
+import argparse
+import base64
+import binascii
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import bench_env
+from local_s3 import LocalS3
+
+import upload_engine
+
+CASES = ("put_object, decoded body", "upload_engine, decoded body",
+         "upload_engine, Base64Reader")
+
+
+def get_peak_rss():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_case(case, args):
+    """
+    Uploads the body in this process and returns (seconds, extra peak bytes)
+        :param case: index in CASES
+        :param args:
+    """
+    block = bytes(range(256)) * 3 * 1024
+    encoded = base64.b64encode(block).decode("ascii") * (args.size * 1024 * 1024 // len(block))
+    s3_client = LocalS3(latency=args.latency, bandwidth=args.bandwidth * 1024 * 1024,
+                        discard=True)
+    baseline = get_peak_rss()
+
+    start = time.perf_counter()
+    if case == 0:
+        s3_client.put_object(Bucket="bucket", Key="object", Body=binascii.a2b_base64(encoded))
+    elif case == 1:
+        upload_engine.upload_object(s3_client, "bucket", "object",
+                                    binascii.a2b_base64(encoded),
+                                    part_size=args.part_size * 1024 * 1024,
+                                    max_workers=args.workers)
+    else:
+        upload_engine.upload_object(s3_client, "bucket", "object",
+                                    upload_engine.Base64Reader(encoded),
+                                    part_size=args.part_size * 1024 * 1024,
+                                    max_workers=args.workers)
+    return time.perf_counter() - start, get_peak_rss() - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=256, help="MiB decoded")
+    parser.add_argument("--part-size", type=int, default=8, help="MiB")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--bandwidth", type=float, default=50.0,
+                        help="MiB/s per request")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="seconds per S3 request")
+    parser.add_argument("--case", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        print(json.dumps(run_case(args.case, args)))
+        return
+
+    rows = []
+    for case, name in enumerate(CASES):
+        output = subprocess.check_output([sys.executable, __file__, "--case", str(case)] +
+                                         sys.argv[1:])
+        seconds, peak = json.loads(output)
+        rows.append((name, "{0:.2f}".format(seconds),
+                     "{0:.0f}".format(args.size / seconds),
+                     "{0:.0f}".format(peak / 1024 / 1024)))
+    bench_env.print_table(("upload", "s", "MiB/s", "peak RSS MiB above body"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Local stand-in for a Redis-protocol server, implementing the commands
+used by cache_backends.RedisBackend (PING, SELECT, GET, SET EX/PX, INCR,
+DEL, FLUSHALL)
+    python benchmarks/local_redis.py --port 6379
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+import bench_env  # noqa: F401
+from cache_backends import encode_command, read_reply
+
+
+class LocalRedisServer(socketserver.ThreadingTCPServer):
+    """
+    Threaded RESP server over an in-memory dict with expiry
+        :param address=("127.0.0.1", 0): port 0 picks a free port
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0)):
+        socketserver.ThreadingTCPServer.__init__(self, address, RespHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return "redis://{0}:{1}/0".format(*self.server_address)
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def execute(self, command, args):
+        with self.lock:
+            if command == b"PING":
+                return "PONG"
+            if command in (b"SELECT", b"FLUSHALL"):
+                if command == b"FLUSHALL":
+                    self.data.clear()
+                return "OK"
+            if command == b"GET":
+                return self._get(args[0])
+            if command == b"SET":
+                expires_at = None
+                if len(args) > 3:
+                    unit = 1.0 if args[2].upper() == b"EX" else 0.001
+                    expires_at = time.monotonic() + int(args[3]) * unit
+                self.data[args[0]] = (args[1], expires_at)
+                return "OK"
+            if command == b"INCR":
+                value = int(self._get(args[0]) or 0) + 1
+                self.data[args[0]] = (str(value).encode(), None)
+                return value
+            if command == b"DEL":
+                return sum(1 for key in args if self.data.pop(key, None))
+        return RuntimeError("ERR unknown command")
+
+    def _get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """
+    Reads RESP arrays and writes replies until the client disconnects
+    """
+    def handle(self):
+        while True:
+            try:
+                request = read_reply(self.rfile)
+            except ConnectionError:
+                return
+            reply = self.server.execute(request[0].upper(), request[1:])
+            self.wfile.write(encode_reply(reply))
+
+
+def encode_reply(reply):
+    """
+    Encodes a reply of LocalRedisServer.execute
+        :param reply:
+    """
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return b"-" + str(reply).encode() + b"\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+" + reply.encode() + b"\r\n"
+    return encode_command([reply])[4:]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=6379)
+    server = LocalRedisServer(("127.0.0.1", parser.parse_args().port))
+    print("listening on", server.url)
+    server.serve_forever()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+In-memory stand-in for the subset of the boto3 S3 client used by the
+partition approaches. Every request sleeps for a configurable latency so
+that sequential and concurrent access patterns can be compared locally.
+AsyncLocalS3 is the same stand-in for the async clients of async_pipeline.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import io
+import itertools
+import threading
+import time
+from collections import Counter
+
+import botocore.exceptions
+
+
+class LocalS3(object):
+    """
+    Minimal S3 client stand-in with per-request latency
+        :param latency=0.0: seconds added to every request
+        :param page_size=1000: maximum keys per list_objects_v2 page
+        :param bandwidth=None: bytes per second of each upload or download,
+            if limited
+        :param discard=False: keep only the size of uploaded bodies
+        :param fail_parts=(): part numbers whose first upload fails
+    """
+    def __init__(self, latency=0.0, page_size=1000, bandwidth=None, discard=False,
+                 fail_parts=()):
+        self.latency = latency
+        self.page_size = page_size
+        self.bandwidth = bandwidth
+        self.discard = discard
+        self.fail_parts = set(fail_parts)
+        self.requests = Counter()
+        self.aborted = []
+        self._objects = {}
+        self._keys = {}
+        self._uploads = {}
+        self._upload_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _request(self, operation):
+        with self._lock:
+            self.requests[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read_body(self, body):
+        if self.discard and hasattr(body, "read"):
+            # Streamed like a socket send: only one chunk is held at a time
+            size = 0
+            for chunk in iter(lambda: body.read(1 << 20), b""):
+                size += len(chunk)
+            data = b""
+        else:
+            data = body.read() if hasattr(body, "read") else bytes(body)
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            size = len(data)
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+        return data
+
+    def create_bucket(self, Bucket, **kwargs):
+        self._request("create_bucket")
+        with self._lock:
+            self._objects.setdefault(Bucket, {})
+            self._keys.setdefault(Bucket, [])
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def head_bucket(self, Bucket, **kwargs):
+        self._request("head_bucket")
+        with self._lock:
+            if Bucket not in self._objects:
+                raise botocore.exceptions.ClientError(
+                    {"Error": {"Code": "404", "Message": "Not Found"}}, "HeadBucket")
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}}
+
+    def put_object(self, Bucket, Key, Body=b"", **kwargs):
+        self._request("put_object")
+        self.load(Bucket, [(Key, self._read_body(Body))])
+        return {"ResponseMetadata": {"HTTPStatusCode": 200},
+                "ETag": '"{0:x}"'.format(hash(Key) & 0xffffffff)}
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self._request("create_multipart_upload")
+        upload_id = str(next(self._upload_ids))
+        with self._lock:
+            self._uploads[upload_id] = (Bucket, Key, {})
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}, "UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        self._request("upload_part")
+        data = self._read_body(Body)
+        with self._lock:
+            if PartNumber in self.fail_parts:
+                self.fail_parts.discard(PartNumber)
+                raise botocore.exceptions.ClientError(
+                    {"Error": {"Code": "InternalError", "Message": "Retry"},
+                     "ResponseMetadata": {"HTTPStatusCode": 500}}, "UploadPart")
+            if UploadId not in self._uploads:
+                raise botocore.exceptions.ClientError(
+                    {"Error": {"Code": "NoSuchUpload", "Message": "Not Found"},
+                     "ResponseMetadata": {"HTTPStatusCode": 404}}, "UploadPart")
+            etag = '"{0}"'.format(hashlib.md5(data).hexdigest())
+            self._uploads[UploadId][2][PartNumber] = (etag, len(data) if self.discard
+                                                      else data)
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}, "ETag": etag}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        self._request("complete_multipart_upload")
+        with self._lock:
+            _, _, parts = self._uploads.pop(UploadId)
+        if [part["ETag"] for part in MultipartUpload["Parts"]] != \
+                [parts[number][0] for number in sorted(parts)]:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "InvalidPart", "Message": "Parts do not match"},
+                 "ResponseMetadata": {"HTTPStatusCode": 400}}, "CompleteMultipartUpload")
+        if self.discard:
+            body = b""
+        else:
+            body = b"".join(parts[number][1] for number in sorted(parts))
+        self.load(Bucket, [(Key, body)])
+        return {"ResponseMetadata": {"HTTPStatusCode": 200},
+                "ETag": '"{0:x}-{1}"'.format(hash(Key) & 0xffffffff, len(parts))}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        self._request("abort_multipart_upload")
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+            self.aborted.append(UploadId)
+        return {"ResponseMetadata": {"HTTPStatusCode": 204}}
+
+    def head_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self._request("head_object")
+        with self._lock:
+            body = self._objects.get(Bucket, {}).get(Key)
+        if body is None:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "404", "Message": "Not Found"},
+                 "ResponseMetadata": {"HTTPStatusCode": 404}}, "HeadObject")
+        etag = '"{0:x}"'.format(hash(body) & 0xffffffff)
+        if IfNoneMatch == etag:
+            raise_not_modified("HeadObject")
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}, "ETag": etag,
+                "ContentLength": len(body)}
+
+    def get_object(self, Bucket, Key, Range=None, IfMatch=None, IfNoneMatch=None, **kwargs):
+        self._request("get_object")
+        with self._lock:
+            body = self._objects.get(Bucket, {}).get(Key)
+        if body is None:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": "Not Found"},
+                 "ResponseMetadata": {"HTTPStatusCode": 404}}, "GetObject")
+
+        resp = {"ResponseMetadata": {"HTTPStatusCode": 200},
+                "ETag": '"{0:x}"'.format(hash(body) & 0xffffffff)}
+        if IfMatch is not None and IfMatch != resp["ETag"]:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "PreconditionFailed", "Message": "Precondition Failed"},
+                 "ResponseMetadata": {"HTTPStatusCode": 412}}, "GetObject")
+        if IfNoneMatch == resp["ETag"]:
+            raise_not_modified("GetObject")
+        if Range:
+            first, _, last = Range[len("bytes="):].partition("-")
+            first, last = int(first), min(int(last or len(body) - 1), len(body) - 1)
+            if first >= len(body):
+                raise botocore.exceptions.ClientError(
+                    {"Error": {"Code": "InvalidRange", "Message": "Not Satisfiable"},
+                     "ResponseMetadata": {"HTTPStatusCode": 416}}, "GetObject")
+            resp["ContentRange"] = "bytes {0}-{1}/{2}".format(first, last, len(body))
+            body = memoryview(body)[first:last + 1]
+        resp["ContentLength"] = len(body)
+        resp["Body"] = ThrottledBody(body, self.bandwidth) if self.bandwidth \
+            else io.BytesIO(body)
+        return resp
+
+    def load(self, bucket_name, items):
+        """
+        Stores (key, body) pairs without request latency
+            :param bucket_name:
+            :param items:
+        """
+        with self._lock:
+            objects = self._objects.setdefault(bucket_name, {})
+            keys = self._keys.setdefault(bucket_name, [])
+            for key, body in items:
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                if key not in objects:
+                    bisect.insort(keys, key)
+                objects[key] = b"" if self.discard else bytes(body)
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, StartAfter=None,
+                        ContinuationToken=None, MaxKeys=None, **kwargs):
+        self._request("list_objects_v2")
+        max_keys = min(MaxKeys or self.page_size, self.page_size)
+        with self._lock:
+            keys = self._keys.get(Bucket, [])
+            objects = self._objects.get(Bucket, {})
+            marker = max(filter(None, (Prefix, StartAfter, ContinuationToken)),
+                         default="")
+            index = bisect.bisect_right(keys, marker) \
+                if marker in (StartAfter, ContinuationToken) \
+                else bisect.bisect_left(keys, marker)
+
+            contents, common_prefixes, last = [], [], None
+            while index < len(keys) and len(contents) + len(common_prefixes) < max_keys:
+                key = keys[index]
+                if not key.startswith(Prefix):
+                    break
+                last = key
+                if Delimiter and Delimiter in key[len(Prefix):]:
+                    common_prefix = key[:key.index(Delimiter, len(Prefix)) + len(Delimiter)]
+                    common_prefixes.append({"Prefix": common_prefix})
+                    # Skip every key rolled up into this common prefix
+                    index = bisect.bisect_left(keys, common_prefix + "\U0010ffff")
+                    last = keys[index - 1]
+                    continue
+                contents.append({"Key": key,
+                                 "Size": len(objects[key]),
+                                 "ETag": '"{0:x}"'.format(hash(key) & 0xffffffff)})
+                index += 1
+
+            truncated = index < len(keys) and keys[index].startswith(Prefix)
+
+        resp = {"KeyCount": len(contents) + len(common_prefixes),
+                "IsTruncated": truncated,
+                "Prefix": Prefix}
+        if contents:
+            resp["Contents"] = contents
+        if common_prefixes:
+            resp["CommonPrefixes"] = common_prefixes
+        if truncated:
+            resp["NextContinuationToken"] = last
+        return resp
+
+    def get_object_tagging(self, Bucket, Key, **kwargs):
+        self._request("get_object_tagging")
+        with self._lock:
+            found = Key in self._objects.get(Bucket, {})
+        if not found:
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "NoSuchKey", "Message": "Not Found"},
+                 "ResponseMetadata": {"HTTPStatusCode": 404}}, "GetObjectTagging")
+        return {"ResponseMetadata": {"HTTPStatusCode": 200}, "TagSet": []}
+
+    def get_paginator(self, operation_name):
+        return LocalPaginator(getattr(self, operation_name))
+
+
+class AsyncLocalS3(object):
+    """
+    Async stand-in with the operations of a LocalS3 whose latency is
+    awaited instead of slept, so that requests overlap on one event loop.
+    Tracks the peak number of requests in flight
+        :param s3_client: LocalS3 without latency holding the objects
+        :param latency=0.0: seconds added to every request
+        :param denied=(): keys whose requests fail with AccessDenied
+    """
+    OPERATIONS = ("put_object", "head_object", "get_object", "get_object_tagging",
+                  "list_objects_v2")
+
+    def __init__(self, s3_client, latency=0.0, denied=()):
+        self.s3_client = s3_client
+        self.latency = latency
+        self.denied = set(denied)
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __getattr__(self, operation_name):
+        if operation_name not in self.OPERATIONS:
+            raise AttributeError(operation_name)
+
+        async def operation(**kwargs):
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                if kwargs.get("Key") in self.denied:
+                    raise botocore.exceptions.ClientError(
+                        {"Error": {"Code": "AccessDenied", "Message": "Access Denied"},
+                         "ResponseMetadata": {"HTTPStatusCode": 403}}, operation_name)
+                return getattr(self.s3_client, operation_name)(**kwargs)
+            finally:
+                self.in_flight -= 1
+
+        return operation
+
+    def get_paginator(self, operation_name):
+        return AsyncLocalPaginator(getattr(self, operation_name))
+
+
+class ThrottledBody(io.BytesIO):
+    """
+    Response body that is read no faster than bandwidth bytes per second
+        :param data:
+        :param bandwidth:
+    """
+    def __init__(self, data, bandwidth):
+        super(ThrottledBody, self).__init__(data)
+        self.bandwidth = bandwidth
+
+    def read(self, size=-1):
+        data = super(ThrottledBody, self).read(size)
+        time.sleep(len(data) / self.bandwidth)
+        return data
+
+    def readinto(self, buffer):
+        count = super(ThrottledBody, self).readinto(buffer)
+        time.sleep(count / self.bandwidth)
+        return count
+
+
+class LocalPaginator(object):
+    """
+    Follows NextContinuationToken like a boto3 paginator
+        :param operation:
+    """
+    def __init__(self, operation):
+        self.operation = operation
+
+    def paginate(self, **kwargs):
+        while True:
+            page = self.operation(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+class AsyncLocalPaginator(object):
+    """
+    Follows NextContinuationToken like an aiobotocore paginator
+        :param operation: coroutine function
+    """
+    def __init__(self, operation):
+        self.operation = operation
+
+    async def paginate(self, **kwargs):
+        while True:
+            page = await self.operation(**kwargs)
+            yield page
+            if not page.get("IsTruncated"):
+                return
+            kwargs["ContinuationToken"] = page["NextContinuationToken"]
+
+
+def raise_not_modified(operation):
+    raise botocore.exceptions.ClientError(
+        {"Error": {"Code": "304", "Message": "Not Modified"},
+         "ResponseMetadata": {"HTTPStatusCode": 304}}, operation)
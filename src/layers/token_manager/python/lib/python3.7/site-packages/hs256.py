@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Specialized HS256 signing and verification for the tokens vended by
+token_manager. The keyed HMAC state is prepared once per keyset key
+when the keyset is loaded (see token_keyset.PreparedKey) and copied per
+message; a secret passed as such is keyed per call. Anything the fast path does not handle (other
+headers, aud claims, bad signatures, expired tokens) returns None so
+that the caller can fall back to the vendored PyJWT, which then accepts
+or rejects the token exactly as before.
+"""
+
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+
+# base64url of {"typ":"JWT","alg":"HS256"}, the header PyJWT writes
+HEADER_SEGMENT = "eyJ0eXAiOiJKV1QiLCJhbGciOiJIUzI1NiJ9"
+# Keys PyJWT refuses to use as HMAC secrets
+ASYMMETRIC_MARKERS = (b"-----BEGIN PUBLIC KEY-----",
+                      b"-----BEGIN CERTIFICATE-----",
+                      b"-----BEGIN RSA PUBLIC KEY-----",
+                      b"ssh-rsa")
+
+
+def get_hmac_state(secret_key):
+    """
+    Returns the HMAC-SHA256 state keyed with secret_key, or None for keys
+    PyJWT would reject. Callers must copy() it before updating
+        :param secret_key:
+    """
+    key = secret_key.encode("utf-8") if isinstance(secret_key, str) else secret_key
+    if any(marker in key for marker in ASYMMETRIC_MARKERS):
+        return None
+    return hmac.new(key, digestmod=hashlib.sha256)
+
+
+def base64url_encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def base64url_decode(segment):
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def sign(signing_input, secret_key):
+    """
+    Returns the base64url HS256 signature of signing_input (bytes), or None
+        :param signing_input: b"<header>.<payload>"
+        :param secret_key: secret, or HMAC state from get_hmac_state()
+    """
+    state = get_hmac_state(secret_key) if isinstance(secret_key, (str, bytes)) \
+        else secret_key
+    if state is None:
+        return None
+    mac = state.copy()
+    mac.update(signing_input)
+    return base64url_encode(mac.digest())
+
+
+def header_segment(kid=None):
+    """
+    Returns the base64url header PyJWT writes for HS256, with kid if given
+        :param kid=None:
+    """
+    if kid is None:
+        return HEADER_SEGMENT
+    header = json.dumps({"typ": "JWT", "alg": "HS256", "kid": kid},
+                        separators=(",", ":")).encode("utf-8")
+    return base64url_encode(header).decode("ascii")
+
+
+def encode(payload, secret_key, header=HEADER_SEGMENT):
+    """
+    Returns an HS256 token identical to jwt.encode(payload, secret_key),
+    or None for keys PyJWT would reject
+        :param payload: dict of JSON serializable claims
+        :param secret_key: secret, or HMAC state from get_hmac_state()
+        :param header=HEADER_SEGMENT: see header_segment()
+    """
+    signing_input = (header + ".").encode("ascii") + base64url_encode(
+        json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signature = sign(signing_input, secret_key)
+    if signature is None:
+        return None
+    return (signing_input + b"." + signature).decode("ascii")
+
+
+def decode(token, secret_key, header=HEADER_SEGMENT):
+    """
+    Verifies an HS256 token and returns its claims, or None when the token
+    needs the full library (unusual header or claims, or a failed check)
+        :param token:
+        :param secret_key: secret, or HMAC state from get_hmac_state()
+        :param header=HEADER_SEGMENT: the expected header segment
+    """
+    if not isinstance(token, str) or token.count(".") != 2:
+        return None
+    if not token.startswith(header + "."):
+        return None
+    header, payload, signature = token.split(".")
+
+    expected = sign("{0}.{1}".format(header, payload).encode("ascii", "replace"),
+                    secret_key)
+    if expected is None or \
+            not hmac.compare_digest(expected, signature.encode("ascii", "replace")):
+        return None
+
+    try:
+        claims = json.loads(base64url_decode(payload))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(claims, dict) or not claims_are_valid(claims):
+        return None
+    return claims
+
+
+def claims_are_valid(claims):
+    """
+    Applies PyJWT's default iat/nbf/exp checks; aud always goes to PyJWT
+        :param claims:
+    """
+    if "aud" in claims:
+        return False
+    now = int(time.time())
+    try:
+        if "iat" in claims:
+            int(claims["iat"])
+        if "nbf" in claims and int(claims["nbf"]) > now:
+            return False
+        if "exp" in claims and int(claims["exp"]) < now:
+            return False
+    except (TypeError, ValueError):
+        return False
+    return True
@@ -4,13 +4,6 @@ import struct
 
 from .compat import binary_type, bytes_from_int, text_type
 
-try:
-    from cryptography.hazmat.primitives.asymmetric.utils import (
-        decode_dss_signature, encode_dss_signature
-    )
-except ImportError:
-    pass
-
 
 def force_unicode(value):
     if isinstance(value, binary_type):
@@ -95,6 +88,9 @@ def der_to_raw_signature(der_sig, curve):
     num_bits = curve.key_size
     num_bytes = (num_bits + 7) // 8
 
+    # Only used by ECAlgorithm, so cryptography is imported here
+    from cryptography.hazmat.primitives.asymmetric.utils import decode_dss_signature
+
     r, s = decode_dss_signature(der_sig)
 
     return number_to_bytes(r, num_bytes) + number_to_bytes(s, num_bytes)
@@ -110,4 +106,6 @@ def raw_to_der_signature(raw_sig, curve):
     r = bytes_to_number(raw_sig[:num_bytes])
     s = bytes_to_number(raw_sig[num_bytes:])
 
+    from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
     return encode_dss_signature(r, s)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Keyset used to vend and verify tokens, so secrets can be rotated without
+a redeploy. The keyset is JSON, read from the file named by
+TOKEN_KEYSET_FILE or from the TOKEN_KEYSET variable itself:
+    {"active": "2021-06",
+     "keys": [{"kid": "2021-06", "secret": "..."},
+              {"kid": "2021-01", "secret": "..."},
+              {"kid": "idp-1", "alg": "RS256", "public_key": "-----BEGIN..."}]}
+Tokens are vended with the active HS256 key and its kid header. Tokens
+without a kid are verified with the optional "default" key (the legacy
+key when no keyset is configured). RS256/ES256 keys verify tokens issued
+elsewhere; their public keys are parsed once per load and need the
+cryptography package.
+Every key is indexed by the exact header segment it produces and by kid,
+so verification cost does not grow with the keyset.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import hs256
+import packages.jwt as jwt
+from packages.jwt import algorithms as jwt_algorithms
+
+LEGACY_SECRET_KEY = "aws-saas-factory"
+TOKEN_KEYSET_REFRESH = 60
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+LOGGER = logging.getLogger(__name__)
+
+
+class PreparedKey(object):
+    """
+    Key material prepared once per keyset load
+        :param kid: None for the key of tokens without a kid header
+        :param alg: HS256, RS256 or ES256
+        :param key: HMAC secret, or parsed public key
+    """
+    def __init__(self, kid, alg, key):
+        self.kid = kid
+        self.alg = alg
+        self.key = key
+        self.header = hs256.header_segment(kid) if alg == "HS256" else None
+        # Keyed once here, so verification cost does not depend on the keyset size
+        self.hmac_state = hs256.get_hmac_state(key) if alg == "HS256" else None
+
+
+class Keyset(object):
+    """
+    Keys indexed by kid and by header segment
+        :param keys: PreparedKey objects
+        :param active=None: kid of the signing key, None signs without kid
+        :param default=None: kid verifying tokens without a kid header
+    """
+    def __init__(self, keys, active=None, default=None):
+        self.keys = {key.kid: key for key in keys}
+        self.by_header = {key.header: key for key in keys if key.header}
+        self.signing_key = self.keys[active]
+        if self.signing_key.alg != "HS256":
+            raise ValueError("active key {0} must be HS256".format(active))
+        if default is not None:
+            self.keys[None] = self.keys[default]
+            if self.keys[default].alg == "HS256":
+                self.by_header[hs256.HEADER_SEGMENT] = self.keys[default]
+        self.fingerprint = hashlib.sha256(repr(sorted(
+            (str(key.kid), key.alg, str(key.key)) for key in keys)).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Parses a keyset document, preparing every key
+            :param data: JSON string
+        """
+        document = json.loads(data)
+        keys = [prepare_key(entry["kid"], entry.get("alg", "HS256"),
+                            entry.get("secret") or entry.get("public_key"))
+                for entry in document["keys"]]
+        return cls(keys, document["active"], document.get("default"))
+
+    def sign(self, payload):
+        """
+        Returns a token for payload signed with the active key
+            :param payload:
+        """
+        key = self.signing_key
+        token = hs256.encode(payload, key.hmac_state, key.header)
+        if token is None:
+            headers = {"kid": key.kid} if key.kid is not None else None
+            token = jwt.encode(payload=payload, key=key.key, algorithm="HS256",
+                               headers=headers).decode("utf-8")
+        return token
+
+    def decode(self, token):
+        """
+        Verifies token with the key named by its header and returns the claims
+            :param token:
+        """
+        key = self.by_header.get(token.split(".", 1)[0]) \
+            if isinstance(token, str) else None
+        if key is not None:
+            claims = hs256.decode(token, key.hmac_state, key.header)
+            if claims is not None:
+                return claims
+        else:
+            kid = jwt.get_unverified_header(token).get("kid")
+            key = self.keys.get(kid)
+            if key is None:
+                raise jwt.InvalidTokenError("Unknown key id {0}".format(kid))
+        # Only the algorithm of the key is accepted, never the token's choice
+        return jwt.decode(jwt=token, key=key.key, algorithms=[key.alg])
+
+
+def prepare_key(kid, alg, material):
+    """
+    Returns a PreparedKey, parsing public keys once
+        :param kid:
+        :param alg:
+        :param material: secret or PEM public key
+    """
+    if alg == "HS256":
+        if not isinstance(material, str):
+            raise ValueError("HS256 key {0} needs a secret".format(kid))
+        return PreparedKey(kid, alg, material)
+    if alg not in ASYMMETRIC_ALGORITHMS:
+        raise ValueError("unsupported algorithm {0} for key {1}".format(alg, kid))
+    if not jwt_algorithms.has_crypto:
+        raise ValueError("{0} key {1} requires the cryptography package".format(alg, kid))
+    algorithm = jwt_algorithms.get_default_algorithms()[alg]
+    return PreparedKey(kid, alg, algorithm.prepare_key(material))
+
+
+def legacy_keyset():
+    """
+    Returns the keyset used when none is configured
+    """
+    return Keyset([PreparedKey(None, "HS256", LEGACY_SECRET_KEY)])
+
+
+_STATE = {"keyset": None, "source": None, "check_after": float("-inf")}
+_LOCK = threading.Lock()
+
+
+def get_keyset():
+    """
+    Returns the current keyset. The source is checked at most every
+    TOKEN_KEYSET_REFRESH seconds and reloaded when it changed; a keyset
+    that fails to load keeps the previous one in service
+    """
+    if time.monotonic() < _STATE["check_after"]:
+        return _STATE["keyset"]
+
+    with _LOCK:
+        now = time.monotonic()
+        if now < _STATE["check_after"]:
+            return _STATE["keyset"]
+        try:
+            source = get_source()
+            if source != _STATE["source"] or _STATE["keyset"] is None:
+                _STATE["keyset"] = load_keyset(source)
+                _STATE["source"] = source
+        except (OSError, ValueError, KeyError) as ex:
+            if _STATE["keyset"] is None:
+                raise
+            LOGGER.warning("Keeping previous token keyset: %s", ex)
+        _STATE["check_after"] = now + float(os.environ.get("TOKEN_KEYSET_REFRESH",
+                                                           TOKEN_KEYSET_REFRESH))
+        return _STATE["keyset"]
+
+
+def get_source():
+    """
+    Returns a value identifying the configured keyset and its revision
+    """
+    path = os.environ.get("TOKEN_KEYSET_FILE")
+    if path:
+        return ("file", path, os.stat(path).st_mtime_ns)
+    if os.environ.get("TOKEN_KEYSET"):
+        return ("env", os.environ["TOKEN_KEYSET"])
+    return ("legacy",)
+
+
+def load_keyset(source):
+    """
+    Loads the keyset identified by get_source()
+        :param source:
+    """
+    if source[0] == "file":
+        with open(source[1]) as keyset_file:
+            return Keyset.from_json(keyset_file.read())
+    if source[0] == "env":
+        return Keyset.from_json(source[1])
+    return legacy_keyset()
@@ -8,45 +8,193 @@ Vends token based on header fields (TenantId, UserId)
 """
 
 
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import hs256
 import packages.jwt as jwt
+import token_keyset
+import token_revocation
 
 X_TOKEN = "x-token"
 X_TENANT_ID = "x-tenant-id"
 X_USER_ID = "x-user-id"
+TOKEN_CACHE_SIZE = 1024
+
+
+class TokenCache(object):
+    """
+    LRU cache of verified token claims. Entries are keyed by a hash of the
+    secret and the token, so a token is only trusted again under the key
+    it was verified with, and are dropped once the token's exp has passed
+        :param max_entries: 0 disables the cache
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.counters = dict.fromkeys(("hits", "misses", "expirations"), 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token, secret_key):
+        """
+        Returns a copy of the cached claims or None
+            :param token:
+            :param secret_key:
+        """
+        key = cache_key(token, secret_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+
+            claims, not_before, expires_at = entry
+            now = time.time()
+            if now >= expires_at or now < not_before:
+                del self._entries[key]
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return dict(claims)
+
+    def put(self, token, secret_key, claims):
+        """
+        Stores the claims of a token that passed verification
+            :param token:
+            :param secret_key:
+            :param claims: decoded payload
+        """
+        if self.max_entries <= 0:
+            return
+        try:
+            not_before = float(claims.get("nbf", float("-inf")))
+            expires_at = float(claims.get("exp", float("inf")))
+        except (TypeError, ValueError):
+            return
+
+        key = cache_key(token, secret_key)
+        with self._lock:
+            self._entries[key] = (dict(claims), not_before, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns counters and the number of cached tokens
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+        return stats
+
+
+def cache_key(token, secret_key):
+    """
+    Returns the digest identifying a token verified with secret_key
+        :param token:
+        :param secret_key:
+    """
+    digest = hashlib.sha256(secret_key.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(token.encode("utf-8"))
+    return digest.digest()
+
+
+_TOKEN_CACHE = TokenCache(int(os.environ.get("TOKEN_CACHE_SIZE", TOKEN_CACHE_SIZE)))
+
+
+def vend(tenant_id, user_id, secret_key=None, role=None,
+         expires_in=None):
+    """
+    Vends token based on input fields, signed with the active key of the
+    token_keyset unless secret_key is given
+        :param tenant_id:
+        :param user_id:
+        :param secret_key=None: defaults to the token_keyset
+        :param role=None: optional role claim, e.g. tenant_admin
+        :param expires_in=None: adds iat and exp claims, seconds from now
+    """
+    return vend_payload(get_payload(tenant_id, user_id, role, expires_in), secret_key)
+
+
+def vend_batch(users, secret_key=None, expires_in=None):
+    """
+    Vends one token per user, sharing the issue time and prepared key
+        :param users: sequence of {"tenant_id", "user_id", "role"(optional)}
+        :param secret_key=None: defaults to the token_keyset
+        :param expires_in=None: adds iat and exp claims, seconds from now
+    """
+    issued_at = int(time.time())
+    return [vend_payload(get_payload(user["tenant_id"], user["user_id"],
+                                     user.get("role"), expires_in, issued_at),
+                         secret_key)
+            for user in users]
+
+
+def vend_payload(payload, secret_key):
+    """
+    Signs payload with the HS256 fast path, or PyJWT for unusual keys
+        :param payload:
+        :param secret_key: None signs with the token_keyset
+    """
+    if secret_key is None:
+        return token_keyset.get_keyset().sign(payload)
+    token = hs256.encode(payload, secret_key)
+    if token is None:
+        token = jwt.encode(payload=payload,
+                           key=secret_key,
+                           algorithm='HS256').decode('utf-8')
+    return token
 
 
-def vend(tenant_id, user_id, secret_key='aws-saas-factory'):
+def get_payload(tenant_id, user_id, role=None, expires_in=None, issued_at=None):
     """
-    Vends token based on input fields. secret_key can be overriden
+    Returns the claims of a vended token
         :param tenant_id:
         :param user_id:
-        :param secret_key='aws-saas-factory':
+        :param role=None:
+        :param expires_in=None:
+        :param issued_at=None: defaults to now
     """
     payload = {
         'tenant_id': tenant_id,
         'user_id': user_id
     }
-
-    token = jwt.encode(payload=payload,
-                       key=secret_key,
-                       algorithm='HS256').decode('utf-8')
-    return token
+    if role:
+        payload['role'] = role
+    if expires_in:
+        payload['iat'] = int(time.time()) if issued_at is None else issued_at
+        payload['exp'] = payload['iat'] + int(expires_in)
+    return payload
 
 
-def get_header(event, secret_key='aws-saas-factory'):
+def get_header(event, secret_key=None):
     """
-    Return tenant_id, user_id, token
+    Return tenant_id, user_id, token and role. The role only comes from
+    the claims of a verified token, tokens vended here from the tenant and
+    user headers carry none
         :param event:
-        :param secret_key='aws-saas-factory':
+        :param secret_key=None: defaults to the token_keyset
     """
     if X_TOKEN in event:
         token = event[X_TOKEN]
-        decoded_token = get_decoded_token(token)
+        decoded_token = get_verified_claims(token, secret_key)
+        # Checked on every request, including verified-token cache hits
+        token_revocation.check(token)
         tenant_id = decoded_token.get("tenant_id")
         user_id = decoded_token.get("user_id")
+        role = decoded_token.get("role")
     else:
         tenant_id = event.get(X_TENANT_ID)
         user_id = event.get(X_USER_ID)
+        role = None
         if not tenant_id or not user_id:
             return {}
         token = vend(tenant_id, user_id, secret_key)
@@ -55,15 +203,46 @@ def get_header(event, secret_key='aws-saas-factory'):
         "token": token,
         "tenant_id": tenant_id,
         "user_id": user_id,
+        "role": role,
     }
 
 
-def get_decoded_token(token, secret_key='aws-saas-factory'):
+def get_decoded_token(token, secret_key=None):
     """
-    Decodes token using PyJWT library
+    Decodes token with the HS256 fast path, falling back to the PyJWT
+    library for anything it does not handle
         :param token:
-        :param secret_key='aws-saas-factory':
+        :param secret_key=None: defaults to the token_keyset
     """
+    if secret_key is None:
+        return token_keyset.get_keyset().decode(token)
+    claims = hs256.decode(token, secret_key)
+    if claims is not None:
+        return claims
     return jwt.decode(jwt=token,
                       key=secret_key,
                       algorithm='HS256')
+
+
+def get_verified_claims(token, secret_key=None):
+    """
+    Returns the claims of a token, from the verified-token cache when the
+    same token was seen before and is still within exp/nbf
+        :param token:
+        :param secret_key=None: defaults to the token_keyset
+    """
+    # A keyset reload changes the fingerprint and so orphans cached tokens
+    cache_secret = secret_key if secret_key is not None \
+        else token_keyset.get_keyset().fingerprint
+    claims = _TOKEN_CACHE.get(token, cache_secret)
+    if claims is None:
+        claims = get_decoded_token(token, secret_key)
+        _TOKEN_CACHE.put(token, cache_secret, claims)
+    return claims
+
+
+def token_cache_stats():
+    """
+    Returns hit and miss counters of the verified-token cache
+    """
+    return _TOKEN_CACHE.stats()
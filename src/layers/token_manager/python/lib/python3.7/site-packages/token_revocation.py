@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Revocation list for vended tokens. A revoked token is identified by the
+SHA-256 hex digest of the token string (see token_digest). Entries come
+from TOKEN_REVOCATION_FILE (one digest per line) or from the DynamoDB
+table TOKEN_REVOCATION_TABLE (partition key token_hash), e.g.
+aws-saas-s3-token-revocation. Every TOKEN_REVOCATION_REFRESH seconds the
+file's mtime, or the table's version item (token_hash "version", number
+attribute version), is checked and the list is only reloaded when it
+changed. A revocation puts the digest item first and then increments the
+version (UpdateItem ADD version 1); a table without a version item is
+scanned at every refresh. Each token is checked against an in-memory
+Bloom filter; only a Bloom hit costs an exact lookup, in a sorted digest
+array for the file or a GetItem for the table.
+"""
+
+import bisect
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+
+import packages.jwt as jwt
+
+TOKEN_REVOCATION_REFRESH = 60
+TOKEN_REVOCATION_FP_RATE = 0.001
+TOKEN_REVOCATION_CAPACITY = 10000
+DIGEST_SIZE = 32
+# token_hash of the table item whose version attribute changes on revocation
+VERSION_ITEM = "version"
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TokenRevokedError(jwt.InvalidTokenError):
+    pass
+
+
+class BloomFilter(object):
+    """
+    Bloom filter over SHA-256 digests, sized for capacity entries at the
+    requested false-positive rate
+        :param capacity:
+        :param fp_rate:
+    """
+    def __init__(self, capacity, fp_rate):
+        capacity = max(int(capacity), 1)
+        self.fp_rate = fp_rate
+        self.num_bits = max(int(math.ceil(-capacity * math.log(fp_rate) /
+                                          math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def add(self, digest):
+        """
+        Adds a 32 byte digest
+            :param digest:
+        """
+        for position in self._positions(digest):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, digest):
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(digest))
+
+    def estimated_fp_rate(self):
+        """
+        Returns the false-positive rate expected at the current fill
+        """
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) \
+            ** self.num_hashes
+
+    def _positions(self, digest):
+        # Double hashing over two halves of the (already uniform) digest
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:16], "little") | 1
+        return [(first + index * second) % self.num_bits
+                for index in range(self.num_hashes)]
+
+
+class RevocationList(object):
+    """
+    Bloom filter in front of an exact lookup
+        :param digests: revoked token digests (bytes)
+        :param exact_lookup=None: callable(digest) -> bool; defaults to a
+            binary search of the digests
+        :param fp_rate:
+        :param capacity: minimum number of entries the filter is sized for
+    """
+    def __init__(self, digests, exact_lookup=None,
+                 fp_rate=TOKEN_REVOCATION_FP_RATE, capacity=TOKEN_REVOCATION_CAPACITY):
+        digests = sorted(set(digests))
+        self.bloom = BloomFilter(max(len(digests), capacity), fp_rate)
+        for digest in digests:
+            self.bloom.add(digest)
+        self._sorted = b"".join(digests) if exact_lookup is None else b""
+        self._exact_lookup = exact_lookup or self._search
+        self.counters = dict.fromkeys(("checks", "bloom_hits", "revoked",
+                                       "false_positives"), 0)
+        self._lock = threading.Lock()
+
+    def is_revoked(self, token):
+        """
+        Returns True if token is on the list
+            :param token:
+        """
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        self._count("checks")
+        if digest not in self.bloom:
+            return False
+        self._count("bloom_hits")
+        revoked = self._exact_lookup(digest)
+        self._count("revoked" if revoked else "false_positives")
+        return revoked
+
+    def stats(self):
+        """
+        Returns counters, sizing and the configured and expected FP rates
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        stats.update({
+            "entries": self.bloom.count,
+            "bloom_bits": self.bloom.num_bits,
+            "bloom_bytes": len(self.bloom._bits),
+            "exact_bytes": len(self._sorted),
+            "num_hashes": self.bloom.num_hashes,
+            "fp_rate": self.bloom.fp_rate,
+            "estimated_fp_rate": self.bloom.estimated_fp_rate(),
+        })
+        return stats
+
+    def _search(self, digest):
+        count = len(self._sorted) // DIGEST_SIZE
+        index = bisect.bisect_left(_DigestView(self._sorted, count), digest)
+        return index < count and \
+            self._sorted[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE] == digest
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+
+class _DigestView(object):
+    """
+    Sequence of the fixed-size digests packed in a bytes object
+    """
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.data[index * DIGEST_SIZE:(index + 1) * DIGEST_SIZE]
+
+
+def token_digest(token):
+    """
+    Returns the hex digest that identifies a token on the revocation list
+        :param token:
+    """
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def load_file(path, fp_rate, capacity):
+    """
+    Builds a RevocationList from a file of hex digests, one per line
+        :param path:
+        :param fp_rate:
+        :param capacity:
+    """
+    with open(path) as revocation_file:
+        digests = [bytes.fromhex(line.strip()) for line in revocation_file
+                   if line.strip() and not line.startswith("#")]
+    return RevocationList(digests, fp_rate=fp_rate, capacity=capacity)
+
+
+def get_table_version(dynamodb, table_name):
+    """
+    Returns the version of a revocation table, None when it has no
+    version item
+        :param dynamodb:
+        :param table_name:
+    """
+    response = dynamodb.get_item(TableName=table_name,
+                                 Key={"token_hash": {"S": VERSION_ITEM}},
+                                 ProjectionExpression="version",
+                                 ConsistentRead=True)
+    return response.get("Item", {}).get("version", {}).get("N")
+
+
+def load_table(dynamodb, table_name, fp_rate, capacity):
+    """
+    Builds a RevocationList from a DynamoDB table keyed by token_hash;
+    Bloom hits are confirmed with a GetItem
+        :param dynamodb:
+        :param table_name:
+        :param fp_rate:
+        :param capacity:
+    """
+    digests = []
+    paginator = dynamodb.get_paginator("scan")
+    for page in paginator.paginate(TableName=table_name,
+                                   ProjectionExpression="token_hash"):
+        digests.extend(bytes.fromhex(item["token_hash"]["S"]) for item in page["Items"]
+                       if item["token_hash"]["S"] != VERSION_ITEM)
+
+    def exact_lookup(digest):
+        response = dynamodb.get_item(TableName=table_name,
+                                     Key={"token_hash": {"S": digest.hex()}},
+                                     ProjectionExpression="token_hash",
+                                     ConsistentRead=True)
+        return "Item" in response
+
+    return RevocationList(digests, exact_lookup, fp_rate, capacity)
+
+
+_STATE = {"revocations": None, "source": None, "check_after": float("-inf"),
+          "dynamodb": None}
+_LOCK = threading.Lock()
+
+
+def get_dynamodb_client():
+    """
+    Returns the DynamoDB client of the revocation table, created once
+    """
+    if _STATE["dynamodb"] is None:
+        import boto3
+
+        _STATE["dynamodb"] = boto3.client("dynamodb")
+    return _STATE["dynamodb"]
+
+
+def get_revocations():
+    """
+    Returns the current RevocationList, or None when no source is set.
+    The source is checked every TOKEN_REVOCATION_REFRESH seconds; a failed
+    reload keeps the previous list in service
+    """
+    if time.monotonic() < _STATE["check_after"]:
+        return _STATE["revocations"]
+
+    with _LOCK:
+        now = time.monotonic()
+        if now < _STATE["check_after"]:
+            return _STATE["revocations"]
+        fp_rate = float(os.environ.get("TOKEN_REVOCATION_FP_RATE",
+                                       TOKEN_REVOCATION_FP_RATE))
+        capacity = int(os.environ.get("TOKEN_REVOCATION_CAPACITY",
+                                      TOKEN_REVOCATION_CAPACITY))
+        try:
+            path = os.environ.get("TOKEN_REVOCATION_FILE")
+            table_name = os.environ.get("TOKEN_REVOCATION_TABLE")
+            if path:
+                # The file is only re-read when it changed
+                source = (path, os.stat(path).st_mtime_ns, fp_rate, capacity)
+                if source != _STATE["source"]:
+                    _STATE["revocations"] = load_file(path, fp_rate, capacity)
+                    _STATE["source"] = source
+            elif table_name:
+                dynamodb = get_dynamodb_client()
+                # Read before the scan, so a revocation missed by the scan
+                # changes the version seen at the next refresh
+                version = get_table_version(dynamodb, table_name)
+                source = (table_name, version, fp_rate, capacity)
+                if version is None or source != _STATE["source"]:
+                    _STATE["revocations"] = load_table(dynamodb, table_name,
+                                                       fp_rate, capacity)
+                    _STATE["source"] = source
+            else:
+                _STATE["revocations"] = None
+                _STATE["source"] = None
+        except Exception as ex:
+            if _STATE["revocations"] is None:
+                raise
+            LOGGER.warning("Keeping previous token revocation list: %s", ex)
+        _STATE["check_after"] = now + float(os.environ.get("TOKEN_REVOCATION_REFRESH",
+                                                           TOKEN_REVOCATION_REFRESH))
+        return _STATE["revocations"]
+
+
+def check(token):
+    """
+    Raises TokenRevokedError if token is on the revocation list
+        :param token:
+    """
+    revocations = get_revocations()
+    if revocations is not None and revocations.is_revoked(token):
+        raise TokenRevokedError("Token has been revoked")
+
+
+def stats():
+    """
+    Returns the revocation list statistics, or {} when none is configured
+    """
+    revocations = get_revocations()
+    return revocations.stats() if revocations is not None else {}
@@ -14,8 +14,15 @@ from http import HTTPStatus
 
 import botocore
 
+import async_pipeline
 import constants
 import helper
+import lister
+import listing_cache
+import streaming
+import upload_engine
+from compact_listing import CompactListing
+from partition_approaches import PartitionApproach
 
 ACCOUNT_ID = os.environ["AWS_ACCOUNT_ID"]
 ACCESSPOINT_BASE_ARN = "arn:aws:s3:{0}:{1}:accesspoint".format(
@@ -42,14 +49,15 @@ def put_object(sts_creds, req_header):
         helper.check_create_access_point(s3_ctl_client, req_header["bucket_name"],
                                          ACCOUNT_ID, req_header["access_point_name"])
 
-        api_put_resp = s3_client.put_object(Bucket=req_header["bucket_name"],
-                                            Key='{0}/{1}'.format(req_header["prefix"],
-                                                                 req_header["object_key"]),
-                                            Body=req_header["object_value"])
+        api_put_resp = upload_engine.upload_object(s3_client, req_header["bucket_name"],
+                                                   '{0}/{1}'.format(req_header["prefix"],
+                                                                    req_header["object_key"]),
+                                                   req_header["object_value"])
 
         if api_put_resp and \
                 api_put_resp['ResponseMetadata']['HTTPStatusCode'] == HTTPStatus.OK:
-            return helper.success_response(api_put_resp)
+            listing_cache.record_put(PartitionApproach.access_point.value, req_header)
+            return helper.success_response(helper.put_result(api_put_resp))
         else:
             return helper.failure_response("Operation failed. Please retry.",
                                            HTTPStatus.SERVICE_UNAVAILABLE)
@@ -58,11 +66,112 @@ def put_object(sts_creds, req_header):
         return helper.failure_response(helper.format_exception(ex))
 
 
+def put_objects(sts_creds, req_header):
+    """
+    Uploads a batch of objects below {tenant_id/user_id} with one client,
+    bucket and access point check, concurrently on the async pipeline or
+    the fan-out pool
+        :param sts_creds:
+        :param req_header: tenant context with "objects"
+        :return: 201 - Success, 207 - Some objects failed
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+
+        s3_ctl_client = helper.get_boto3_client("s3control", sts_creds)
+        helper.check_create_access_point(s3_ctl_client, req_header["bucket_name"],
+                                         ACCOUNT_ID, req_header["access_point_name"])
+
+        def get_key(obj):
+            return '{0}/{1}'.format(req_header["prefix"], obj["object_key"])
+
+        if async_pipeline.is_enabled():
+            results = async_pipeline.put_objects(sts_creds, s3_client,
+                                                 req_header["bucket_name"],
+                                                 req_header["objects"], get_key)
+        else:
+            results = helper.put_objects(
+                lambda obj: helper.put_s3_object(s3_client, req_header["bucket_name"],
+                                                 get_key(obj), obj["object_value"]),
+                req_header["objects"])
+
+        listing_cache.record_put(PartitionApproach.access_point.value, req_header)
+        return helper.batch_response(results)
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def init_upload(sts_creds, req_header):
+    """
+    Returns presigned PUT URLs of the requested objects through the
+    tenant access point, which does not accept POST uploads
+        :param sts_creds:
+        :param req_header: tenant context with "object_keys", "upload_method",
+            "expires_in" and "max_bytes"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        if req_header["upload_method"] != "PUT":
+            return helper.failure_response({"invalid": "access points accept put uploads only"},
+                                           HTTPStatus.BAD_REQUEST)
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+
+        s3_ctl_client = helper.get_boto3_client("s3control", sts_creds)
+        helper.check_create_access_point(s3_ctl_client, req_header["bucket_name"],
+                                         ACCOUNT_ID, req_header["access_point_name"])
+        keys = [(name, '{0}/{1}'.format(req_header["prefix"], name))
+                for name in req_header["object_keys"]]
+        return helper.presigned_uploads_response(sts_creds, req_header["access_point_arn"],
+                                                 keys, req_header)
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
 def get_object(sts_creds, req_header):
     """
     Retrieve objects based on access points per tenant
         :param sts_creds:
         :param req_header:
+        :return: 200 - Success, 304 - Not Modified
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error, 503 - Unavailable
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        s3_ctl_client = helper.get_boto3_client("s3control", sts_creds)
+        s3_ctl_client.get_access_point(AccountId=ACCOUNT_ID,
+                                       Name=req_header["access_point_name"])
+
+        user_objects = get_user_listing(s3_client, req_header)
+
+        if user_objects:
+            return helper.listing_response(user_objects, req_header)
+        else:
+            return helper.failure_response("Operation failed. Please retry.",
+                                           HTTPStatus.SERVICE_UNAVAILABLE)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def stream_object(sts_creds, req_header):
+    """
+    Streams the objects below the user's prefix through the tenant's
+    access point page by page as list_objects_v2 returns them
+        :param sts_creds:
+        :param req_header: tenant context with "stream_format"
         :return: 200 - Success
                  400 - Bad Request, 401 - Unauthorized
                  500 - Error, 503 - Unavailable
@@ -73,13 +182,132 @@ def get_object(sts_creds, req_header):
         s3_ctl_client.get_access_point(AccountId=ACCOUNT_ID,
                                        Name=req_header["access_point_name"])
 
-        api_list_resp = s3_client.list_objects_v2(Bucket=req_header["access_point_arn"],
-                                                  Prefix=req_header["prefix"])
+        return streaming.listing_response(
+            streaming.s3_pages(s3_client, req_header["access_point_arn"], req_header["prefix"]),
+            streaming.object_names,
+            req_header["stream_format"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_objects(sts_creds, req_header):
+    """
+    Retrieve the contents of several objects through the tenant access
+    point with one client, concurrently on the fan-out pool
+        :param sts_creds:
+        :param req_header: tenant context with "object_keys" or "limit"
+        :return: 200 - Success, 207 - Some objects failed or did not fit
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        if "object_keys" in req_header:
+            keys = [(name, '{0}/{1}'.format(req_header["prefix"], name))
+                    for name in req_header["object_keys"]]
+        else:
+            keys = list(get_user_listing(s3_client,
+                                         req_header)[:req_header["limit"]].named_keys())
+
+        results = helper.get_objects(s3_client, req_header["access_point_arn"], keys)
+        return helper.batch_response(results, HTTPStatus.OK)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
 
-        if api_list_resp and api_list_resp['KeyCount'] > 0:
-            user_objects = [obj['Key'].rsplit('/', 1)[-1]
-                            for obj in api_list_resp['Contents']]
-            return helper.success_response(user_objects,
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_object_content(sts_creds, req_header):
+    """
+    Retrieve the contents of one object, or a Range of it, through
+    the tenant access point
+        :param sts_creds:
+        :param req_header: tenant context with "object_key" and "range"
+        :return: 200 - Success, 206 - Partial Content
+                 400 - Bad Request, 401 - Unauthorized, 404 - Not Found
+                 413 - Too Large, 416 - Range Not Satisfiable, 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        return helper.object_content_response(s3_client, req_header["access_point_arn"],
+                                              '{0}/{1}'.format(req_header["prefix"], req_header["object_key"]),
+                                              req_header["range"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_object_urls(sts_creds, req_header):
+    """
+    Returns presigned download URLs for the user's objects through
+    the tenant access point
+        :param sts_creds:
+        :param req_header: tenant context with "expires_in" and "limit"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        keys = list(get_user_listing(s3_client,
+                                     req_header)[:req_header["limit"]].named_keys())
+        return helper.presigned_urls_response(sts_creds, req_header["access_point_arn"], keys,
+                                              req_header["expires_in"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_user_listing(s3_client, req_header):
+    """
+    Returns the user's CompactListing, served from the listing cache
+        :param s3_client:
+        :param req_header:
+    """
+    return listing_cache.get_listing(
+        PartitionApproach.access_point.value, req_header,
+        lambda: CompactListing.from_objects(
+            lister.list_objects(s3_client, req_header["access_point_arn"],
+                                req_header["prefix"])))
+
+
+def get_tenant_object(sts_creds, req_header):
+    """
+    Retrieve objects of every user through the tenant access point
+        :param sts_creds:
+        :param req_header:
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized, 403 - Forbidden
+                 500 - Error, 503 - Unavailable
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        if async_pipeline.is_enabled():
+            tenant_objects = async_pipeline.get_tenant_listing(sts_creds,
+                                                               req_header["access_point_arn"],
+                                                               req_header["tenant_prefix"])
+        else:
+            tenant_objects = helper.get_tenant_listing(s3_client,
+                                                       req_header["access_point_arn"],
+                                                       req_header["tenant_prefix"])
+        if tenant_objects:
+            return helper.success_response(tenant_objects,
                                            HTTPStatus.OK)
         else:
             return helper.failure_response("Operation failed. Please retry.",
@@ -112,6 +340,7 @@ def populate_context(event):
         "bucket_arn": "arn:aws:s3:::{0}".format(bucket_name),
         "prefix": "{0}/{1}".format(req_header["tenant_id"],
                                    req_header["user_id"]),
+        "tenant_prefix": "{0}/".format(req_header["tenant_id"]),
         "access_point_name": access_point_name,
         "access_point_arn": "{0}/{1}".format(ACCESSPOINT_BASE_ARN,
                                              access_point_name)
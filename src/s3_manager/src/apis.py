@@ -3,17 +3,22 @@
 # SPDX-License-Identifier: MIT-0
 
 """
-This script performs 2 operations:
+This script performs 7 operations:
 Invokes a specific data partitioning approach based on a parameter
-for either PUT or GET of objects
+for either PUT or GET of objects, optionally streamed page by page,
+batch PUT of objects, GET of object contents one at a time or in
+batches, presigned uploads, or GET of all objects of a tenant
 """
 
 
 import importlib
 from http import HTTPStatus
 
+import constants
 import helper
 import policy_manager as plcymgr
+import response_body
+import streaming
 from partition_approaches import PartitionApproach
 
 
@@ -26,45 +31,121 @@ def put_object(event, context):
                  400 - Bad Request, 401 - Unauthorized
                  500 - Error, 503 - Unavailable
     """
-    try:
-        partition_approach = validate_request(event)
-        if isinstance(partition_approach, dict) and \
-                "invalid" in partition_approach:
-            return helper.failure_response(partition_approach,
-                                           HTTPStatus.BAD_REQUEST)
+    return invoke_approach(event, "put_object")
 
-        rtm_module = importlib.import_module(partition_approach.value)
-        rtm_method_context = getattr(rtm_module, "populate_context")
-        req_header = rtm_method_context(event)
 
-        if "missing_fields" in req_header:
-            return helper.failure_response(req_header, HTTPStatus.UNAUTHORIZED)
+def put_objects(event, context):
+    """
+    Uploads a batch of objects for one tenant/user with a single token
+    check, session policy and AssumeRole, returning per-object status
+        :param event:
+        :param context:
+        :return: 201 - Success, 207 - Some objects failed
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error, 503 - Unavailable
+    """
+    return invoke_approach(event, "put_objects")
 
-        policy_template = helper.get_policy_template(partition_approach.value)
-        assume_role_policy = plcymgr.get_policy(policy_template, req_header)
-        sts_creds = helper.get_assumed_role_creds("s3", assume_role_policy)
 
-        rtm_method_put = getattr(rtm_module, "put_object")
-        return rtm_method_put(sts_creds, req_header)
+def get_object(event, context):
+    """
+    Retrieve objects from s3 based on partition approach; with mode=url
+    returns presigned download URLs instead of the object names. The
+    listing carries an ETag, and If-None-Match with it returns 304. A
+    stream parameter returns the listing in that stream format, joined
+        :param event:
+        :param context:
+        :return: 200 - Success, 304 - Not Modified
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error, 503 - Unavailable
+    """
+    return invoke_approach(event, "get_object")
+
 
-    except Exception as ex:
-        return helper.failure_response(helper.format_exception(ex))
+def get_object_stream(event, context):
+    """
+    Same as get_object, except that a listing requested with a stream
+    parameter is returned with a body yielding bytes page by page, for
+    a caller that writes them as they come: a local HTTP server, or
+    Lambda response streaming through a web adapter
+        :param event:
+        :param context:
+        :return: 200 - Success, 304 - Not Modified
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error, 503 - Unavailable
+    """
+    return invoke_approach(event, "get_object", stream=True)
 
 
-def get_object(event, context):
+def get_object_content(event, context):
+    """
+    Retrieve the contents of the object named by the key parameter; a
+    Range header returns that part of it
+        :param event:
+        :param context:
+        :return: 200 - Success, 206 - Partial Content
+                 400 - Bad Request, 401 - Unauthorized, 404 - Not Found
+                 413 - Too Large, 416 - Range Not Satisfiable, 500 - Error
+    """
+    return invoke_approach(event, "get_object_content")
+
+
+def get_objects(event, context):
     """
-    Retrieve objects from s3 based on partition approach
+    Retrieve the contents of several objects with one AssumeRole: the
+    keys given as repeated key parameters, or the first limit objects
+        :param event:
+        :param context:
+        :return: 200 - Success, 207 - Some objects failed or did not fit
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    return invoke_approach(event, "get_objects")
+
+
+def init_upload(event, context):
+    """
+    Returns presigned PUT URLs or POST forms for the keys given as
+    repeated key parameters, so that clients upload straight to S3
         :param event:
         :param context:
         :return: 200 - Success
                  400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    return invoke_approach(event, "init_upload")
+
+
+def get_tenant_object(event, context):
+    """
+    Retrieve objects of every user in the tenant based on partition
+    approach. Requires a token with the tenant_admin role
+        :param event:
+        :param context:
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized, 403 - Forbidden
                  500 - Error, 503 - Unavailable
     """
+    return invoke_approach(event, "get_tenant_object", constants.SCOPE_TENANT)
+
+
+def invoke_approach(event, method_name, scope=None, stream=False):
+    """
+    Resolves the partition approach, builds the tenant context and
+    session policy, and invokes method_name of the approach module. Its
+    response is compressed when the request's Accept-Encoding allows
+        :param event:
+        :param method_name: put_object, get_object, ...
+        :param scope=None: constants.SCOPE_TENANT for tenant-wide operations
+        :param stream=False: return streamed bodies as iterators of bytes
+                             instead of joining them
+    """
     try:
         partition_approach = validate_request(event)
         if isinstance(partition_approach, dict) and \
                 "invalid" in partition_approach:
-            return helper.failure_response(partition_approach, HTTPStatus.BAD_REQUEST)
+            return helper.failure_response(partition_approach,
+                                           HTTPStatus.BAD_REQUEST)
 
         rtm_module = importlib.import_module(partition_approach.value)
         rtm_method_context = getattr(rtm_module, "populate_context")
@@ -73,12 +154,70 @@ def get_object(event, context):
         if "missing_fields" in req_header:
             return helper.failure_response(req_header, HTTPStatus.UNAUTHORIZED)
 
-        policy_template = helper.get_policy_template(partition_approach.value)
+        if "invalid" in req_header:
+            return helper.failure_response({"invalid": req_header["invalid"]},
+                                           HTTPStatus.BAD_REQUEST)
+
+        # Multipart and item list bodies carry several objects
+        if "objects" in req_header and method_name == "put_object":
+            method_name = "put_objects"
+        elif method_name == "put_objects" and "objects" not in req_header:
+            return helper.failure_response({"missing_fields": ["items"]},
+                                           HTTPStatus.BAD_REQUEST)
+        elif method_name == "get_object" and \
+                (event.get("queryStringParameters") or {}).get("mode") == "url":
+            # Presigned URLs let clients download straight from S3
+            method_name = "get_object_urls"
+            try:
+                req_header.update(helper.get_presign_params(event))
+            except ValueError as ex:
+                return helper.failure_response({"invalid": str(ex)},
+                                               HTTPStatus.BAD_REQUEST)
+        elif method_name == "get_object":
+            req_header.update(helper.get_listing_params(event))
+            try:
+                req_header["stream_format"] = streaming.get_stream_format(event)
+            except ValueError as ex:
+                return helper.failure_response({"invalid": str(ex)},
+                                               HTTPStatus.BAD_REQUEST)
+            if req_header["stream_format"]:
+                method_name = "stream_object"
+        elif method_name == "get_objects":
+            try:
+                req_header.update(helper.get_batch_keys(event))
+            except ValueError as ex:
+                return helper.failure_response({"invalid": str(ex)},
+                                               HTTPStatus.BAD_REQUEST)
+        elif method_name == "get_object_content":
+            try:
+                req_header.update(helper.get_content_params(event))
+            except ValueError as ex:
+                return helper.failure_response({"invalid": str(ex)},
+                                               HTTPStatus.BAD_REQUEST)
+        elif method_name == "init_upload":
+            try:
+                req_header.update(helper.get_upload_params(event))
+            except ValueError as ex:
+                return helper.failure_response({"invalid": str(ex)},
+                                               HTTPStatus.BAD_REQUEST)
+
+        policy_name = partition_approach.value
+        if scope == constants.SCOPE_TENANT:
+            if req_header.get("role") != constants.ROLE_TENANT_ADMIN:
+                return helper.failure_response({
+                    "forbidden": "{0} role required".format(constants.ROLE_TENANT_ADMIN)
+                }, HTTPStatus.FORBIDDEN)
+            policy_name = "{0}_{1}".format(policy_name, scope)
+
+        policy_template = helper.get_policy_template(policy_name)
         assume_role_policy = plcymgr.get_policy(policy_template, req_header)
         sts_creds = helper.get_assumed_role_creds("s3", assume_role_policy)
 
-        rtm_method_get = getattr(rtm_module, "get_object")
-        return rtm_method_get(sts_creds, req_header)
+        rtm_method = getattr(rtm_module, method_name)
+        response = rtm_method(sts_creds, req_header)
+        if not stream:
+            response = streaming.buffer(response)
+        return response_body.encode(response, event)
 
     except Exception as ex:
         return helper.failure_response(helper.format_exception(ex))
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Asyncio pipeline for fan-out operations.
+Fan-outs of the approach modules (GetObjectTagging per object of a tag
+listing, one listing per user of a tenant listing, PutObject and
+HeadObject per object of a batch upload) run as coroutines with async
+AWS clients on one event loop, shared by every request of the container
+on a daemon thread, so up to ASYNC_MAX_IN_FLIGHT requests of the
+container are in flight without a thread per request.
+The approach functions stay synchronous: they call the wrappers below,
+which run the coroutines on the loop and return their results, and keep
+their thread pool paths when the pipeline is disabled.
+aiobotocore provides the async clients when it is installed; tests and
+benchmarks install a local stand-in with set_client_factory().
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+
+import botocore
+
+import constants
+import helper
+import upload_engine
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:
+    AioConfig = None
+    get_session = None
+
+
+class AsyncPipeline(object):
+    """
+    Event loop on a daemon thread with async clients cached per service
+    and credentials. The clients share get_max_in_flight() request slots
+        :param create_client: coroutine function(service_name, sts_creds)
+                              returning an async client
+        :param max_clients: clients kept open
+    """
+    def __init__(self, create_client, max_clients):
+        self.create_client = create_client
+        self.max_clients = max_clients
+        self._clients = OrderedDict()
+        self._loop = None
+        self._pid = None
+        self._slots = (0, None)
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        """
+        Runs a coroutine on the pipeline's loop and returns its result
+            :param coro:
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+    async def get_client(self, service_name, sts_creds):
+        """
+        Returns the cached async client of a service for the credentials.
+        Called on the loop, so concurrent callers share one creation. The
+        caller holds the client until release_client(); a client evicted
+        while held is closed by its last release
+            :param service_name:
+            :param sts_creds:
+        """
+        key = (service_name, sts_creds["AccessKeyId"])
+        cached = self._clients.get(key)
+        if cached is None:
+            cached = CachedClient(asyncio.ensure_future(
+                self.create_client(service_name, sts_creds)))
+            self._clients[key] = cached
+        self._clients.move_to_end(key)
+        cached.users += 1
+        while len(self._clients) > self.max_clients:
+            await self.evict(self._clients.popitem(last=False)[1])
+        try:
+            return BoundedClient(await cached.task, self._get_slots(), cached)
+        except Exception:
+            if self._clients.get(key) is cached:
+                del self._clients[key]
+            cached.users -= 1
+            raise
+
+    async def release_client(self, client):
+        """
+        Releases a client returned by get_client()
+            :param client: BoundedClient
+        """
+        cached = client.cached
+        cached.users -= 1
+        if cached.evicted and cached.users == 0:
+            await close_client(cached.task)
+
+    async def evict(self, cached):
+        """
+        Closes an evicted client now, or on its last release when a
+        request still holds it
+            :param cached: CachedClient
+        """
+        cached.evicted = True
+        if cached.users == 0:
+            await close_client(cached.task)
+
+    def _get_slots(self):
+        if self._slots[0] != get_max_in_flight():
+            self._slots = (get_max_in_flight(), asyncio.Semaphore(get_max_in_flight()))
+        return self._slots[1]
+
+    def _get_loop(self):
+        with self._lock:
+            # A forked process (see server) does not inherit the loop's thread
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._pid = os.getpid()
+                self._clients = OrderedDict()
+                self._slots = (0, None)
+                threading.Thread(target=self._loop.run_forever, daemon=True,
+                                 name="async-pipeline").start()
+            return self._loop
+
+
+class CachedClient(object):
+    """
+    Creation task of a cached client with the number of requests holding
+    the client
+        :param task:
+    """
+    def __init__(self, task):
+        self.task = task
+        self.users = 0
+        self.evicted = False
+
+
+class BoundedClient(object):
+    """
+    Async client whose requests, including paginated ones, each hold one
+    of the pipeline's request slots, so that nested fan-outs share one
+    bound on requests in flight
+        :param client:
+        :param slots: asyncio.Semaphore
+        :param cached: CachedClient of the client
+    """
+    def __init__(self, client, slots, cached):
+        self.client = client
+        self.slots = slots
+        self.cached = cached
+
+    def __getattr__(self, name):
+        operation = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(operation):
+            return operation
+
+        async def bounded_operation(**kwargs):
+            async with self.slots:
+                return await operation(**kwargs)
+
+        return bounded_operation
+
+    def get_paginator(self, operation_name):
+        return BoundedPaginator(self.client.get_paginator(operation_name), self.slots)
+
+
+class BoundedPaginator(object):
+    """
+    Paginator whose page requests each hold one request slot
+        :param paginator:
+        :param slots: asyncio.Semaphore
+    """
+    def __init__(self, paginator, slots):
+        self.paginator = paginator
+        self.slots = slots
+
+    async def paginate(self, **kwargs):
+        pages = self.paginator.paginate(**kwargs).__aiter__()
+        while True:
+            async with self.slots:
+                try:
+                    page = await pages.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield page
+
+
+async def close_client(task):
+    """
+    Closes an evicted client once its creation has completed
+        :param task:
+    """
+    try:
+        client = await task
+    except Exception:
+        return
+    close = getattr(client, "close", None)
+    if close is not None:
+        result = close()
+        if asyncio.iscoroutine(result):
+            await result
+
+
+async def create_aio_client(service_name, sts_creds):
+    """
+    Returns an aiobotocore client whose connection pool holds
+    ASYNC_MAX_IN_FLIGHT connections
+        :param service_name:
+        :param sts_creds:
+    """
+    client = get_session().create_client(
+        service_name,
+        region_name=os.environ["AWS_REGION"],
+        aws_access_key_id=sts_creds["AccessKeyId"],
+        aws_secret_access_key=sts_creds["SecretAccessKey"],
+        aws_session_token=sts_creds["SessionToken"],
+        config=AioConfig(max_pool_connections=get_max_in_flight()))
+    return await client.__aenter__()
+
+
+_PIPELINE = AsyncPipeline(create_aio_client if get_session else None,
+                          int(os.environ.get("SESSION_CACHE_SIZE",
+                                             constants.SESSION_CACHE_SIZE)) or 1)
+
+
+def get_max_in_flight():
+    """
+    Returns the bound on concurrent requests of one fan-out
+    """
+    return int(os.environ.get("ASYNC_MAX_IN_FLIGHT", constants.ASYNC_MAX_IN_FLIGHT))
+
+
+def is_enabled():
+    """
+    The pipeline is used when an async client is available (aiobotocore
+    or a stand-in) and ASYNC_MAX_IN_FLIGHT is not 0
+    """
+    return _PIPELINE.create_client is not None and get_max_in_flight() > 0
+
+
+def set_client_factory(create_client):
+    """
+    Replaces the async client factory, e.g. with a local stand-in, and
+    returns the previous one; None disables the pipeline
+        :param create_client: coroutine function(service_name, sts_creds)
+    """
+    previous = _PIPELINE.create_client
+    _PIPELINE.create_client = create_client
+    _PIPELINE._clients = OrderedDict()
+    return previous
+
+
+async def gather(func, items):
+    """
+    Awaits func(item) for every item concurrently and returns (item,
+    result) pairs in item order. Requests in flight are bounded by the
+    clients' request slots, not here
+        :param func: coroutine function
+        :param items:
+    """
+    async def call(item):
+        return item, await func(item)
+
+    return await asyncio.gather(*[call(item) for item in items])
+
+
+async def list_objects(s3_client, bucket_name, prefix):
+    """
+    Returns all objects under a prefix, following continuation tokens
+        :param s3_client: async client
+        :param bucket_name:
+        :param prefix:
+    """
+    contents = []
+    async for page in s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket=bucket_name, Prefix=prefix):
+        contents.extend(page.get("Contents", []))
+    return contents
+
+
+async def list_common_prefixes(s3_client, bucket_name, prefix, delimiter="/"):
+    """
+    Returns the sub-prefixes directly below a prefix
+        :param s3_client: async client
+        :param bucket_name:
+        :param prefix:
+        :param delimiter="/":
+    """
+    prefixes = []
+    async for page in s3_client.get_paginator("list_objects_v2").paginate(
+            Bucket=bucket_name, Prefix=prefix, Delimiter=delimiter):
+        prefixes.extend(common_prefix["Prefix"]
+                        for common_prefix in page.get("CommonPrefixes", []))
+    return prefixes
+
+
+def call(sts_creds, service_name, func, *args):
+    """
+    Runs func(client, *args) on the loop with the async client of a
+    service and returns its result
+        :param sts_creds:
+        :param service_name:
+        :param func: coroutine function
+        :param args:
+    """
+    async def call_with_client():
+        client = await _PIPELINE.get_client(service_name, sts_creds)
+        try:
+            return await func(client, *args)
+        finally:
+            await _PIPELINE.release_client(client)
+
+    return _PIPELINE.run(call_with_client())
+
+
+def map_objects(sts_creds, service_name, func, items):
+    """
+    Awaits func(client, item) for every item with the async client of a
+    service and returns (item, result) pairs in item order
+        :param sts_creds:
+        :param service_name:
+        :param func: coroutine function
+        :param items:
+    """
+    return call(sts_creds, service_name,
+                lambda client: gather(lambda item: func(client, item), items))
+
+
+def get_tenant_listing(sts_creds, bucket_name, tenant_prefix, list_user=None):
+    """
+    Same as helper.get_tenant_listing, with the user listings in flight
+    together on the loop
+        :param sts_creds:
+        :param bucket_name: bucket name or access point ARN
+        :param tenant_prefix: prefix ending with the delimiter, e.g. tenant_id/
+        :param list_user=None: coroutine function(s3_client, user_prefix)
+                               returning object names
+    """
+    async def list_user_objects(s3_client, user_prefix):
+        return [obj["Key"].rsplit("/", 1)[-1]
+                for obj in await list_objects(s3_client, bucket_name, user_prefix)]
+
+    async def list_tenant(s3_client):
+        user_prefixes = await list_common_prefixes(s3_client, bucket_name, tenant_prefix)
+        return await gather(lambda user_prefix: (list_user or list_user_objects)(
+            s3_client, user_prefix), user_prefixes)
+
+    return {user_prefix[len(tenant_prefix):].rstrip("/"): user_objects
+            for user_prefix, user_objects in sorted(call(sts_creds, "s3", list_tenant))}
+
+
+def put_objects(sts_creds, s3_client, bucket_name, objects, get_key, tagging=None):
+    """
+    Same as helper.put_objects with helper.put_s3_object for each object,
+    with the uploads in flight together on the loop. Bodies above the
+    multipart threshold are uploaded by upload_engine with s3_client on
+    the loop's default executor
+        :param sts_creds:
+        :param s3_client: synchronous client for multipart uploads
+        :param bucket_name:
+        :param objects: [{"object_key", "object_value"}]
+        :param get_key: callable(obj) returning the object key
+        :param tagging=None: see helper.get_tagging()
+    """
+    threshold = upload_engine.get_settings()[0]
+    extra_args = {"Tagging": tagging} if tagging else {}
+
+    async def put_one(async_client, obj):
+        body = obj["object_value"]
+        size = upload_engine.get_size(body)
+        try:
+            if size is None or size > threshold:
+                api_put_resp = await asyncio.get_event_loop().run_in_executor(
+                    None, lambda: upload_engine.upload_object(
+                        s3_client, bucket_name, get_key(obj), body, tagging))
+            else:
+                api_put_resp = await async_client.put_object(
+                    Bucket=bucket_name, Key=get_key(obj),
+                    Body=upload_engine.as_payload(body), **extra_args)
+            return helper.batch_item_result(obj["object_key"],
+                                            result=helper.put_result(api_put_resp))
+        except Exception as ex:
+            return helper.batch_item_result(obj["object_key"], ex=ex)
+
+    return [result for _, result in map_objects(sts_creds, "s3", put_one, objects)]
+
+
+def head_objects(sts_creds, bucket_name, key_names):
+    """
+    Returns {key_name: head_object response} of the keys that exist.
+    Errors other than a missing key, e.g. AccessDenied or throttling, are
+    raised rather than reported as missing keys
+        :param sts_creds:
+        :param bucket_name:
+        :param key_names:
+    """
+    async def head_one(s3_client, key_name):
+        try:
+            return await s3_client.head_object(Bucket=bucket_name, Key=key_name)
+        except botocore.exceptions.ClientError as ex:
+            if ex.response["Error"]["Code"] not in ("NoSuchKey", "NotFound", "404"):
+                raise
+            return None
+
+    return {key_name: api_obj_md
+            for key_name, api_obj_md in map_objects(sts_creds, "s3", head_one, key_names)
+            if api_obj_md is not None}
+
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Storage backends for listing_cache.
+memory - in-process LRU, lost when the container is recycled
+sqlite - local SQLite file, shared by processes on the same host
+redis  - any server speaking the Redis protocol, shared by the fleet
+Every backend offers get(key), set(key, value, ttl), get_version(key),
+incr(key) and stats().
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+import compact_listing
+import constants
+
+
+def serialize(value):
+    """
+    Encodes a cached value for backends that store bytes
+        :param value:
+    """
+    if isinstance(value, compact_listing.CompactListing):
+        return value.to_bytes()
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def deserialize(data):
+    """
+    Decodes a value stored by serialize()
+        :param data:
+    """
+    if data is None:
+        return None
+    if data[:len(compact_listing.MAGIC)] == compact_listing.MAGIC:
+        return compact_listing.CompactListing.from_bytes(data)
+    return json.loads(data)
+
+
+class ListingCache(object):
+    """
+    TTL and byte-bounded LRU cache
+        :param max_bytes:
+        :param ttl: seconds an entry stays valid
+    """
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.current_bytes = 0
+        self.counters = dict.fromkeys(("hits", "misses", "evictions",
+                                       "expirations", "invalidations"), 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the cached value or None
+            :param key:
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores value and evicts least recently used entries over budget
+            :param key:
+            :param value:
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters["evictions"] += 1
+
+    def invalidate(self, key):
+        """
+        Drops the entry for key, if any
+            :param key:
+        """
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.counters["invalidations"] += 1
+
+    def stats(self):
+        """
+        Returns counters, hit ratio and memory usage
+        """
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            stats = dict(self.counters)
+            stats.update({
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            })
+            return stats
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+
+def estimate_size(value):
+    """
+    Returns the approximate memory held by a listing (container and items)
+        :param value:
+    """
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class MemoryBackend(object):
+    """
+    In-process backend. Versions are kept apart from the LRU so that an
+    eviction can never reset a version and resurrect a stale entry
+        :param max_bytes:
+        :param ttl: upper bound for entry TTLs
+    """
+    name = "memory"
+
+    def __init__(self, max_bytes, ttl):
+        self._entries = ListingCache(max_bytes, ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl):
+        self._entries.put(key, value)
+
+    def get_version(self, key):
+        return self._versions.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def stats(self):
+        stats = self._entries.stats()
+        return {"entries": stats["entries"],
+                "bytes": stats["bytes"],
+                "evictions": stats["evictions"]}
+
+
+class SQLiteBackend(object):
+    """
+    Backend on a local SQLite file, e.g. on /tmp or a mounted volume
+        :param path:
+    """
+    name = "sqlite"
+    PURGE_EVERY = 256
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_entries "
+                           "(key TEXT PRIMARY KEY, value BLOB, expires_at REAL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_versions "
+                           "(key TEXT PRIMARY KEY, version INTEGER)")
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?",
+                (key, time.time())).fetchone()
+        return deserialize(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        data = serialize(value)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?)",
+                               (key, data, time.time() + ttl))
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?",
+                                   (time.time(),))
+
+    def get_version(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM cache_versions WHERE key = ?",
+                                     (key,)).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key):
+        with self._lock:
+            # No UPSERT: the SQLite of older Lambda runtimes predates it
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("INSERT OR IGNORE INTO cache_versions VALUES (?, 0)",
+                                   (key,))
+                self._conn.execute("UPDATE cache_versions SET version = version + 1 "
+                                   "WHERE key = ?", (key,))
+                version = self._conn.execute(
+                    "SELECT version FROM cache_versions WHERE key = ?",
+                    (key,)).fetchone()[0]
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return version
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        return {"entries": entries,
+                "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0}
+
+
+class RedisBackend(object):
+    """
+    Backend speaking the Redis serialization protocol (RESP) over TCP,
+    so no client library is needed in the deployment package
+        :param url: redis://host:port/db
+        :param timeout=1.0: socket timeout in seconds
+    """
+    name = "redis"
+
+    def __init__(self, url, timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self, key):
+        return deserialize(self.execute("GET", key))
+
+    def set(self, key, value, ttl):
+        self.execute("SET", key, serialize(value), "PX", int(ttl * 1000))
+
+    def get_version(self, key):
+        version = self.execute("GET", key)
+        return int(version) if version is not None else 0
+
+    def incr(self, key):
+        return self.execute("INCR", key)
+
+    def stats(self):
+        return {"server": "{0}:{1}".format(self.host, self.port)}
+
+    def execute(self, *args):
+        """
+        Sends one command and returns its reply, reconnecting once if the
+        connection of this thread was dropped
+            :param args:
+        """
+        for attempt in (0, 1):
+            try:
+                conn = self._connection()
+                conn.sendall(encode_command(args))
+                return read_reply(self._local.reader)
+            except (ConnectionError, socket.timeout):
+                self._local.conn = None
+                if attempt:
+                    raise
+
+    def _connection(self):
+        if getattr(self._local, "conn", None) is None:
+            conn = socket.create_connection((self.host, self.port), self.timeout)
+            self._local.conn = conn
+            self._local.reader = conn.makefile("rb")
+            if self.db:
+                conn.sendall(encode_command(("SELECT", self.db)))
+                read_reply(self._local.reader)
+        return self._local.conn
+
+
+def encode_command(args):
+    """
+    Encodes a command as a RESP array of bulk strings
+        :param args:
+    """
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def read_reply(reader):
+    """
+    Reads one RESP reply
+        :param reader: buffered binary file of the socket
+    """
+    line = reader.readline()
+    if not line:
+        raise ConnectionError("connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode("utf-8")
+    if kind == b"-":
+        raise RuntimeError(payload.decode("utf-8"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(payload)
+        return None if length < 0 else [read_reply(reader) for _ in range(length)]
+    raise RuntimeError("unexpected reply {0!r}".format(line))
+
+
+def get_backend(name=None):
+    """
+    Returns the backend selected by CACHE_BACKEND (memory, sqlite, redis)
+        :param name=None:
+    """
+    name = name or os.environ.get("CACHE_BACKEND", "memory")
+    if name == SQLiteBackend.name:
+        return SQLiteBackend(os.environ.get("CACHE_SQLITE_PATH",
+                                            constants.CACHE_SQLITE_PATH))
+    if name == RedisBackend.name:
+        return RedisBackend(os.environ.get("CACHE_REDIS_URL",
+                                           constants.CACHE_REDIS_URL))
+    return MemoryBackend(
+        int(os.environ.get("LISTING_CACHE_MAX_BYTES",
+                           constants.LISTING_CACHE_MAX_BYTES)),
+        float(os.environ.get("LISTING_CACHE_TTL", constants.LISTING_CACHE_TTL)))
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Compact representation of a key listing for caching.
+Keys share their common prefix, which is stored once; the rest of every
+key is packed into one bytes buffer addressed by an offsets array, with
+optional size and last-modified arrays. This replaces one Python str (or
+dict) per object with a few contiguous buffers. A digest of the keys and
+object ETags identifies the listing for conditional GETs.
+"""
+
+import bisect
+import hashlib
+import json
+import os
+import re
+import struct
+import sys
+from array import array
+
+MAGIC = b"CL1"
+HEADER = struct.Struct("<3sBIII")
+HAS_SIZES = 1
+HAS_LAST_MODIFIED = 2
+HAS_DIGEST = 4
+DIGEST_SIZE = hashlib.sha256().digest_size
+# Bytes that must be escaped inside a JSON string
+JSON_UNSAFE = re.compile(b'["\\\\\x00-\x1f]')
+
+
+class CompactListing(object):
+    """
+    Sorted keys packed into a single buffer. Slicing returns views sharing
+    the buffers, so pages of a listing are cheap
+        :param prefix: common prefix stripped from every key
+        :param buffer: bytes holding the utf-8 key suffixes back to back
+        :param offsets: len(keys) + 1 positions of the suffixes in buffer
+        :param sizes=None: object sizes
+        :param last_modified=None: epoch seconds
+        :param start=0, stop=None: window of a slice
+        :param digest=None: digest_objects() of the whole listing
+    """
+    __slots__ = ("prefix", "digest", "_buffer", "_offsets", "_sizes", "_last_modified",
+                 "_start", "_stop")
+
+    def __init__(self, prefix, buffer, offsets, sizes=None, last_modified=None,
+                 start=0, stop=None, digest=None):
+        self.prefix = prefix
+        self.digest = digest
+        self._buffer = buffer
+        self._offsets = offsets
+        self._sizes = sizes
+        self._last_modified = last_modified
+        self._start = start
+        self._stop = len(offsets) - 1 if stop is None else stop
+
+    @classmethod
+    def from_objects(cls, objects, with_sizes=False, with_last_modified=False):
+        """
+        Builds a listing from list_objects_v2 Contents in key order
+            :param objects: sequence of {"Key", "Size", "LastModified"}
+            :param with_sizes=False:
+            :param with_last_modified=False:
+        """
+        objects = objects if isinstance(objects, list) else list(objects)
+        prefix = ""
+        if objects:
+            prefix = os.path.commonprefix([objects[0]["Key"], objects[-1]["Key"]])
+            # Cut at a delimiter so every suffix still holds a whole name
+            prefix = prefix[:prefix.rfind("/") + 1]
+
+        buffer = bytearray()
+        offsets = array("I", [0])
+        sizes = array("Q") if with_sizes else None
+        last_modified = array("d") if with_last_modified else None
+        skip = len(prefix)
+        for obj in objects:
+            buffer += obj["Key"][skip:].encode("utf-8")
+            offsets.append(len(buffer))
+            if sizes is not None:
+                sizes.append(obj.get("Size", 0))
+            if last_modified is not None:
+                modified = obj.get("LastModified")
+                last_modified.append(modified.timestamp() if modified else 0.0)
+
+        return cls(prefix, bytes(buffer), offsets, sizes, last_modified,
+                   digest=digest_objects(objects))
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __iter__(self):
+        for index in range(self._start, self._stop):
+            yield self._suffix(index).decode("utf-8")
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError("CompactListing slices do not support a step")
+            # A slice is not the listing the digest identifies
+            return CompactListing(self.prefix, self._buffer, self._offsets,
+                                  self._sizes, self._last_modified,
+                                  self._start + start, self._start + max(start, stop))
+        if item < 0:
+            item += len(self)
+        if not 0 <= item < len(self):
+            raise IndexError("CompactListing index out of range")
+        return self._suffix(self._start + item).decode("utf-8")
+
+    def __contains__(self, key):
+        return self.index(key) >= 0
+
+    def __sizeof__(self):
+        return (object.__sizeof__(self) + sys.getsizeof(self.prefix) +
+                sum(sys.getsizeof(part) for part in
+                    (self._buffer, self._offsets, self._sizes, self._last_modified)
+                    if part is not None))
+
+    def key(self, index):
+        """
+        Returns the full object key at index
+            :param index:
+        """
+        return self.prefix + self[index]
+
+    def size(self, index):
+        """
+        Returns the object size at index, if sizes were kept
+            :param index:
+        """
+        return self._sizes[self._start + index] if self._sizes is not None else None
+
+    def last_modified(self, index):
+        """
+        Returns the last-modified epoch seconds at index, if kept
+            :param index:
+        """
+        return self._last_modified[self._start + index] \
+            if self._last_modified is not None else None
+
+    def names(self):
+        """
+        Yields the object names (last key segment) as returned by the GET APIs
+        """
+        for index in range(self._start, self._stop):
+            yield self._name(index).decode("utf-8")
+
+    def named_keys(self):
+        """
+        Yields (name, full key) pairs, the name as returned by names()
+        """
+        for index in range(self._start, self._stop):
+            yield (self._name(index).decode("utf-8"),
+                   self.prefix + self._suffix(index).decode("utf-8"))
+
+    def index(self, key):
+        """
+        Returns the position of a full key by binary search, or -1
+            :param key:
+        """
+        if not key.startswith(self.prefix):
+            return -1
+        target = key[len(self.prefix):].encode("utf-8")
+        # utf-8 byte order is S3 key order, so bytes compare like the listing
+        position = bisect.bisect_left(_SuffixView(self), target)
+        if position < len(self) and self._suffix(self._start + position) == target:
+            return position
+        return -1
+
+    def names_json(self):
+        """
+        Returns the names as a JSON array (bytes), copying straight from the
+        buffer unless a name needs escaping
+        """
+        lower, upper = self._window_bounds()
+        if JSON_UNSAFE.search(self._buffer, lower, upper):
+            return json.dumps(list(self.names())).encode("utf-8")
+        if not len(self):
+            return b"[]"
+
+        buffer = self._buffer
+        offsets = self._offsets[self._start:self._stop + 1]
+        bounds = zip(offsets, offsets[1:])
+        if buffer.find(b"/", lower, upper) < 0:
+            # Flat listing: every suffix already is a name
+            parts = [buffer[start:stop] for start, stop in bounds]
+        else:
+            parts = [buffer[(buffer.rfind(b"/", start, stop) + 1) or start:stop]
+                     for start, stop in bounds]
+        return b'["' + b'", "'.join(parts) + b'"]'
+
+    def to_bytes(self):
+        """
+        Serializes the listing (or slice) for shared cache backends
+        """
+        flags = (HAS_SIZES if self._sizes is not None else 0) | \
+            (HAS_LAST_MODIFIED if self._last_modified is not None else 0) | \
+            (HAS_DIGEST if self.digest is not None else 0)
+        prefix = self.prefix.encode("utf-8")
+        lower, upper = self._window_bounds()
+        # Offsets are stored as positions in the serialized data, so the
+        # loaded listing can address its suffixes in place
+        shift = HEADER.size + len(prefix) + 4 * (len(self) + 1) - lower
+        offsets = array("I", (offset + shift for offset in
+                              self._offsets[self._start:self._stop + 1]))
+        parts = [HEADER.pack(MAGIC, flags, len(self), len(prefix), upper - lower),
+                 prefix, offsets.tobytes(), memoryview(self._buffer)[lower:upper]]
+        if self._sizes is not None:
+            parts.append(array("Q", self._sizes[self._start:self._stop]).tobytes())
+        if self._last_modified is not None:
+            parts.append(array("d", self._last_modified[self._start:self._stop]).tobytes())
+        if self.digest is not None:
+            parts.append(self.digest)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Loads a serialized listing as views over data, without copying
+            :param data: bytes from to_bytes()
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        view = memoryview(data)
+        magic, flags, count, prefix_len, buffer_len = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("not a serialized CompactListing")
+
+        position = HEADER.size
+        prefix = bytes(view[position:position + prefix_len]).decode("utf-8")
+        position += prefix_len
+        offsets = view[position:position + 4 * (count + 1)].cast("I")
+        position += 4 * (count + 1)
+        position += buffer_len
+        sizes = last_modified = digest = None
+        if flags & HAS_SIZES:
+            sizes = view[position:position + 8 * count].cast("Q")
+            position += 8 * count
+        if flags & HAS_LAST_MODIFIED:
+            last_modified = view[position:position + 8 * count].cast("d")
+            position += 8 * count
+        if flags & HAS_DIGEST:
+            digest = bytes(view[position:position + DIGEST_SIZE])
+        return cls(prefix, data, offsets, sizes, last_modified, digest=digest)
+
+    def _suffix(self, index):
+        return self._buffer[self._offsets[index]:self._offsets[index + 1]]
+
+    def _name(self, index):
+        start, stop = self._offsets[index], self._offsets[index + 1]
+        return self._buffer[(self._buffer.rfind(b"/", start, stop) + 1) or start:stop]
+
+    def _window_bounds(self):
+        return self._offsets[self._start], self._offsets[self._stop]
+
+
+def digest_objects(objects):
+    """
+    Returns a digest of the keys and ETags of listed objects, which
+    changes when an object is added, removed or overwritten
+        :param objects: sequence of {"Key", "ETag"} in key order
+    """
+    # One hash over the joined text is twice as fast as one update per object
+    return hashlib.sha256("".join([obj["Key"] + "\0" + obj.get("ETag", "") + "\n"
+                                   for obj in objects]).encode("utf-8")).digest()
+
+
+class _SuffixView(object):
+    """
+    Sequence of encoded suffixes for bisect over a listing window
+    """
+    __slots__ = ("listing",)
+
+    def __init__(self, listing):
+        self.listing = listing
+
+    def __len__(self):
+        return len(self.listing)
+
+    def __getitem__(self, index):
+        return self.listing._suffix(self.listing._start + index)
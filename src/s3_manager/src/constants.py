@@ -8,3 +8,41 @@ BUCKET_NAME_PFX = "aws-saas-s3-prefix"
 BUCKET_NAME_TAG = "aws-saas-s3-tag"
 BUCKET_NAME_AP = "aws-saas-s3-ap"
 BUCKET_NAME_NSDB = "aws-saas-s3-dbns"
+
+ROLE_TENANT_ADMIN = "tenant_admin"
+SCOPE_TENANT = "tenant"
+FANOUT_MAX_WORKERS = 8
+NOSQL_TENANT_INDEX = "tenant_id-index"
+LISTING_SPLIT_FANOUT = 16
+LISTING_CACHE_MAX_BYTES = 32 * 1024 * 1024
+LISTING_CACHE_TTL = 30
+CACHE_SQLITE_PATH = "/tmp/aws-saas-s3-cache.db"
+CACHE_REDIS_URL = "redis://localhost:6379/0"
+TOKEN_BATCH_MAX = 1000
+TOKEN_MAX_EXPIRES = 24 * 3600
+PUT_BATCH_MAX = 1000
+GET_BATCH_MAX = 100
+GET_BATCH_MAX_BYTES = 4 * 1024 * 1024
+PRESIGN_EXPIRES = 300
+PRESIGN_MAX_EXPIRES = 3600
+PRESIGN_BATCH_MAX = 2000
+UPLOAD_MAX_BYTES = 5 * 1024 * 1024 * 1024
+UPLOAD_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_PART_RETRIES = 3
+UPLOAD_MAX_WORKERS = 4
+DOWNLOAD_PART_SIZE = 8 * 1024 * 1024
+DOWNLOAD_PART_RETRIES = 3
+DOWNLOAD_MAX_WORKERS = 8
+CONTENT_MAX_BYTES = 4 * 1024 * 1024
+OBJECT_CACHE_DIR = "/tmp/aws-saas-s3-objects"
+OBJECT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+OBJECT_CACHE_MAX_OBJECT_BYTES = 8 * 1024 * 1024
+RESPONSE_COMPRESS_MIN_BYTES = 1024
+RESPONSE_COMPRESS_LEVEL = 6
+SESSION_CACHE_SIZE = 1024
+CREDENTIALS_MIN_LIFETIME = 900
+SERVER_PORT = 8080
+SERVER_THREADS = 16
+SERVER_PROCESSES = 1
+ASYNC_MAX_IN_FLIGHT = 256
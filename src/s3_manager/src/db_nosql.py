@@ -7,15 +7,27 @@
 Two operations supported:
 PUT: Store object in bucket, metadata in NoSQL (DynamoDB)
 GET: Retrieve object names from NoSQL (DynamoDB)
+Objects uploaded with presigned URLs get their metadata from the S3
+event handler record_uploads
 """
 
+import logging
 import os
+import time
 from http import HTTPStatus
+from urllib.parse import unquote_plus
 
+import boto3
 import botocore
 
+import async_pipeline
 import constants
 import helper
+import listing_cache
+import streaming
+import upload_engine
+from compact_listing import digest_objects
+from partition_approaches import PartitionApproach
 
 ACCOUNT_ID = os.environ["AWS_ACCOUNT_ID"]
 IAMROLE_LMDEXEC_ARN = os.environ["IAMROLE_LMDEXEC_ARN"]
@@ -23,6 +35,11 @@ NOSQL_DBTABLE_NAME = os.environ["NOSQL_DBTABLE_NAME"]
 NOSQL_DBTABLE_ARN = "arn:aws:dynamodb:{0}:{1}:table/{2}".format(os.environ["AWS_REGION"],
                                                                 os.environ["AWS_ACCOUNT_ID"],
                                                                 NOSQL_DBTABLE_NAME)
+# BatchWriteItem accepts at most 25 put requests per call
+NOSQL_BATCH_WRITE_MAX = 25
+NOSQL_BATCH_WRITE_RETRIES = 5
+
+LOGGER = logging.getLogger(__name__)
 
 
 def put_object(sts_creds, req_header):
@@ -36,19 +53,20 @@ def put_object(sts_creds, req_header):
                  500 - Error, 503 - Unavailable
     """
     try:
+        req_header["key_name"] = get_key_name(req_header)
         s3_client = helper.get_boto3_client("s3", sts_creds)
         helper.check_create_bucket(s3_client, req_header["bucket_name"])
-        api_put_resp = s3_client.put_object(Bucket=req_header["bucket_name"],
-                                            Key=req_header["key_name"],
-                                            Body=req_header["object_value"])
+        api_put_resp = upload_engine.upload_object(s3_client, req_header["bucket_name"],
+                                                   req_header["key_name"],
+                                                   req_header["object_value"])
 
         if api_put_resp and \
                 api_put_resp['ResponseMetadata']['HTTPStatusCode'] == HTTPStatus.OK.value:
             api_obj_md = s3_client.head_object(Bucket=req_header["bucket_name"],
                                                Key=req_header["key_name"])
             ddb_client = helper.get_boto3_client("dynamodb", sts_creds)
-            api_put_md = add_metadata_db(ddb_client, req_header, api_obj_md)
-            return helper.success_response(api_put_md)
+            add_metadata_db(ddb_client, req_header, api_obj_md)
+            return helper.success_response(helper.put_result(api_put_resp))
         else:
             return helper.failure_response("Operation failed. Please retry.",
                                            HTTPStatus.SERVICE_UNAVAILABLE)
@@ -57,13 +75,90 @@ def put_object(sts_creds, req_header):
         return helper.failure_response(helper.format_exception(ex))
 
 
+def put_objects(sts_creds, req_header):
+    """
+    Stores a batch of objects in the bucket concurrently, on the async
+    pipeline or the fan-out pool, and writes their metadata to NoSQL
+    (DynamoDB) with BatchWriteItem
+        :param sts_creds:
+        :param req_header: tenant context with "objects"
+        :return: 201 - Success, 207 - Some objects failed
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+        metadata = {}
+
+        def put_object_md(obj):
+            key_name = get_key_name(req_header, obj["object_key"])
+            result = helper.put_s3_object(s3_client, req_header["bucket_name"],
+                                          key_name, obj["object_value"])
+            api_obj_md = s3_client.head_object(Bucket=req_header["bucket_name"],
+                                               Key=key_name)
+            metadata[key_name] = get_metadata_item(req_header, key_name, api_obj_md)
+            return result
+
+        if async_pipeline.is_enabled():
+            results = async_pipeline.put_objects(
+                sts_creds, s3_client, req_header["bucket_name"], req_header["objects"],
+                lambda obj: get_key_name(req_header, obj["object_key"]))
+            stored = [get_key_name(req_header, result["key"])
+                      for result in results if "result" in result]
+            for key_name, api_obj_md in async_pipeline.head_objects(
+                    sts_creds, req_header["bucket_name"], stored).items():
+                metadata[key_name] = get_metadata_item(req_header, key_name, api_obj_md)
+        else:
+            results = helper.put_objects(put_object_md, req_header["objects"])
+
+        failed = set()
+        if metadata:
+            ddb_client = helper.get_boto3_client("dynamodb", sts_creds)
+            failed.update(write_metadata_db(ddb_client, list(metadata.values())))
+            listing_cache.record_put(PartitionApproach.db_nosql.value, req_header)
+        for result in results:
+            key_name = get_key_name(req_header, result["key"])
+            if "result" in result and (key_name in failed or key_name not in metadata):
+                result.update({"statusCode": HTTPStatus.SERVICE_UNAVAILABLE.value,
+                               "error": "metadata not stored, please retry"})
+                result.pop("result", None)
+        return helper.batch_response(results)
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def init_upload(sts_creds, req_header):
+    """
+    Returns presigned uploads of the requested objects below
+    {tenant_id/user_id}. Their metadata is stored by record_uploads when
+    S3 reports the created objects
+        :param sts_creds:
+        :param req_header: tenant context with "object_keys", "upload_method",
+            "expires_in" and "max_bytes"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+        keys = [(name, get_key_name(req_header, name)) for name in req_header["object_keys"]]
+        return helper.presigned_uploads_response(sts_creds, req_header["bucket_name"], keys,
+                                                 req_header)
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
 def get_object(sts_creds, req_header):
     """
     Retrieve objects from NoSQL (DynamoDB) based on
     {tenant_id, user_id} as partition key
         :param sts_creds:
         :param req_header:
-        :return: 200 - Success
+        :return: 200 - Success, 304 - Not Modified
                  400 - Bad Request, 401 - Unauthorized
                  500 - Error, 503 - Unavailable
     """
@@ -72,8 +167,70 @@ def get_object(sts_creds, req_header):
         resp_metadata = read_metadata_db(ddb_client, req_header)
         user_objects = [obj['key_name']['S'].rsplit('/', 1)[-1]
                         for obj in resp_metadata['Items']]
-        return helper.success_response(user_objects,
-                                       HTTPStatus.OK)
+        # Items come in key_name order and carry the object ETag, so an
+        # overwrite changes the listing ETag even when the names do not
+        etag = helper.format_etag(digest_objects(
+            [{"Key": obj['key_name']['S'], "ETag": obj.get('etag', {}).get('S', '')}
+             for obj in resp_metadata['Items']]))
+        return helper.listing_response(user_objects, req_header, etag)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def stream_object(sts_creds, req_header):
+    """
+    Streams the objects of {tenant_id, user_id} from NoSQL (DynamoDB)
+    page by page as the query returns them
+        :param sts_creds:
+        :param req_header: tenant context with "stream_format"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error, 503 - Unavailable
+    """
+    try:
+        ddb_client = helper.get_boto3_client("dynamodb", sts_creds)
+        return streaming.listing_response(
+            read_metadata_pages(ddb_client, req_header),
+            lambda items: [obj['key_name']['S'].rsplit('/', 1)[-1] for obj in items],
+            req_header["stream_format"],
+            required=False)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_objects(sts_creds, req_header):
+    """
+    Retrieve the contents of several objects, addressed by their key_name
+    in NoSQL (DynamoDB), with one client, concurrently on the fan-out pool
+        :param sts_creds:
+        :param req_header: tenant context with "object_keys" or "limit"
+        :return: 200 - Success, 207 - Some objects failed or did not fit
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        if "object_keys" in req_header:
+            keys = [(name, get_key_name(req_header, name))
+                    for name in req_header["object_keys"]]
+        else:
+            ddb_client = helper.get_boto3_client("dynamodb", sts_creds)
+            items = read_metadata_db(ddb_client, req_header)['Items'][:req_header["limit"]]
+            keys = [(obj['key_name']['S'].rsplit('/', 1)[-1], obj['key_name']['S'])
+                    for obj in items]
+
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        results = helper.get_objects(s3_client, req_header["bucket_name"], keys)
+        return helper.batch_response(results, HTTPStatus.OK)
 
     except botocore.exceptions.ClientError as ex:
         return helper.failure_response_message(helper.format_exception(ex),
@@ -83,15 +240,187 @@ def get_object(sts_creds, req_header):
         return helper.failure_response(helper.format_exception(ex))
 
 
+def get_object_content(sts_creds, req_header):
+    """
+    Retrieve the contents of one object, or a Range of it, below
+    {tenant_id/user_id}
+        :param sts_creds:
+        :param req_header: tenant context with "object_key" and "range"
+        :return: 200 - Success, 206 - Partial Content
+                 400 - Bad Request, 401 - Unauthorized, 404 - Not Found
+                 413 - Too Large, 416 - Range Not Satisfiable, 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        return helper.object_content_response(s3_client, req_header["bucket_name"],
+                                              get_key_name(req_header),
+                                              req_header["range"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_object_urls(sts_creds, req_header):
+    """
+    Returns presigned download URLs for the user's objects whose
+    key_name is recorded in NoSQL (DynamoDB)
+        :param sts_creds:
+        :param req_header: tenant context with "expires_in" and "limit"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        ddb_client = helper.get_boto3_client("dynamodb", sts_creds)
+        items = read_metadata_db(ddb_client, req_header)['Items'][:req_header["limit"]]
+        keys = [(obj['key_name']['S'].rsplit('/', 1)[-1], obj['key_name']['S'])
+                for obj in items]
+        return helper.presigned_urls_response(sts_creds, req_header["bucket_name"], keys,
+                                              req_header["expires_in"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_tenant_object(sts_creds, req_header):
+    """
+    Retrieve objects of every user in the tenant from the
+    NoSQL (DynamoDB) tenant index
+        :param sts_creds:
+        :param req_header:
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized, 403 - Forbidden
+                 500 - Error, 503 - Unavailable
+    """
+    try:
+        ddb_client = helper.get_boto3_client("dynamodb", sts_creds)
+        tenant_objects = {}
+        for obj in read_tenant_metadata_db(ddb_client, req_header):
+            user_id = obj['id_concat']['S'].split('^', 1)[-1]
+            tenant_objects.setdefault(user_id, []).append(
+                obj['key_name']['S'].rsplit('/', 1)[-1])
+
+        if tenant_objects:
+            return helper.success_response(dict(sorted(tenant_objects.items())),
+                                           HTTPStatus.OK)
+        else:
+            return helper.failure_response("Operation failed. Please retry.",
+                                           HTTPStatus.SERVICE_UNAVAILABLE)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def record_uploads(event, context):
+    """
+    S3 event handler (s3:ObjectCreated:*) of the db_nosql bucket: stores
+    the metadata of objects uploaded with presigned URLs. Objects stored
+    through put_object are written again with the same item. Raises when
+    some metadata could not be written, so that Lambda retries the event
+        :param event:
+        :param context:
+    """
+    s3_client = boto3.client("s3")
+    items = {}
+    users = {}
+    for record in event.get("Records", []):
+        bucket_name = record["s3"]["bucket"]["name"]
+        key_name = unquote_plus(record["s3"]["object"]["key"])
+        key_parts = key_name.split("/", 2)
+        if len(key_parts) < 3 or not key_parts[2]:
+            LOGGER.warning("Skipping %s: not a tenant object", key_name)
+            continue
+
+        req_header = {
+            "tenant_id": key_parts[0],
+            "user_id": key_parts[1],
+            "bucket_name": bucket_name,
+            "nosql_partition_key": "{0}^{1}".format(key_parts[0], key_parts[1])
+        }
+        try:
+            api_obj_md = s3_client.head_object(Bucket=bucket_name, Key=key_name)
+        except botocore.exceptions.ClientError as ex:
+            # Deleted or overwritten since the event; a later event covers it
+            LOGGER.warning("Skipping %s: %s", key_name, ex)
+            continue
+        items[key_name] = get_metadata_item(req_header, key_name, api_obj_md)
+        users[req_header["nosql_partition_key"]] = req_header
+
+    failed = write_metadata_db(boto3.client("dynamodb"), list(items.values()))
+    for req_header in users.values():
+        listing_cache.record_put(PartitionApproach.db_nosql.value, req_header)
+    if failed:
+        raise RuntimeError("Metadata not stored for {0}".format(sorted(failed)))
+    return {"recorded": len(items)}
+
+
 def add_metadata_db(ddb_client, req_header, obj_md):
     """
     Stores metadata in a NoSQL Database (DynamoDB)
     """
+    item = get_metadata_item(req_header, req_header["key_name"], obj_md)
+    api_put_md = ddb_client.put_item(TableName=NOSQL_DBTABLE_NAME,
+                                     Item=item)
+    listing_cache.record_put(PartitionApproach.db_nosql.value, req_header)
+    return api_put_md
+
+
+def write_metadata_db(ddb_client, items):
+    """
+    Stores metadata items with BatchWriteItem, NOSQL_BATCH_WRITE_MAX per
+    call and the calls on the fan-out pool. Unprocessed items are retried
+    with backoff; returns the key_names that could not be written
+        :param ddb_client:
+        :param items: see get_metadata_item()
+    """
+    def write_batch(batch):
+        requests = [{"PutRequest": {"Item": item}} for item in batch]
+        for attempt in range(NOSQL_BATCH_WRITE_RETRIES + 1):
+            if attempt:
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+            try:
+                api_batch_resp = ddb_client.batch_write_item(
+                    RequestItems={NOSQL_DBTABLE_NAME: requests})
+            except botocore.exceptions.ClientError as ex:
+                LOGGER.error("Metadata batch write failed: %s", ex)
+                break
+            requests = api_batch_resp.get("UnprocessedItems", {}).get(NOSQL_DBTABLE_NAME)
+            if not requests:
+                return []
+        return [request["PutRequest"]["Item"]["key_name"]["S"] for request in requests]
+
+    batches = [tuple(items[index:index + NOSQL_BATCH_WRITE_MAX])
+               for index in range(0, len(items), NOSQL_BATCH_WRITE_MAX)]
+    failed = set()
+    for batch, unprocessed in helper.fan_out(write_batch, batches):
+        failed.update(unprocessed)
+    return failed
+
+
+def get_metadata_item(req_header, key_name, obj_md):
+    """
+    Returns the metadata item of an object
+        :param req_header:
+        :param key_name:
+        :param obj_md: head_object response
+    """
     object_url = "https://{0}.s3.amazonaws.com/{1}".format(req_header["bucket_name"],
-                                                           req_header["key_name"],)
-    item = {
+                                                           key_name)
+    return {
         "id_concat": {"S": req_header["nosql_partition_key"]},
-        "key_name": {"S": req_header["key_name"]},
+        "key_name": {"S": key_name},
         "tenant_id": {"S": req_header["tenant_id"]},
         "user_id": {"S": req_header["user_id"]},
         "bucket_name": {"S": req_header["bucket_name"]},
@@ -102,22 +431,64 @@ def add_metadata_db(ddb_client, req_header, obj_md):
         "contenttype": {"S": obj_md.get("ContentType", "")}
     }
 
-    return ddb_client.put_item(TableName=NOSQL_DBTABLE_NAME,
-                               Item=item)
-
 
 def read_metadata_db(ddb_client, req_header):
     """
-    Returns metadata from NoSQL Database (DynamoDB)
+    Returns metadata from NoSQL Database (DynamoDB), served from the
+    listing cache until the user writes again. record_uploads writes it
+    from another Lambda, so only a shared cache backend is used
+    """
+    def query_metadata():
+        api_query_resp = ddb_client.query(TableName=NOSQL_DBTABLE_NAME,
+                                          ProjectionExpression='key_name, etag',
+                                          KeyConditionExpression='id_concat= :id_concat',
+                                          ExpressionAttributeValues={
+                                              ':id_concat': {
+                                                  'S': req_header["nosql_partition_key"]
+                                              }
+                                          })
+        return {"Items": api_query_resp["Items"]}
+
+    return listing_cache.get_listing(PartitionApproach.db_nosql.value, req_header,
+                                     query_metadata, kind="metadata", shared_only=True)
+
+
+def read_metadata_pages(ddb_client, req_header):
+    """
+    Yields the items of each page of the user's metadata from NoSQL
+    Database (DynamoDB), bypassing the listing cache
+    """
+    paginator = ddb_client.get_paginator("query")
+    pages = paginator.paginate(TableName=NOSQL_DBTABLE_NAME,
+                               ProjectionExpression='key_name',
+                               KeyConditionExpression='id_concat= :id_concat',
+                               ExpressionAttributeValues={
+                                   ':id_concat': {
+                                       'S': req_header["nosql_partition_key"]
+                                   }
+                               })
+    for page in pages:
+        yield page['Items']
+
+
+def read_tenant_metadata_db(ddb_client, req_header):
+    """
+    Yields metadata of all users of a tenant from the tenant index,
+    page by page, of NoSQL Database (DynamoDB)
     """
-    return ddb_client.query(TableName=NOSQL_DBTABLE_NAME,
-                            ProjectionExpression='key_name',
-                            KeyConditionExpression='id_concat= :id_concat',
-                            ExpressionAttributeValues={
-                                ':id_concat': {
-                                    'S': req_header["nosql_partition_key"]
-                                }
-                            })
+    paginator = ddb_client.get_paginator("query")
+    pages = paginator.paginate(TableName=NOSQL_DBTABLE_NAME,
+                               IndexName=constants.NOSQL_TENANT_INDEX,
+                               ProjectionExpression='id_concat, key_name',
+                               KeyConditionExpression='tenant_id= :tenant_id',
+                               ExpressionAttributeValues={
+                                   ':tenant_id': {
+                                       'S': req_header["tenant_id"]
+                                   }
+                               })
+    for page in pages:
+        for item in page['Items']:
+            yield item
 
 
 def populate_context(event):
@@ -132,16 +503,25 @@ def populate_context(event):
     bucket_name = "{0}-{1}".format(constants.BUCKET_NAME_NSDB,
                                    os.environ["AWS_ACCOUNT_ID"])
 
-    key_name = '{0}/{1}/{2}'.format(req_header['tenant_id'],
-                                    req_header['user_id'],
-                                    req_header.get("object_key"))
-
     req_header.update({
         "bucket_name": bucket_name,
         "bucket_arn": "arn:aws:s3:::{0}".format(bucket_name),
-        "key_name": key_name,
+        "key_name": get_key_name(req_header),
         "nosql_table_arn": NOSQL_DBTABLE_ARN,
+        "nosql_tenant_index_arn": "{0}/index/{1}".format(NOSQL_DBTABLE_ARN,
+                                                         constants.NOSQL_TENANT_INDEX),
         "nosql_partition_key": "{0}^{1}".format(req_header['tenant_id'],
                                                 req_header['user_id'])
     })
     return req_header
+
+
+def get_key_name(req_header, object_key=None):
+    """
+    Returns the object key {tenant_id}/{user_id}/{object_key}
+        :param req_header:
+        :param object_key=None: defaults to the object_key of req_header
+    """
+    return '{0}/{1}/{2}'.format(req_header['tenant_id'],
+                                req_header['user_id'],
+                                object_key or req_header.get("object_key"))
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Ranged download engine for object contents. An object is read as
+DOWNLOAD_PART_SIZE byte ranges fetched concurrently: the first ranged GET
+also reports the object size and ETag, so no HEAD is needed, and later
+ranges are requested with IfMatch on that ETag so that an overwrite
+during the read fails it instead of mixing two versions. read_all()
+reassembles the ranges into one preallocated buffer; iter_chunks() yields
+them in order with at most max_workers ranges in flight. A client Range
+header (one bytes= range) selects the part of the object that is read.
+"""
+
+import collections
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore
+
+import constants
+from upload_engine import is_retryable
+
+BYTE_RANGE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+READ_CHUNK = 1024 * 1024
+
+
+class RangeNotSatisfiable(ValueError):
+    """
+    Raised for a Range that starts beyond the end of the object
+        :param size: object size, for Content-Range: bytes */size
+    """
+    def __init__(self, size):
+        super(RangeNotSatisfiable, self).__init__("range not satisfiable")
+        self.size = size
+
+
+def get_settings():
+    """
+    Returns (part size, retries, workers) from the environment
+    """
+    return (int(os.environ.get("DOWNLOAD_PART_SIZE", constants.DOWNLOAD_PART_SIZE)),
+            int(os.environ.get("DOWNLOAD_PART_RETRIES", constants.DOWNLOAD_PART_RETRIES)),
+            int(os.environ.get("DOWNLOAD_MAX_WORKERS", constants.DOWNLOAD_MAX_WORKERS)))
+
+
+def parse_range(range_header):
+    """
+    Returns (first, last) of a single bytes= Range header; first is None
+    for a suffix range (last bytes) and last is None for an open range.
+    Returns None for a missing, multiple or malformed range, which is
+    served as the whole object
+        :param range_header:
+    """
+    match = BYTE_RANGE.match(range_header or "")
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = (int(value) if value else None for value in match.groups())
+    if first is not None and last is not None and last < first:
+        return None
+    return first, last
+
+
+def resolve_range(range_header, size):
+    """
+    Returns (start, end, partial) of the bytes a Range header selects
+    from an object of size bytes
+        :param range_header:
+        :param size:
+    """
+    byte_range = parse_range(range_header)
+    if byte_range is None:
+        return 0, size, False
+    first, last = byte_range
+    if first is None:
+        if not last or not size:
+            raise RangeNotSatisfiable(size)
+        return max(size - last, 0), size, True
+    if first >= size:
+        raise RangeNotSatisfiable(size)
+    return first, size if last is None else min(last + 1, size), True
+
+
+class RangedDownload(object):
+    """
+    Read of one object, or of the client's range of it, as concurrent
+    byte ranges
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param key_name:
+        :param range_header=None: client Range header
+        :param part_size=None:
+        :param max_workers=None:
+        :param retries=None: attempts per range after the first
+        :param if_none_match=None: ETag of a cached copy; the first request
+            then fails with a 304 ClientError while that copy is current
+    """
+    def __init__(self, s3_client, bucket_name, key_name, range_header=None,
+                 part_size=None, max_workers=None, retries=None, if_none_match=None):
+        settings = get_settings()
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key_name = key_name
+        self.part_size = part_size or settings[0]
+        self.retries = settings[1] if retries is None else retries
+        self.max_workers = max_workers or settings[2]
+        self._first_body = None
+        self._conditions = {"IfNoneMatch": if_none_match} if if_none_match else {}
+        self._open(parse_range(range_header))
+
+    @property
+    def length(self):
+        return self.end - self.start
+
+    @property
+    def content_range(self):
+        """
+        Returns the Content-Range of a partial read, else None
+        """
+        if not self.partial:
+            return None
+        return "bytes {0}-{1}/{2}".format(self.start, self.end - 1, self.size)
+
+    def _open(self, byte_range):
+        # A suffix range needs the size before the first byte is known
+        if byte_range is not None and byte_range[0] is None:
+            api_head_resp = self.s3_client.head_object(Bucket=self.bucket_name,
+                                                       Key=self.key_name, **self._conditions)
+            self._set_object(api_head_resp, api_head_resp["ContentLength"])
+            self.start = max(self.size - byte_range[1], 0)
+            self.end = self.size
+            self.partial = True
+            if not byte_range[1] or not self.size:
+                raise RangeNotSatisfiable(self.size)
+            return
+
+        first, last = byte_range or (0, None)
+        request_last = first + self.part_size - 1
+        if last is not None:
+            request_last = min(request_last, last)
+        try:
+            api_get_resp = self.s3_client.get_object(
+                Bucket=self.bucket_name, Key=self.key_name,
+                Range="bytes={0}-{1}".format(first, request_last), **self._conditions)
+        except botocore.exceptions.ClientError as ex:
+            if ex.response["Error"]["Code"] != "InvalidRange":
+                raise
+            api_head_resp = self.s3_client.head_object(Bucket=self.bucket_name,
+                                                       Key=self.key_name, **self._conditions)
+            if api_head_resp["ContentLength"] or byte_range is not None:
+                raise RangeNotSatisfiable(api_head_resp["ContentLength"])
+            # Empty objects cannot satisfy any range
+            api_get_resp = self.s3_client.get_object(Bucket=self.bucket_name,
+                                                     Key=self.key_name)
+
+        content_range = api_get_resp.get("ContentRange")
+        size = int(content_range.rsplit("/", 1)[-1]) if content_range \
+            else api_get_resp["ContentLength"]
+        self._set_object(api_get_resp, size)
+        self.start = first
+        self.end = size if last is None else min(last + 1, size)
+        self.partial = byte_range is not None
+        self._first_body = api_get_resp["Body"]
+        self._first_end = first + api_get_resp["ContentLength"]
+
+    def _set_object(self, api_resp, size):
+        self.size = size
+        self.etag = api_resp.get("ETag")
+        self.content_type = api_resp.get("ContentType") or "binary/octet-stream"
+
+    def ranges(self):
+        """
+        Returns the (offset, length) ranges left after the first GET
+        """
+        offset = self._first_end if self._first_body is not None else self.start
+        return [(position, min(self.part_size, self.end - position))
+                for position in range(offset, self.end, self.part_size)]
+
+    def read_range(self, offset, view):
+        """
+        Fills view with the object bytes at offset, retrying throttling,
+        server and connection errors
+            :param offset:
+            :param view: writable memoryview of the range length
+        """
+        extra_args = {"IfMatch": self.etag} if self.etag else {}
+        for attempt in range(self.retries + 1):
+            try:
+                api_get_resp = self.s3_client.get_object(
+                    Bucket=self.bucket_name, Key=self.key_name,
+                    Range="bytes={0}-{1}".format(offset, offset + len(view) - 1),
+                    **extra_args)
+                read_into(api_get_resp["Body"], view)
+                return
+            except (botocore.exceptions.ClientError,
+                    botocore.exceptions.BotoCoreError) as ex:
+                if attempt == self.retries or not is_retryable(ex):
+                    raise
+                time.sleep(min(0.1 * 2 ** attempt, 2.0))
+
+    def read_all(self):
+        """
+        Returns the bytes read as a bytearray, the ranges written
+        concurrently into place
+        """
+        buffer = bytearray(self.length)
+        view = memoryview(buffer)
+        ranges = self.ranges()
+        if self._first_body is not None:
+            read_into(self._first_body, view[:self._first_end - self.start])
+            self._first_body = None
+        if ranges:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ranges))) as executor:
+                futures = [executor.submit(self.read_range, offset,
+                                           view[offset - self.start:
+                                                offset - self.start + length])
+                           for offset, length in ranges]
+                for future in futures:
+                    future.result()
+        return buffer
+
+    def iter_chunks(self):
+        """
+        Yields the bytes read in order, one range at a time, prefetching
+        at most max_workers ranges
+        """
+        ranges = collections.deque(self.ranges())
+        if self._first_body is not None:
+            body, self._first_body = self._first_body, None
+            for chunk in iter(lambda: body.read(READ_CHUNK), b""):
+                yield chunk
+        if not ranges:
+            return
+
+        def fetch(byte_range):
+            buffer = bytearray(byte_range[1])
+            self.read_range(byte_range[0], memoryview(buffer))
+            return buffer
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = collections.deque(executor.submit(fetch, ranges.popleft())
+                                        for _ in range(min(self.max_workers, len(ranges))))
+            while pending:
+                chunk = pending.popleft().result()
+                if ranges:
+                    pending.append(executor.submit(fetch, ranges.popleft()))
+                yield chunk
+
+    def close(self):
+        """
+        Releases the connection of an unread first GET
+        """
+        if self._first_body is not None:
+            self._first_body.close()
+            self._first_body = None
+
+
+def read_into(body, view):
+    """
+    Reads a StreamingBody into view; fails if it ends early
+        :param body:
+        :param view:
+    """
+    filled = 0
+    readinto = getattr(body, "readinto", None)
+    while filled < len(view):
+        if readinto is not None:
+            count = readinto(view[filled:filled + READ_CHUNK])
+        else:
+            chunk = body.read(min(READ_CHUNK, len(view) - filled))
+            count = len(chunk)
+            view[filled:filled + count] = chunk
+        if not count:
+            raise botocore.exceptions.IncompleteReadError(actual_bytes=filled,
+                                                          expected_bytes=len(view))
+        filled += count
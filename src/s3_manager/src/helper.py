@@ -8,29 +8,54 @@ Helper module used by different partition approaches
 """
 from __future__ import print_function
 
+import base64
+import datetime
+import hashlib
 import json
 import os
 import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from http import HTTPStatus
 from os.path import dirname, join
+from urllib.parse import urlencode
+from xml.sax.saxutils import escape
 
 import boto3
 import botocore
 
+import constants
+import download_engine
+import object_cache
+import presigner
+import request_body
+import response_body
+import session_cache
 import token_manager as tkmgr
+import upload_engine
+from compact_listing import CompactListing
+from token_revocation import TokenRevokedError
 
 X_TOKEN = "x-token"
 X_TENANT_ID = "x-tenant-id"
 X_USER_ID = "x-user-id"
 
+_CLIENT_LOCK = threading.Lock()
+
 
 def get_tenant_context(event):
     """
     Returns a JSON object with tenant context
         :param event:
     """""
-    req_header = tkmgr.get_header(check_null_field(event, "headers", {}))
+    try:
+        req_header = tkmgr.get_header(check_null_field(event, "headers", {}))
+    except TokenRevokedError:
+        return {
+            "missing_fields": [X_TOKEN],
+            "revoked": True
+        }
 
     if "token" not in req_header:
         return {
@@ -41,12 +66,13 @@ def get_tenant_context(event):
         "tenant_id": req_header["tenant_id"],
         "user_id": req_header["user_id"],
         "token": req_header["token"],
+        "role": req_header.get("role"),
     }
 
-    if event.get("body"):
-        body_json = json.loads(event.get("body").replace("'", "\""))
-        req_header["object_key"] = body_json.get("key", "")
-        req_header["object_value"] = body_json.get("value", "")
+    try:
+        req_header.update(request_body.decode_body(event))
+    except request_body.InvalidBodyError as ex:
+        req_header["invalid"] = str(ex)
 
     return req_header
 
@@ -65,13 +91,21 @@ def get_policy_template(file_name):
 
 def get_assumed_role_creds(service_name, assume_role_policy):
     """
-    Returns a new assume role object with AccessID, SecretKey and SessionToken
+    Returns an assume role object with AccessID, SecretKey and SessionToken,
+    reused from the session cache while it is valid
         :param service_name:
         :param assume_role_policy:
     """
+    return session_cache.get_credentials(assume_role_policy, assume_role)
+
 
-    sts_client = boto3.client("sts", region_name=os.environ["AWS_REGION"])
-    assumed_role = sts_client.assume_role(
+def assume_role(assume_role_policy):
+    """
+    Returns new credentials of the Lambda execution role restricted by
+    the session policy
+        :param assume_role_policy:
+    """
+    assumed_role = get_sts_client().assume_role(
         RoleArn=os.environ["IAMROLE_LMDEXEC_ARN"],
         RoleSessionName="aws-saasfactory-s3",
         Policy=json.dumps(assume_role_policy),
@@ -81,18 +115,39 @@ def get_assumed_role_creds(service_name, assume_role_policy):
     return credentials
 
 
+def get_sts_client():
+    """
+    Returns the STS client of the container, kept in the session cache
+    """
+    return session_cache.get_client(
+        "sts", None, lambda: boto3.client("sts", region_name=os.environ["AWS_REGION"]))
+
+
 def get_boto3_client(service_name, sts_creds):
+    """
+    Returns a client based on STS credentials, reused from the session
+    cache along with its connection pool
+        :param service_name:
+        :param sts_creds:
+    """
+    return session_cache.get_client(service_name, sts_creds,
+                                    lambda: create_boto3_client(service_name, sts_creds))
+
+
+def create_boto3_client(service_name, sts_creds):
     """
     Returns a new client based on STS credentials
         :param service_name:
         :param sts_creds:
     """
-    return boto3.client(
-        service_name=service_name,
-        aws_access_key_id=sts_creds["AccessKeyId"],
-        aws_secret_access_key=sts_creds["SecretAccessKey"],
-        aws_session_token=sts_creds["SessionToken"],
-    )
+    # The default session is not thread-safe while it creates clients
+    with _CLIENT_LOCK:
+        return boto3.client(
+            service_name=service_name,
+            aws_access_key_id=sts_creds["AccessKeyId"],
+            aws_secret_access_key=sts_creds["SecretAccessKey"],
+            aws_session_token=sts_creds["SessionToken"],
+        )
 
 
 def get_token(event, context):
@@ -118,6 +173,52 @@ def get_token(event, context):
         return failure_response(str(format_exception(ex)))
 
 
+def get_tokens(event, context):
+    """
+    Vends tokens for many tenant/user pairs in one call. The body is
+    {"users": [{"tenant_id", "user_id"}], "expires_in": seconds}, with
+    expires_in optional and at most TOKEN_MAX_EXPIRES; as for get_token,
+    the tokens carry no role claim
+        :param event:
+        :param context:
+    """
+    try:
+        body = json.loads(event.get("body") or "{}")
+        users = body.get("users") if isinstance(body, dict) else None
+        if not isinstance(users, list) or not users:
+            return failure_response({"missing_fields": ["users"]},
+                                    HTTPStatus.BAD_REQUEST)
+
+        max_users = int(os.environ.get("TOKEN_BATCH_MAX", constants.TOKEN_BATCH_MAX))
+        invalid_users = [index for index, user in enumerate(users)
+                         if not isinstance(user, dict) or
+                         not user.get("tenant_id") or not user.get("user_id")]
+        if len(users) > max_users or invalid_users:
+            return failure_response({"max_users": max_users,
+                                     "invalid_users": invalid_users},
+                                    HTTPStatus.BAD_REQUEST)
+
+        expires_in = body.get("expires_in")
+        max_expires = int(os.environ.get("TOKEN_MAX_EXPIRES", constants.TOKEN_MAX_EXPIRES))
+        if expires_in is not None and (
+                not isinstance(expires_in, int) or isinstance(expires_in, bool) or
+                not 0 < expires_in <= max_expires):
+            return failure_response({"invalid": "expires_in must be 1 to {0} seconds".format(
+                max_expires)}, HTTPStatus.BAD_REQUEST)
+
+        tokens = tkmgr.vend_batch([{"tenant_id": user["tenant_id"],
+                                    "user_id": user["user_id"]} for user in users],
+                                  expires_in=expires_in)
+        return success_response({"tokens": [
+            {"tenant_id": user["tenant_id"], "user_id": user["user_id"], "token": token}
+            for user, token in zip(users, tokens)]}, HTTPStatus.OK)
+
+    except ValueError as ex:
+        return failure_response(str(format_exception(ex)), HTTPStatus.BAD_REQUEST)
+    except Exception as ex:
+        return failure_response(str(format_exception(ex)))
+
+
 def check_create_bucket(s3_client, bucket_name):
     """
     Check and create if the bucket does not exist
@@ -168,6 +269,544 @@ def check_create_access_point(s3_ctl_client, bucket_name, account_id, acpt_name)
                                               Name=acpt_name)
 
 
+def get_max_workers():
+    """
+    Returns the bound on concurrent calls for fan-out operations
+    """
+    return int(os.environ.get("FANOUT_MAX_WORKERS",
+                              constants.FANOUT_MAX_WORKERS))
+
+
+def fan_out(func, items, max_workers=None):
+    """
+    Runs func for each item on a bounded thread pool and yields
+    (item, result) pairs as soon as each call completes
+        :param func:
+        :param items:
+        :param max_workers=None:
+    """
+    items = list(items)
+    if not items:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers or get_max_workers(),
+                                            len(items))) as executor:
+        futures = {executor.submit(func, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def put_objects(put_one, objects, max_workers=None):
+    """
+    Runs put_one(obj) for every object of a batch on the bounded pool.
+    Returns one {"key", "statusCode", "result" or "error"} per object, in
+    request order; a failed object does not stop the others
+        :param put_one: callable(obj) returning a JSON serializable result
+        :param objects: [{"object_key", "object_value"}]
+        :param max_workers=None:
+    """
+    def put_item(index):
+        obj = objects[index]
+        try:
+            return batch_item_result(obj["object_key"], result=put_one(obj))
+        except Exception as ex:
+            return batch_item_result(obj["object_key"], ex=ex)
+
+    results = dict(fan_out(put_item, range(len(objects)), max_workers))
+    return [results[index] for index in range(len(objects))]
+
+
+def batch_item_result(key, result=None, ex=None):
+    """
+    Returns the {"key", "statusCode", "result" or "error"} entry of one
+    object of a batch
+        :param key:
+        :param result=None: JSON serializable result of a stored object
+        :param ex=None: exception of a failed object
+    """
+    if ex is None:
+        return {"key": key, "statusCode": HTTPStatus.CREATED.value, "result": result}
+    if isinstance(ex, botocore.exceptions.ClientError):
+        return {"key": key,
+                "statusCode": ex.response.get("ResponseMetadata", {}).get(
+                    "HTTPStatusCode", HTTPStatus.INTERNAL_SERVER_ERROR.value),
+                "error": ex.response["Error"]["Code"]}
+    return {"key": key,
+            "statusCode": HTTPStatus.INTERNAL_SERVER_ERROR.value,
+            "error": str(ex)}
+
+
+def put_s3_object(s3_client, bucket_name, key_name, body, tagging=None):
+    """
+    Uploads one object and returns put_result() of it
+        :param s3_client:
+        :param bucket_name:
+        :param key_name:
+        :param body: bytes or file object
+        :param tagging=None: see get_tagging()
+    """
+    api_put_resp = upload_engine.upload_object(s3_client, bucket_name, key_name, body,
+                                               tagging)
+    return put_result(api_put_resp)
+
+
+def put_result(api_put_resp):
+    """
+    Returns the fields of a PutObject or CompleteMultipartUpload response
+    that the PUT endpoints return
+        :param api_put_resp:
+    """
+    return response_body.project(api_put_resp, response_body.PUT_OBJECT_FIELDS)
+
+
+def get_objects(s3_client, bucket_name, keys, max_bytes=None, max_workers=None):
+    """
+    Fetches objects on the bounded pool and returns one result per key,
+    in request order: {"key", "statusCode", "value"[, "encoding"]} or
+    {"key", "statusCode", "error"}. Values that are not utf-8 text are
+    base64 encoded. Each object's size is reserved from max_bytes before
+    its GET, so the whole batch holds at most max_bytes of values; objects
+    that no longer fit are reported with 413 instead of their contents
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param keys: (name, object key) pairs
+        :param max_bytes=None: response size budget, GET_BATCH_MAX_BYTES
+        :param max_workers=None:
+    """
+    max_bytes = max_bytes or int(os.environ.get("GET_BATCH_MAX_BYTES",
+                                                constants.GET_BATCH_MAX_BYTES))
+    budget = {"remaining": max_bytes}
+    budget_lock = threading.Lock()
+
+    def reserve(size):
+        with budget_lock:
+            if size > budget["remaining"]:
+                return False
+            budget["remaining"] -= size
+            return True
+
+    def release(size):
+        with budget_lock:
+            budget["remaining"] += size
+
+    def get_item(index):
+        key_name = keys[index][1]
+        try:
+            size = s3_client.head_object(Bucket=bucket_name,
+                                         Key=key_name)["ContentLength"]
+            if not reserve(size):
+                return None
+            try:
+                body = get_s3_object(s3_client, bucket_name, key_name, size) \
+                    if size else b""
+            except Exception:
+                release(size)
+                raise
+            if body is None:
+                # Grown since the HEAD
+                release(size)
+                return None
+            try:
+                return {"value": body.decode("utf-8")}
+            except UnicodeDecodeError:
+                value = base64.b64encode(body).decode("ascii")
+                # The encoded value is larger than the bytes reserved
+                if not reserve(len(value) - size):
+                    release(size)
+                    return None
+                return {"value": value, "encoding": "base64"}
+        except Exception as ex:
+            return ex
+
+    results = [None] * len(keys)
+    for index, item in fan_out(get_item, range(len(keys)), max_workers):
+        name = keys[index][0]
+        if isinstance(item, Exception):
+            results[index] = batch_item_result(name, ex=item)
+            # HEAD errors carry no body, so report them with the codes of GET
+            results[index]["error"] = {"403": "AccessDenied", "404": "NoSuchKey"}.get(
+                results[index]["error"], results[index]["error"])
+        elif item is None:
+            results[index] = {
+                "key": name,
+                "statusCode": HTTPStatus.REQUEST_ENTITY_TOO_LARGE.value,
+                "error": "exceeds the response size budget of {0} bytes".format(max_bytes)}
+        else:
+            results[index] = {"key": name, "statusCode": HTTPStatus.OK.value}
+            results[index].update(item)
+    return results
+
+
+def get_s3_object(s3_client, bucket_name, key_name, max_bytes):
+    """
+    Returns the body of an object, or None if it is larger than max_bytes.
+    The GETs are ranged so that no more than max_bytes are transferred;
+    hot objects are served from object_cache
+        :param s3_client:
+        :param bucket_name:
+        :param key_name:
+        :param max_bytes:
+    """
+    try:
+        download = object_cache.open_object(s3_client, bucket_name, key_name,
+                                            "bytes=0-{0}".format(max_bytes - 1))
+    except download_engine.RangeNotSatisfiable as ex:
+        # Only an empty object cannot satisfy bytes=0-
+        if ex.size:
+            raise
+        return b""
+    try:
+        if download.size > max_bytes:
+            return None
+        return bytes(download.read_all())
+    finally:
+        download.close()
+
+
+def get_content_params(event):
+    """
+    Returns {"object_key", "range"} of an object content request: the
+    key query parameter and the client's Range header
+        :param event:
+    """
+    object_key = (event.get("queryStringParameters") or {}).get("key")
+    if not object_key:
+        raise ValueError("key query parameter is required")
+    headers = {name.lower(): value for name, value in
+               (event.get("headers") or {}).items()}
+    return {"object_key": object_key, "range": headers.get("range")}
+
+
+def object_content_response(s3_client, bucket_name, key_name, range_header=None):
+    """
+    Returns the contents of one object, or of the requested Range (206),
+    read with concurrent ranged GETs or from object_cache. Reads above
+    CONTENT_MAX_BYTES are refused with 413: request a Range or a presigned
+    URL instead
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param key_name:
+        :param range_header=None:
+    """
+    max_bytes = int(os.environ.get("CONTENT_MAX_BYTES", constants.CONTENT_MAX_BYTES))
+    try:
+        download = object_cache.open_object(s3_client, bucket_name, key_name, range_header)
+    except download_engine.RangeNotSatisfiable as ex:
+        response = failure_response({"invalid": str(ex)},
+                                    HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+        response["headers"]["Content-Range"] = "bytes */{0}".format(ex.size)
+        return response
+    except botocore.exceptions.ClientError as ex:
+        if ex.response["Error"]["Code"] not in ("NoSuchKey", "404"):
+            raise
+        return failure_response({"not_found": key_name.rsplit("/", 1)[-1]},
+                                HTTPStatus.NOT_FOUND)
+
+    try:
+        if download.length > max_bytes:
+            return failure_response({
+                "too_large": "{0} bytes; request a Range of at most {1} bytes or "
+                             "a presigned URL (mode=url)".format(download.length, max_bytes)
+            }, HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+        headers = {"Content-Type": download.content_type, "Accept-Ranges": "bytes"}
+        if download.etag:
+            headers["ETag"] = download.etag
+        if download.content_range:
+            headers["Content-Range"] = download.content_range
+        return binary_response(download.read_all(),
+                               HTTPStatus.PARTIAL_CONTENT if download.partial
+                               else HTTPStatus.OK, headers)
+    finally:
+        download.close()
+
+
+def batch_response(results, http_status=HTTPStatus.CREATED):
+    """
+    Returns http_status when every object of a batch succeeded, else 207
+    with the per-object results
+        :param results: see put_objects() and get_objects()
+        :param http_status=HTTPStatus.CREATED:
+    """
+    if all(result["statusCode"] < HTTPStatus.MULTIPLE_CHOICES for result in results):
+        return success_response(results, http_status)
+    return failure_response(results, HTTPStatus.MULTI_STATUS)
+
+
+def get_batch_keys(event):
+    """
+    Returns the objects requested by a batch GET: {"object_keys"} from
+    repeated key query parameters, else {"limit"} for the first objects
+    of the listing (limit query parameter, at most GET_BATCH_MAX)
+        :param event:
+    """
+    max_keys = int(os.environ.get("GET_BATCH_MAX", constants.GET_BATCH_MAX))
+    object_keys = (event.get("multiValueQueryStringParameters") or {}).get("key")
+    if object_keys:
+        if len(object_keys) > max_keys:
+            raise ValueError("at most {0} keys per request".format(max_keys))
+        return {"object_keys": list(dict.fromkeys(object_keys))}
+
+    limit = (event.get("queryStringParameters") or {}).get("limit")
+    try:
+        limit = int(limit) if limit else max_keys
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return {"limit": min(limit, max_keys)}
+
+
+def get_listing_params(event):
+    """
+    Returns {"if_none_match"} of a listing request: the client's
+    If-None-Match header, or None
+        :param event:
+    """
+    headers = {name.lower(): value for name, value in
+               (event.get("headers") or {}).items()}
+    return {"if_none_match": headers.get("if-none-match")}
+
+
+def get_listing_etag(listing):
+    """
+    Returns the ETag of a listing response: from the digest of the keys
+    and object ETags of a CompactListing, else from the names returned
+        :param listing: CompactListing or list of names
+    """
+    digest = getattr(listing, "digest", None) or hashlib.sha256(
+        json.dumps(list(listing)).encode("utf-8")).digest()
+    return format_etag(digest)
+
+
+def format_etag(digest):
+    """
+    Returns a quoted ETag of the first 16 bytes of a digest
+        :param digest:
+    """
+    return '"{0}"'.format(digest[:16].hex())
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Returns True when an If-None-Match header lists etag or is *.
+    Comparison is weak, as RFC 7232 requires for If-None-Match
+        :param if_none_match: header value, e.g. "a", W/"b"
+        :param etag:
+    """
+    if not if_none_match:
+        return False
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == opaque_tag:
+            return True
+    return False
+
+
+def get_presign_params(event):
+    """
+    Returns {"expires_in", "limit"} of a presigned URL request from the
+    expires_in (PRESIGN_EXPIRES, at most PRESIGN_MAX_EXPIRES) and limit
+    (at most PRESIGN_BATCH_MAX) query parameters
+        :param event:
+    """
+    query_string = event.get("queryStringParameters") or {}
+    max_expires = int(os.environ.get("PRESIGN_MAX_EXPIRES", constants.PRESIGN_MAX_EXPIRES))
+    max_urls = int(os.environ.get("PRESIGN_BATCH_MAX", constants.PRESIGN_BATCH_MAX))
+    try:
+        expires_in = int(query_string.get("expires_in") or
+                         os.environ.get("PRESIGN_EXPIRES", constants.PRESIGN_EXPIRES))
+        limit = int(query_string.get("limit") or max_urls)
+    except ValueError:
+        raise ValueError("expires_in and limit must be integers")
+    if not 0 < expires_in <= max_expires or limit < 1:
+        raise ValueError("expires_in must be 1 to {0} seconds and limit positive".format(
+            max_expires))
+    return {"expires_in": expires_in, "limit": min(limit, max_urls)}
+
+
+def get_upload_params(event):
+    """
+    Returns {"object_keys", "upload_method", "max_bytes", "expires_in"} of
+    an upload request: repeated key query parameters (at most
+    PRESIGN_BATCH_MAX), method put or post and, for post, max_bytes (at
+    most UPLOAD_MAX_BYTES)
+        :param event:
+    """
+    query_string = event.get("queryStringParameters") or {}
+    object_keys = (event.get("multiValueQueryStringParameters") or {}).get("key") or \
+        ([query_string["key"]] if query_string.get("key") else [])
+    params = get_presign_params(event)
+    if not object_keys:
+        raise ValueError("at least one key is required")
+    if len(object_keys) > params.pop("limit"):
+        raise ValueError("too many keys per request")
+
+    upload_method = (query_string.get("method") or "put").upper()
+    if upload_method not in ("PUT", "POST"):
+        raise ValueError("method must be put or post")
+    max_upload = int(os.environ.get("UPLOAD_MAX_BYTES", constants.UPLOAD_MAX_BYTES))
+    try:
+        max_bytes = int(query_string.get("max_bytes") or max_upload)
+    except ValueError:
+        raise ValueError("max_bytes must be an integer")
+    if not 0 < max_bytes <= max_upload:
+        raise ValueError("max_bytes must be 1 to {0}".format(max_upload))
+
+    params.update({
+        "object_keys": list(dict.fromkeys(object_keys)),
+        "upload_method": upload_method,
+        "max_bytes": max_bytes
+    })
+    return params
+
+
+def get_presigner(sts_creds, expires_in, signed_headers=None):
+    """
+    Returns a Presigner for the assumed role credentials. URLs stop
+    working when those credentials expire, so expires_in is capped to
+    their lifetime
+        :param sts_creds:
+        :param expires_in:
+        :param signed_headers=None:
+    """
+    expiration = sts_creds.get("Expiration")
+    if expiration is not None:
+        lifetime = (expiration - datetime.datetime.now(expiration.tzinfo)).total_seconds()
+        expires_in = max(min(expires_in, int(lifetime)), 1)
+    return presigner.Presigner(sts_creds, os.environ["AWS_REGION"], expires_in,
+                               signed_headers=signed_headers)
+
+
+def presigned_urls_response(sts_creds, bucket_name, keys, expires_in, method="GET"):
+    """
+    Returns presigned URLs for (name, object key) pairs, signed locally
+    with the assumed role credentials
+        :param sts_creds:
+        :param bucket_name: bucket name or access point ARN
+        :param keys:
+        :param expires_in:
+        :param method="GET":
+    """
+    signer = get_presigner(sts_creds, expires_in)
+    return success_response({
+        "expires_in": signer.expires_in,
+        "objects": signer.presign_all(method, bucket_name, keys)
+    }, HTTPStatus.OK)
+
+
+def presigned_uploads_response(sts_creds, bucket_name, keys, req_header, tag_set=None):
+    """
+    Returns presigned PUT URLs or POST forms for (name, object key) pairs,
+    so that clients upload straight to S3 within the session policy of
+    the tenant. With tag_set every upload must carry those tags: signed
+    x-amz-tagging header for PUT, tagging field for POST
+        :param sts_creds:
+        :param bucket_name: bucket name or access point ARN
+        :param keys:
+        :param req_header: tenant context with "upload_method", "expires_in"
+            and "max_bytes"
+        :param tag_set=None: {"TagSet": [{"Key", "Value"}]}
+    """
+    tags = [(tag["Key"], tag["Value"]) for tag in (tag_set or {}).get("TagSet", [])]
+    if req_header["upload_method"] == "POST":
+        signer = get_presigner(sts_creds, req_header["expires_in"])
+        fields = {"tagging": get_tagging_xml(tags)} if tags else None
+        conditions = [["content-length-range", 0, req_header["max_bytes"]]]
+        objects = []
+        for name, key_name in keys:
+            form = signer.presign_post(bucket_name, key_name, fields, conditions)
+            form["key"] = name
+            objects.append(form)
+    else:
+        headers = {"x-amz-tagging": get_tagging(tag_set)} if tags else None
+        signer = get_presigner(sts_creds, req_header["expires_in"], headers)
+        objects = signer.presign_all("PUT", bucket_name, keys)
+        if headers:
+            for obj in objects:
+                obj["headers"] = headers
+
+    return success_response({
+        "method": req_header["upload_method"],
+        "expires_in": signer.expires_in,
+        "objects": objects
+    }, HTTPStatus.OK)
+
+
+def get_tagging(tag_set):
+    """
+    Returns a tag set as the URL-encoded Tagging of PutObject
+        :param tag_set: {"TagSet": [{"Key", "Value"}]}
+    """
+    return urlencode([(tag["Key"], tag["Value"]) for tag in tag_set["TagSet"]])
+
+
+def get_tagging_xml(tags):
+    """
+    Returns the Tagging document of a POST upload
+        :param tags: [(key, value)]
+    """
+    return "<Tagging><TagSet>{0}</TagSet></Tagging>".format("".join(
+        "<Tag><Key>{0}</Key><Value>{1}</Value></Tag>".format(escape(key), escape(value))
+        for key, value in tags))
+
+
+def list_objects(s3_client, bucket_name, prefix):
+    """
+    Returns all objects under a prefix, following continuation tokens
+        :param s3_client:
+        :param bucket_name:
+        :param prefix:
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    return [obj
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix)
+            for obj in page.get("Contents", [])]
+
+
+def list_common_prefixes(s3_client, bucket_name, prefix, delimiter="/"):
+    """
+    Returns the sub-prefixes directly below a prefix, e.g. one per user
+    below a tenant prefix
+        :param s3_client:
+        :param bucket_name:
+        :param prefix:
+        :param delimiter="/":
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    return [common_prefix["Prefix"]
+            for page in paginator.paginate(Bucket=bucket_name,
+                                           Prefix=prefix,
+                                           Delimiter=delimiter)
+            for common_prefix in page.get("CommonPrefixes", [])]
+
+
+def get_tenant_listing(s3_client, bucket_name, tenant_prefix, list_user=None):
+    """
+    Discovers the users below tenant_prefix and lists their objects
+    concurrently. Returns {user_id: [object names]} sorted by user once
+    every user listing has completed
+        :param s3_client:
+        :param bucket_name:
+        :param tenant_prefix: prefix ending with the delimiter, e.g. tenant_id/
+        :param list_user=None: callable(user_prefix) returning object names
+    """
+    def list_user_objects(user_prefix):
+        return [obj["Key"].rsplit("/", 1)[-1]
+                for obj in list_objects(s3_client, bucket_name, user_prefix)]
+
+    user_prefixes = list_common_prefixes(s3_client, bucket_name, tenant_prefix)
+
+    tenant_objects = {}
+    for user_prefix, user_objects in fan_out(list_user or list_user_objects,
+                                             user_prefixes):
+        user_id = user_prefix[len(tenant_prefix):].rstrip("/")
+        tenant_objects[user_id] = user_objects
+
+    return dict(sorted(tenant_objects.items()))
+
+
 def check_null_field(event, field, default):
     """
     Check for field in event and assign a default value
@@ -198,6 +837,16 @@ def create_response(api_resp, http_status, message=None):
         :param http_status:
         :param message=None:
     """
+    if isinstance(api_resp, CompactListing):
+        # Names are copied into the body straight from the packed buffer
+        body = '{{"status": {0}, "result": {1}}}'.format(
+            json.dumps(http_status.phrase), api_resp.names_json().decode("utf-8"))
+    else:
+        body = response_body.dumps({
+            "status": http_status.phrase,
+            "result": api_resp
+        })
+
     response = {
         "statusCode": http_status.value,
         "headers": {
@@ -205,10 +854,7 @@ def create_response(api_resp, http_status, message=None):
             "Access-Control-Allow-Headers": "Content-Type",
             "Access-Control-Allow-Credentials": True
         },
-        "body": json.dumps({
-            "status": http_status.phrase,
-            "result": api_resp
-        })
+        "body": body
     }
 
     if message:
@@ -219,6 +865,47 @@ def create_response(api_resp, http_status, message=None):
     return response
 
 
+def binary_response(body, http_status, headers=None):
+    """
+    Returns a response with a base64 encoded binary body and CORS headers
+        :param body: bytes-like
+        :param http_status:
+        :param headers=None: extra headers
+    """
+    response = create_response(None, http_status)
+    response["headers"].update(headers or {})
+    response["body"] = base64.b64encode(body).decode("ascii")
+    response["isBase64Encoded"] = True
+    return response
+
+
+def listing_response(listing, req_header, etag=None):
+    """
+    Returns 200 with the listing and its ETag, or 304 without a body when
+    the client's If-None-Match already holds that ETag
+        :param listing: CompactListing or list of names
+        :param req_header: tenant context with "if_none_match"
+        :param etag=None: defaults to get_listing_etag(listing)
+    """
+    etag = etag or get_listing_etag(listing)
+    if etag_matches(req_header.get("if_none_match"), etag):
+        return not_modified_response(etag)
+    response = success_response(listing, HTTPStatus.OK)
+    response["headers"]["ETag"] = etag
+    return response
+
+
+def not_modified_response(etag):
+    """
+    Returns 304 with the ETag and CORS headers and no body
+        :param etag:
+    """
+    response = create_response(None, HTTPStatus.NOT_MODIFIED)
+    response["headers"]["ETag"] = etag
+    response["body"] = ""
+    return response
+
+
 def success_response(api_resp, http_status=HTTPStatus.CREATED):
     """
     Returns a success response with CORS headers
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Parallel listing of large prefixes.
+list_objects_v2 pages are sequential, so the key space below a prefix is
+split into disjoint ranges which are listed concurrently and merged back
+in key order. Ranges are either bounded by StartAfter keys sampled from
+the first page, or by sub-prefixes discovered with a delimiter.
+"""
+
+import heapq
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import constants
+import helper
+
+SPLIT_START_AFTER = "start_after"
+SPLIT_DELIMITER = "delimiter"
+
+
+def list_objects(s3_client, bucket_name, prefix, split=None, max_workers=None):
+    """
+    Returns all objects under a prefix in key order. A listing that fits
+    in one page costs a single request, larger ones are split and listed
+    concurrently
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param prefix:
+        :param split=None: SPLIT_START_AFTER (default) or SPLIT_DELIMITER,
+                           overridden by the LISTING_SPLIT environment variable
+        :param max_workers=None: defaults to helper.get_max_workers()
+    """
+    first_page = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix)
+    contents = first_page.get("Contents", [])
+    if not first_page.get("IsTruncated"):
+        return contents
+
+    max_workers = max_workers or helper.get_max_workers()
+    split = split or os.environ.get("LISTING_SPLIT", SPLIT_START_AFTER)
+    if split == SPLIT_DELIMITER:
+        # Sub-prefixes are only discovered below the delimiter: without it a
+        # user prefix such as t1/user1 would roll up t1/user10/ as well
+        return list_by_delimiter(s3_client, bucket_name,
+                                 prefix if prefix.endswith("/") else prefix + "/",
+                                 max_workers)
+
+    return list_by_ranges(s3_client, bucket_name, prefix, contents, max_workers)
+
+
+def list_by_ranges(s3_client, bucket_name, prefix, first_contents, max_workers):
+    """
+    Lists the key space after the first page as StartAfter ranges. A range
+    task pages through its range and, while workers are idle, hands the
+    rest of its range off as sub-ranges instead of continuing itself
+        :param s3_client:
+        :param bucket_name:
+        :param prefix:
+        :param first_contents: Contents of the first (truncated) page
+        :param max_workers:
+    """
+    alphabet = sample_alphabet(first_contents)
+    fanout = int(os.environ.get("LISTING_SPLIT_FANOUT",
+                                constants.LISTING_SPLIT_FANOUT))
+    segments = {None: first_contents}
+    in_flight = [0]
+    lock = threading.Lock()
+
+    def list_range(key_range):
+        start_after, upper = key_range
+        contents = []
+        kwargs = {"Bucket": bucket_name, "Prefix": prefix, "StartAfter": start_after}
+        while True:
+            resp = s3_client.list_objects_v2(**kwargs)
+            page = resp.get("Contents", [])
+            if upper is not None and page and page[-1]["Key"] >= upper:
+                contents.extend(obj for obj in page if obj["Key"] <= upper)
+                return contents, []
+            contents.extend(page)
+            if not resp.get("IsTruncated") or not page:
+                return contents, []
+
+            with lock:
+                idle = max_workers - in_flight[0]
+            if idle > 0:
+                sub_ranges = split_range(page[-1]["Key"], upper, prefix,
+                                         alphabet, min(idle, fanout))
+                if sub_ranges:
+                    return contents, sub_ranges
+            kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+    def submit(executor, key_range):
+        with lock:
+            in_flight[0] += 1
+        return executor.submit(list_range, key_range)
+
+    last_key = first_contents[-1]["Key"]
+    pending_ranges = split_range(last_key, None, prefix, alphabet,
+                                 min(max_workers, fanout)) or [(last_key, None)]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {submit(executor, key_range): key_range
+                   for key_range in pending_ranges}
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                start_after = futures.pop(future)[0]
+                with lock:
+                    in_flight[0] -= 1
+                contents, sub_ranges = future.result()
+                segments[start_after] = contents
+                for key_range in sub_ranges:
+                    futures[submit(executor, key_range)] = key_range
+
+    # Segments tile the key space, so ordering by lower bound merges them
+    return [obj
+            for start_after in sorted(segments, key=lambda key: key or "")
+            for obj in segments[start_after]]
+
+
+def split_range(start_after, upper, prefix, alphabet, fanout):
+    """
+    Returns sub-ranges [(start_after, b1), (b1, b2), ... (bn, upper)]
+    tiling (start_after, upper]. Boundaries branch off the right edge of
+    start_after using characters sampled from listed keys, so they land
+    in the part of the key space the listing is about to enter
+        :param start_after:
+        :param upper: inclusive upper bound or None
+        :param prefix:
+        :param alphabet: sorted characters to branch on
+        :param fanout: maximum number of boundaries
+    """
+    lowest = len(os.path.commonprefix([start_after, upper])) \
+        if upper is not None else len(prefix)
+
+    boundaries = set()
+    for depth in range(lowest, len(start_after)):
+        stem = start_after[:depth]
+        boundaries.update(stem + char for char in alphabet
+                          if char > start_after[depth])
+    boundaries = sorted(boundary for boundary in boundaries
+                        if boundary > start_after and
+                        (upper is None or boundary < upper))
+    if not boundaries:
+        return []
+
+    if len(boundaries) > fanout:
+        step = len(boundaries) / fanout
+        boundaries = [boundaries[int(i * step)] for i in range(fanout)]
+
+    lowers = [start_after] + boundaries
+    uppers = boundaries + [upper]
+    return list(zip(lowers, uppers))
+
+
+def sample_alphabet(contents):
+    """
+    Returns the sorted set of characters seen in a page of keys
+        :param contents:
+    """
+    alphabet = set()
+    for obj in contents:
+        alphabet.update(obj["Key"])
+    return sorted(alphabet)
+
+
+def list_by_delimiter(s3_client, bucket_name, prefix, max_workers, delimiter="/"):
+    """
+    Discovers sub-prefixes with a delimiter listing (descending while there
+    is a single one) and lists each sub-prefix concurrently. The session
+    policies allow these listings below {user prefix}/
+        :param s3_client:
+        :param bucket_name:
+        :param prefix: prefix ending with the delimiter
+        :param max_workers:
+        :param delimiter="/":
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    while True:
+        direct_contents, sub_prefixes = [], []
+        for page in paginator.paginate(Bucket=bucket_name,
+                                       Prefix=prefix,
+                                       Delimiter=delimiter):
+            direct_contents.extend(page.get("Contents", []))
+            sub_prefixes.extend(common_prefix["Prefix"]
+                                for common_prefix in page.get("CommonPrefixes", []))
+        if direct_contents or len(sub_prefixes) != 1:
+            break
+        prefix = sub_prefixes[0]
+
+    segments = dict(helper.fan_out(
+        lambda sub_prefix: helper.list_objects(s3_client, bucket_name, sub_prefix),
+        sub_prefixes,
+        max_workers))
+
+    return list(heapq.merge(direct_contents,
+                            *[segments[sub_prefix] for sub_prefix in sub_prefixes],
+                            key=lambda obj: obj["Key"]))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Per-user listing and metadata cache.
+Entries live in a pluggable backend (see cache_backends): the warm
+container's memory by default, or a SQLite file or Redis-protocol server
+shared across containers. Keys carry a per tenant/user version; a PUT
+bumps the version so entries cached before it are never read again and
+age out with their TTL.
+Only writes through this API bump versions: objects uploaded with
+presigned URLs show up in cached S3 listings once the entries expire.
+The db_nosql metadata, written for those uploads by the S3 event handler
+db_nosql.record_uploads in another Lambda, is only cached in a shared
+backend, where that handler's bump reaches the API containers.
+"""
+
+import os
+import threading
+
+import cache_backends
+import constants
+
+
+class VersionedCache(object):
+    """
+    Cache with versioned keys per approach, tenant and user
+        :param backend: one of cache_backends
+        :param ttl: seconds an entry stays valid
+    """
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self.counters = dict.fromkeys(("hits", "misses", "errors"), 0)
+        self._lock = threading.Lock()
+
+    def get(self, approach, req_header, load_value, kind="listing"):
+        """
+        Returns the cached value or calls load_value() and caches its result.
+        Backend failures degrade to a miss rather than failing the request
+            :param approach: partition approach name
+            :param req_header:
+            :param load_value: callable returning a JSON serializable value
+            :param kind="listing": distinguishes values cached for one user
+        """
+        try:
+            version = self.backend.get_version(version_key(approach, req_header))
+            key = "{0}/{1}/{2}/{3}/{4}".format(kind, approach, req_header["tenant_id"],
+                                               req_header["user_id"], version)
+            value = self.backend.get(key)
+        except Exception:
+            self._count("errors")
+            return load_value()
+
+        if value is not None:
+            self._count("hits")
+            return value
+
+        self._count("misses")
+        value = load_value()
+        try:
+            self.backend.set(key, value, self.ttl)
+        except Exception:
+            self._count("errors")
+        return value
+
+    def bump(self, approach, req_header):
+        """
+        Moves the user to a new version, orphaning previously cached values
+            :param approach: partition approach name
+            :param req_header:
+        """
+        try:
+            self.backend.incr(version_key(approach, req_header))
+        except Exception:
+            self._count("errors")
+
+    def stats(self):
+        """
+        Returns hit ratio of this container and the backend's memory usage
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["backend"] = self.backend.name
+        stats.update(self.backend.stats())
+        return stats
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+
+def version_key(approach, req_header):
+    """
+    Returns the key holding the version of a user's cached values
+        :param approach:
+        :param req_header:
+    """
+    return "version/{0}/{1}/{2}".format(approach, req_header["tenant_id"],
+                                        req_header["user_id"])
+
+
+_STATE = {"cache": None, "pid": None}
+_LOCK = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the cache of this process, created on first use: a process
+    forked by server.serve() must not share the SQLite connection or
+    sockets of its parent
+    """
+    with _LOCK:
+        if _STATE["cache"] is None or _STATE["pid"] != os.getpid():
+            _STATE["cache"] = VersionedCache(backend=cache_backends.get_backend(),
+                                             ttl=get_ttl())
+            _STATE["pid"] = os.getpid()
+        return _STATE["cache"]
+
+
+def get_ttl():
+    """
+    Returns LISTING_CACHE_TTL, seconds an entry stays valid
+    """
+    return float(os.environ.get("LISTING_CACHE_TTL", constants.LISTING_CACHE_TTL))
+
+
+def is_enabled(approach):
+    """
+    Caching is on unless the TTL is 0 or the approach is listed in
+    LISTING_CACHE_DISABLED (comma separated, e.g. "bucket,prefix")
+        :param approach:
+    """
+    disabled = os.environ.get("LISTING_CACHE_DISABLED", "").split(",")
+    return get_ttl() > 0 and approach not in disabled
+
+
+def is_process_local():
+    """
+    Returns True when caching is on with the memory backend: a PUT then
+    only invalidates the listings of the process that served it
+    """
+    backend = os.environ.get("CACHE_BACKEND", cache_backends.MemoryBackend.name)
+    return get_ttl() > 0 and backend == cache_backends.MemoryBackend.name
+
+
+def get_listing(approach, req_header, load_listing, kind="listing", shared_only=False):
+    """
+    Returns the user's listing from the cache, or calls load_listing()
+    and caches its result
+        :param approach: partition approach name
+        :param req_header:
+        :param load_listing: callable returning the listing
+        :param kind="listing": e.g. "metadata" for db_nosql query results
+        :param shared_only=False: skip the cache unless its backend is shared,
+                                  for listings also written outside this API
+    """
+    if not is_enabled(approach) or (shared_only and is_process_local()):
+        return load_listing()
+    return get_cache().get(approach, req_header, load_listing, kind)
+
+
+def record_put(approach, req_header):
+    """
+    Bumps the user's version after a write so that every container
+    sharing the backend stops serving the previous listing
+        :param approach: partition approach name
+        :param req_header:
+    """
+    get_cache().bump(approach, req_header)
+
+
+def stats():
+    """
+    Returns hit ratio and memory usage of the listing cache
+    """
+    return get_cache().stats()
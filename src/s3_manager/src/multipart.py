@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+multipart/form-data parser for PUT /object. Parts are found by scanning
+the decoded body for the boundary and are yielded one at a time as
+memoryview slices of that body, so each file is handed to put_object
+without being copied out of the request.
+"""
+
+import io
+import re
+
+# name="value" or name=value parameters of a header (RFC 7578)
+HEADER_PARAM = re.compile(r';\s*([^\s=;]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+CRLF = b"\r\n"
+
+
+class MultipartError(ValueError):
+    pass
+
+
+class Part(object):
+    """
+    One part of a multipart body
+        :param headers: {lower-case name: value}
+        :param value: memoryview of the part content
+    """
+    __slots__ = ("headers", "name", "filename", "value")
+
+    def __init__(self, headers, value):
+        self.headers = headers
+        self.value = value
+        params = get_params(headers.get("content-disposition", ""))
+        self.name = params.get("name")
+        self.filename = params.get("filename")
+
+    @property
+    def content_type(self):
+        return self.headers.get("content-type", "application/octet-stream")
+
+    def reader(self):
+        """
+        Returns a seekable file object over the content, for put_object
+        """
+        return PartReader(self.value)
+
+
+class PartReader(io.RawIOBase):
+    """
+    Read-only, seekable file object over a memoryview. botocore reads it
+    for checksums and the request body, and seeks back for retries
+        :param view:
+    """
+    def __init__(self, view):
+        super(PartReader, self).__init__()
+        self._view = view
+        self._position = 0
+
+    def __len__(self):
+        return len(self._view)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self._position += len(chunk)
+        return len(chunk)
+
+    def readall(self):
+        chunk = self._view[self._position:]
+        self._position = len(self._view)
+        return bytes(chunk)
+
+    def getbuffer(self):
+        """
+        Returns the memoryview, like io.BytesIO.getbuffer()
+        """
+        return self._view
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._position = min(max(offset, 0), len(self._view))
+        return self._position
+
+
+def get_params(header_value):
+    """
+    Returns the parameters of a header value such as Content-Type
+        :param header_value:
+    """
+    params = {}
+    for name, value in HEADER_PARAM.findall(header_value):
+        if value.startswith('"'):
+            # Only \\ and \" are unescaped: browsers send raw Windows paths
+            value = value[1:-1].replace('\\\\', '\\').replace('\\"', '"')
+        params[name.lower()] = value.strip()
+    return params
+
+
+def get_boundary(content_type):
+    """
+    Returns the boundary (bytes) of a multipart Content-Type
+        :param content_type:
+    """
+    boundary = get_params(content_type).get("boundary")
+    if not boundary or len(boundary) > 70:
+        raise MultipartError("multipart body requires a valid boundary")
+    return boundary.encode("latin-1")
+
+
+def iter_parts(body, boundary):
+    """
+    Yields the Part objects of a multipart body
+        :param body: bytes
+        :param boundary: bytes, see get_boundary()
+    """
+    view = memoryview(body)
+    delimiter = b"--" + boundary
+    position = body.find(delimiter)
+    if position < 0:
+        raise MultipartError("multipart boundary not found")
+
+    while True:
+        position += len(delimiter)
+        if body.startswith(b"--", position):
+            return
+        # Transport padding may follow the boundary before its line break
+        line_end = body.find(CRLF, position)
+        headers_end = body.find(CRLF + CRLF, line_end)
+        if line_end < 0 or headers_end < 0:
+            raise MultipartError("truncated multipart part headers")
+        if line_end == headers_end:
+            headers = {}
+        else:
+            headers = parse_headers(body[line_end + 2:headers_end])
+
+        content_start = headers_end + 4
+        content_end = body.find(CRLF + delimiter, content_start)
+        if content_end < 0:
+            raise MultipartError("multipart closing boundary not found")
+        yield Part(headers, view[content_start:content_end])
+        position = content_end + 2
+
+
+def parse_headers(block):
+    """
+    Returns the headers of a part as {lower-case name: value}
+        :param block: header lines (bytes)
+    """
+    headers = {}
+    for line in block.decode("utf-8", "replace").split("\r\n"):
+        name, separator, value = line.partition(":")
+        if not separator:
+            raise MultipartError("malformed multipart header")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+def get_files(body, content_type):
+    """
+    Returns [{"object_key", "object_value"}] for the file parts of a
+    multipart/form-data body, keyed by their file names
+        :param body: bytes
+        :param content_type: Content-Type header with the boundary
+    """
+    objects = []
+    seen = set()
+    for part in iter_parts(body, get_boundary(content_type)):
+        if not part.filename:
+            continue
+        # Browsers may send a client side path; only the name is kept
+        object_key = re.split(r"[\\/]", part.filename)[-1]
+        if not object_key:
+            continue
+        if object_key in seen:
+            raise MultipartError("duplicate file name {0}".format(object_key))
+        seen.add(object_key)
+        objects.append({
+            "object_key": object_key,
+            "object_value": part.reader()
+        })
+
+    if not objects:
+        raise MultipartError("multipart body has no file parts")
+    return objects
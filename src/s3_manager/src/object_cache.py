@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Object cache on the container's ephemeral storage for hot content reads.
+Whole objects up to OBJECT_CACHE_MAX_OBJECT_BYTES are kept as files under
+OBJECT_CACHE_DIR, keyed by bucket, key and ETag, and the least recently
+used are evicted beyond OBJECT_CACHE_MAX_BYTES. Each process (see
+server.serve) has its own cache in the subdirectory named by its pid, so
+the limit applies per process. A cached copy is never
+served unchecked: the read is sent with If-None-Match on its ETag and the
+caller's tenant-scoped credentials, and only a 304 serves the file. S3
+thus still authorizes every read and an overwrite is fetched again, but
+a hit transfers no object bytes. Hits are served from a read-only memory
+map of the file rather than copied onto the Python heap.
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import botocore
+
+import constants
+import download_engine
+
+
+class ObjectCache(object):
+    """
+    Byte-bounded LRU of whole objects stored as files
+        :param directory: emptied when the cache is created, so not shared
+                          with another cache
+        :param max_bytes:
+        :param max_object_bytes: largest object that is cached
+    """
+    def __init__(self, directory, max_bytes, max_object_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self.current_bytes = 0
+        self.counters = dict.fromkeys(("hits", "misses", "stale", "stores", "evictions",
+                                       "bytes_saved", "errors"), 0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if max_bytes > 0:
+            # Files left by an earlier process are not in the index
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory, exist_ok=True)
+
+    def open(self, s3_client, bucket_name, key_name, range_header=None):
+        """
+        Returns a CachedRead when S3 reports the cached ETag current, else
+        a CachingDownload of the object
+            :param s3_client:
+            :param bucket_name: bucket name or access point ARN
+            :param key_name:
+            :param range_header=None:
+        """
+        entry = self.lookup(bucket_name, key_name)
+        mapped = None
+        if entry is not None:
+            try:
+                mapped = map_file(entry[3])
+            except (OSError, ValueError):
+                self._count("errors")
+                self.discard(bucket_name, key_name, entry)
+                entry = None
+
+        try:
+            download = CachingDownload(self, s3_client, bucket_name, key_name, range_header,
+                                       if_none_match=entry[0] if entry else None)
+        except botocore.exceptions.ClientError as ex:
+            if mapped is None or not is_not_modified(ex):
+                raise
+            read = CachedRead(entry, mapped, range_header)
+            mapped = None
+            self._count("hits")
+            self._count("bytes_saved", read.length)
+            return read
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+        if entry is not None:
+            self._count("stale")
+            self.discard(bucket_name, key_name, entry)
+        self._count("misses")
+        return download
+
+    def lookup(self, bucket_name, key_name):
+        """
+        Returns the (etag, content type, size, path) entry of an object,
+        marked as recently used, or None
+            :param bucket_name:
+            :param key_name:
+        """
+        with self._lock:
+            entry = self._entries.get((bucket_name, key_name))
+            if entry is not None:
+                self._entries.move_to_end((bucket_name, key_name))
+            return entry
+
+    def store(self, bucket_name, key_name, etag, content_type, data):
+        """
+        Writes an object to its file and indexes it, evicting the least
+        recently used objects beyond max_bytes
+            :param bucket_name:
+            :param key_name:
+            :param etag:
+            :param content_type:
+            :param data: bytes-like, the whole object
+        """
+        size = len(data)
+        if not etag or not size or size > min(self.max_object_bytes, self.max_bytes):
+            return
+        path = os.path.join(self.directory, hashlib.sha256(
+            "{0}\n{1}\n{2}".format(bucket_name, key_name, etag).encode("utf-8")).hexdigest())
+        try:
+            # Written under a temporary name so that readers never map a partial file
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory)
+            try:
+                with os.fdopen(descriptor, "wb") as cache_file:
+                    cache_file.write(data)
+                os.replace(temp_path, path)
+            except OSError:
+                remove_file(temp_path)
+                raise
+        except OSError:
+            self._count("errors")
+            return
+
+        with self._lock:
+            previous = self._entries.pop((bucket_name, key_name), None)
+            if previous is not None:
+                self.current_bytes -= previous[2]
+                if previous[3] != path:
+                    remove_file(previous[3])
+            self._entries[(bucket_name, key_name)] = (etag, content_type, size, path)
+            self.current_bytes += size
+            self.counters["stores"] += 1
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted_size, evicted_path) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.counters["evictions"] += 1
+                remove_file(evicted_path)
+
+    def discard(self, bucket_name, key_name, entry):
+        """
+        Drops the entry of an object if it is still the indexed one
+            :param bucket_name:
+            :param key_name:
+            :param entry:
+        """
+        with self._lock:
+            if self._entries.get((bucket_name, key_name)) != entry:
+                return
+            del self._entries[(bucket_name, key_name)]
+            self.current_bytes -= entry[2]
+        remove_file(entry[3])
+
+    def stats(self):
+        """
+        Returns hit ratio, bytes saved and eviction counts of this container
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self.current_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+
+class CachedRead(object):
+    """
+    Read of a cached object, or of the Range of it, from a read-only
+    memory map of its file. Offers the attributes, read_all() and close()
+    of download_engine.RangedDownload
+        :param entry: (etag, content type, size, path)
+        :param mapped: mmap of the file, closed by close()
+        :param range_header=None:
+    """
+    def __init__(self, entry, mapped, range_header=None):
+        self.etag, self.content_type, self.size = entry[:3]
+        self._mapped = mapped
+        self._views = []
+        self.start, self.end, self.partial = download_engine.resolve_range(range_header,
+                                                                           self.size)
+
+    @property
+    def length(self):
+        return self.end - self.start
+
+    @property
+    def content_range(self):
+        if not self.partial:
+            return None
+        return "bytes {0}-{1}/{2}".format(self.start, self.end - 1, self.size)
+
+    def read_all(self):
+        """
+        Returns a memoryview of the bytes read, valid until close()
+        """
+        self._views.append(memoryview(self._mapped))
+        self._views.append(self._views[0][self.start:self.end])
+        return self._views[-1]
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._mapped.close()
+
+
+class CachingDownload(download_engine.RangedDownload):
+    """
+    RangedDownload that stores the object in the cache when it reads all
+    of it
+        :param cache: ObjectCache
+    """
+    def __init__(self, cache, *args, **kwargs):
+        self.cache = cache
+        super(CachingDownload, self).__init__(*args, **kwargs)
+
+    def read_all(self):
+        buffer = super(CachingDownload, self).read_all()
+        if self.start == 0 and self.end == self.size:
+            self.cache.store(self.bucket_name, self.key_name, self.etag,
+                             self.content_type, buffer)
+        return buffer
+
+
+def map_file(path):
+    """
+    Returns a read-only mmap of a file
+        :param path:
+    """
+    with open(path, "rb") as cache_file:
+        return mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def is_not_modified(ex):
+    """
+    Returns True for the 304 of a request sent with If-None-Match
+        :param ex: ClientError
+    """
+    return ex.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304 or \
+        ex.response.get("Error", {}).get("Code") in ("304", "NotModified")
+
+
+def remove_stale_directories(directory):
+    """
+    Removes the cache subdirectories of processes that no longer run
+        :param directory: OBJECT_CACHE_DIR
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        if not name.isdigit() or int(name) == os.getpid():
+            continue
+        try:
+            os.kill(int(name), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+        except OSError:
+            pass
+
+
+_STATE = {"cache": None, "pid": None}
+_LOCK = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the cache of this process, created on first use in its own
+    subdirectory of OBJECT_CACHE_DIR: processes forked by server.serve()
+    keep separate indexes, so none may evict or wipe the files of another
+    """
+    with _LOCK:
+        if _STATE["cache"] is None or _STATE["pid"] != os.getpid():
+            directory = os.environ.get("OBJECT_CACHE_DIR", constants.OBJECT_CACHE_DIR)
+            max_bytes = int(os.environ.get("OBJECT_CACHE_MAX_BYTES",
+                                           constants.OBJECT_CACHE_MAX_BYTES))
+            if max_bytes > 0:
+                remove_stale_directories(directory)
+            _STATE["cache"] = ObjectCache(
+                directory=os.path.join(directory, str(os.getpid())),
+                max_bytes=max_bytes,
+                max_object_bytes=int(os.environ.get("OBJECT_CACHE_MAX_OBJECT_BYTES",
+                                                    constants.OBJECT_CACHE_MAX_OBJECT_BYTES)))
+            _STATE["pid"] = os.getpid()
+        return _STATE["cache"]
+
+
+def is_enabled():
+    """
+    Caching is on unless OBJECT_CACHE_MAX_BYTES is 0
+    """
+    return get_cache().max_bytes > 0
+
+
+def open_object(s3_client, bucket_name, key_name, range_header=None):
+    """
+    Returns a read of an object, or of the Range of it, with the
+    attributes, read_all() and close() of download_engine.RangedDownload:
+    the cached copy while its ETag is current, else a download that
+    caches the object when it reads all of it
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param key_name:
+        :param range_header=None:
+    """
+    if not is_enabled():
+        return download_engine.RangedDownload(s3_client, bucket_name, key_name, range_header)
+    return get_cache().open(s3_client, bucket_name, key_name, range_header)
+
+
+def stats():
+    """
+    Returns hit ratio, bytes saved and eviction counts of the object cache
+    """
+    return get_cache().stats()
@@ -1,66 +1,120 @@
 import hashlib
 import hmac
 import json
+from functools import lru_cache
+from importlib.util import find_spec
 
-
-from .compat import constant_time_compare, string_types
+from .compat import MutableMapping, constant_time_compare
 from .exceptions import InvalidKeyError
-from .utils import (
-    base64url_decode, base64url_encode, der_to_raw_signature,
-    force_bytes, force_unicode, from_base64url_uint, raw_to_der_signature,
-    to_base64url_uint
-)
-
-try:
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.serialization import (
-        load_pem_private_key, load_pem_public_key, load_ssh_public_key
-    )
-    from cryptography.hazmat.primitives.asymmetric.rsa import (
-        RSAPrivateKey, RSAPublicKey, RSAPrivateNumbers, RSAPublicNumbers,
-        rsa_recover_prime_factors, rsa_crt_dmp1, rsa_crt_dmq1, rsa_crt_iqmp
-    )
-    from cryptography.hazmat.primitives.asymmetric.ec import (
-        EllipticCurvePrivateKey, EllipticCurvePublicKey
-    )
-    from cryptography.hazmat.primitives.asymmetric import ec, padding
-    from cryptography.hazmat.backends import default_backend
-    from cryptography.exceptions import InvalidSignature
-
-    has_crypto = True
-except ImportError:
-    has_crypto = False
+from .utils import base64url_decode, base64url_encode, force_bytes, force_unicode
 
 requires_cryptography = set(['RS256', 'RS384', 'RS512', 'ES256', 'ES384',
                              'ES521', 'ES512', 'PS256', 'PS384', 'PS512'])
 
 
+# Classes and hash names of the algorithms in crypto_algorithms
+CRYPTO_ALGORITHMS = {
+    'RS256': ('RSAAlgorithm', 'SHA256'),
+    'RS384': ('RSAAlgorithm', 'SHA384'),
+    'RS512': ('RSAAlgorithm', 'SHA512'),
+    'ES256': ('ECAlgorithm', 'SHA256'),
+    'ES384': ('ECAlgorithm', 'SHA384'),
+    'ES521': ('ECAlgorithm', 'SHA512'),
+    'ES512': ('ECAlgorithm', 'SHA512'),  # Backward compat for #219 fix
+    'PS256': ('RSAPSSAlgorithm', 'SHA256'),
+    'PS384': ('RSAPSSAlgorithm', 'SHA384'),
+    'PS512': ('RSAPSSAlgorithm', 'SHA512')
+}
+CRYPTO_NAMES = ('RSAAlgorithm', 'ECAlgorithm', 'RSAPSSAlgorithm')
+
+
 def get_default_algorithms():
     """
-    Returns the algorithms that are implemented by the library.
+    Returns the algorithms that are implemented by the library. Algorithm
+    objects are created, and cryptography imported, on first use.
     """
     default_algorithms = {
-        'none': NoneAlgorithm(),
-        'HS256': HMACAlgorithm(HMACAlgorithm.SHA256),
-        'HS384': HMACAlgorithm(HMACAlgorithm.SHA384),
-        'HS512': HMACAlgorithm(HMACAlgorithm.SHA512)
+        'none': NoneAlgorithm,
+        'HS256': lambda: HMACAlgorithm(HMACAlgorithm.SHA256),
+        'HS384': lambda: HMACAlgorithm(HMACAlgorithm.SHA384),
+        'HS512': lambda: HMACAlgorithm(HMACAlgorithm.SHA512)
     }
 
-    if has_crypto:
-        default_algorithms.update({
-            'RS256': RSAAlgorithm(RSAAlgorithm.SHA256),
-            'RS384': RSAAlgorithm(RSAAlgorithm.SHA384),
-            'RS512': RSAAlgorithm(RSAAlgorithm.SHA512),
-            'ES256': ECAlgorithm(ECAlgorithm.SHA256),
-            'ES384': ECAlgorithm(ECAlgorithm.SHA384),
-            'ES521': ECAlgorithm(ECAlgorithm.SHA512),
-            'ES512': ECAlgorithm(ECAlgorithm.SHA512),  # Backward compat for #219 fix
-            'PS256': RSAPSSAlgorithm(RSAPSSAlgorithm.SHA256),
-            'PS384': RSAPSSAlgorithm(RSAPSSAlgorithm.SHA384),
-            'PS512': RSAPSSAlgorithm(RSAPSSAlgorithm.SHA512)
-        })
+    if _crypto_installed():
+        for alg, (class_name, hash_name) in CRYPTO_ALGORITHMS.items():
+            default_algorithms[alg] = _crypto_factory(class_name, hash_name)
+
+    return AlgorithmRegistry(default_algorithms)
+
+
+@lru_cache(maxsize=1)
+def _crypto_installed():
+    return find_spec('cryptography') is not None
+
+
+def _crypto_factory(class_name, hash_name):
+    def create():
+        from . import crypto_algorithms
+        algorithm_class = getattr(crypto_algorithms, class_name)
+        return algorithm_class(getattr(algorithm_class, hash_name))
+    return create
+
+
+def __getattr__(name):
+    # PEP 562: has_crypto and the cryptography-backed classes resolve lazily
+    if name not in CRYPTO_NAMES + ('has_crypto',):
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    try:
+        from . import crypto_algorithms
+    except ImportError:
+        if name == 'has_crypto':
+            return False
+        raise AttributeError(name)
+    globals()['has_crypto'] = True
+    for class_name in CRYPTO_NAMES:
+        globals()[class_name] = getattr(crypto_algorithms, class_name)
+    return globals()[name]
+
 
-    return default_algorithms
+class AlgorithmRegistry(MutableMapping):
+    """
+    Mapping of alg to Algorithm whose entries may be factories, called
+    on first lookup. An algorithm whose backend fails to import behaves
+    as if it were not registered.
+    """
+    def __init__(self, factories):
+        self._entries = {}
+        self._factories = dict(factories)
+
+    def __getitem__(self, alg):
+        algorithm = self._entries.get(alg)
+        if algorithm is None:
+            factory = self._factories[alg]
+            try:
+                algorithm = factory()
+            except ImportError:
+                raise KeyError(alg)
+            self._entries[alg] = algorithm
+        return algorithm
+
+    def __setitem__(self, alg, algorithm):
+        self._factories.pop(alg, None)
+        self._entries[alg] = algorithm
+
+    def __delitem__(self, alg):
+        if alg not in self:
+            raise KeyError(alg)
+        self._entries.pop(alg, None)
+        self._factories.pop(alg, None)
+
+    def __contains__(self, alg):
+        return alg in self._entries or alg in self._factories
+
+    def __iter__(self):
+        return iter(set(self._entries) | set(self._factories))
+
+    def __len__(self):
+        return len(set(self._entries) | set(self._factories))
 
 
 class Algorithm(object):
@@ -174,230 +228,3 @@ class HMACAlgorithm(Algorithm):
 
     def verify(self, msg, key, sig):
         return constant_time_compare(sig, self.sign(msg, key))
-
-
-if has_crypto:
-
-    class RSAAlgorithm(Algorithm):
-        """
-        Performs signing and verification operations using
-        RSASSA-PKCS-v1_5 and the specified hash function.
-        """
-        SHA256 = hashes.SHA256
-        SHA384 = hashes.SHA384
-        SHA512 = hashes.SHA512
-
-        def __init__(self, hash_alg):
-            self.hash_alg = hash_alg
-
-        def prepare_key(self, key):
-            if isinstance(key, RSAPrivateKey) or \
-               isinstance(key, RSAPublicKey):
-                return key
-
-            if isinstance(key, string_types):
-                key = force_bytes(key)
-
-                try:
-                    if key.startswith(b'ssh-rsa'):
-                        key = load_ssh_public_key(key, backend=default_backend())
-                    else:
-                        key = load_pem_private_key(key, password=None, backend=default_backend())
-                except ValueError:
-                    key = load_pem_public_key(key, backend=default_backend())
-            else:
-                raise TypeError('Expecting a PEM-formatted key.')
-
-            return key
-
-        @staticmethod
-        def to_jwk(key_obj):
-            obj = None
-
-            if getattr(key_obj, 'private_numbers', None):
-                # Private key
-                numbers = key_obj.private_numbers()
-
-                obj = {
-                    'kty': 'RSA',
-                    'key_ops': ['sign'],
-                    'n': force_unicode(to_base64url_uint(numbers.public_numbers.n)),
-                    'e': force_unicode(to_base64url_uint(numbers.public_numbers.e)),
-                    'd': force_unicode(to_base64url_uint(numbers.d)),
-                    'p': force_unicode(to_base64url_uint(numbers.p)),
-                    'q': force_unicode(to_base64url_uint(numbers.q)),
-                    'dp': force_unicode(to_base64url_uint(numbers.dmp1)),
-                    'dq': force_unicode(to_base64url_uint(numbers.dmq1)),
-                    'qi': force_unicode(to_base64url_uint(numbers.iqmp))
-                }
-
-            elif getattr(key_obj, 'verify', None):
-                # Public key
-                numbers = key_obj.public_numbers()
-
-                obj = {
-                    'kty': 'RSA',
-                    'key_ops': ['verify'],
-                    'n': force_unicode(to_base64url_uint(numbers.n)),
-                    'e': force_unicode(to_base64url_uint(numbers.e))
-                }
-            else:
-                raise InvalidKeyError('Not a public or private key')
-
-            return json.dumps(obj)
-
-        @staticmethod
-        def from_jwk(jwk):
-            try:
-                obj = json.loads(jwk)
-            except ValueError:
-                raise InvalidKeyError('Key is not valid JSON')
-
-            if obj.get('kty') != 'RSA':
-                raise InvalidKeyError('Not an RSA key')
-
-            if 'd' in obj and 'e' in obj and 'n' in obj:
-                # Private key
-                if 'oth' in obj:
-                    raise InvalidKeyError('Unsupported RSA private key: > 2 primes not supported')
-
-                other_props = ['p', 'q', 'dp', 'dq', 'qi']
-                props_found = [prop in obj for prop in other_props]
-                any_props_found = any(props_found)
-
-                if any_props_found and not all(props_found):
-                    raise InvalidKeyError('RSA key must include all parameters if any are present besides d')
-
-                public_numbers = RSAPublicNumbers(
-                    from_base64url_uint(obj['e']), from_base64url_uint(obj['n'])
-                )
-
-                if any_props_found:
-                    numbers = RSAPrivateNumbers(
-                        d=from_base64url_uint(obj['d']),
-                        p=from_base64url_uint(obj['p']),
-                        q=from_base64url_uint(obj['q']),
-                        dmp1=from_base64url_uint(obj['dp']),
-                        dmq1=from_base64url_uint(obj['dq']),
-                        iqmp=from_base64url_uint(obj['qi']),
-                        public_numbers=public_numbers
-                    )
-                else:
-                    d = from_base64url_uint(obj['d'])
-                    p, q = rsa_recover_prime_factors(
-                        public_numbers.n, d, public_numbers.e
-                    )
-
-                    numbers = RSAPrivateNumbers(
-                        d=d,
-                        p=p,
-                        q=q,
-                        dmp1=rsa_crt_dmp1(d, p),
-                        dmq1=rsa_crt_dmq1(d, q),
-                        iqmp=rsa_crt_iqmp(p, q),
-                        public_numbers=public_numbers
-                    )
-
-                return numbers.private_key(default_backend())
-            elif 'n' in obj and 'e' in obj:
-                # Public key
-                numbers = RSAPublicNumbers(
-                    from_base64url_uint(obj['e']), from_base64url_uint(obj['n'])
-                )
-
-                return numbers.public_key(default_backend())
-            else:
-                raise InvalidKeyError('Not a public or private key')
-
-        def sign(self, msg, key):
-            return key.sign(msg, padding.PKCS1v15(), self.hash_alg())
-
-        def verify(self, msg, key, sig):
-            try:
-                key.verify(sig, msg, padding.PKCS1v15(), self.hash_alg())
-                return True
-            except InvalidSignature:
-                return False
-
-    class ECAlgorithm(Algorithm):
-        """
-        Performs signing and verification operations using
-        ECDSA and the specified hash function
-        """
-        SHA256 = hashes.SHA256
-        SHA384 = hashes.SHA384
-        SHA512 = hashes.SHA512
-
-        def __init__(self, hash_alg):
-            self.hash_alg = hash_alg
-
-        def prepare_key(self, key):
-            if isinstance(key, EllipticCurvePrivateKey) or \
-               isinstance(key, EllipticCurvePublicKey):
-                return key
-
-            if isinstance(key, string_types):
-                key = force_bytes(key)
-
-                # Attempt to load key. We don't know if it's
-                # a Signing Key or a Verifying Key, so we try
-                # the Verifying Key first.
-                try:
-                    if key.startswith(b'ecdsa-sha2-'):
-                        key = load_ssh_public_key(key, backend=default_backend())
-                    else:
-                        key = load_pem_public_key(key, backend=default_backend())
-                except ValueError:
-                    key = load_pem_private_key(key, password=None, backend=default_backend())
-
-            else:
-                raise TypeError('Expecting a PEM-formatted key.')
-
-            return key
-
-        def sign(self, msg, key):
-            der_sig = key.sign(msg, ec.ECDSA(self.hash_alg()))
-
-            return der_to_raw_signature(der_sig, key.curve)
-
-        def verify(self, msg, key, sig):
-            try:
-                der_sig = raw_to_der_signature(sig, key.curve)
-            except ValueError:
-                return False
-
-            try:
-                key.verify(der_sig, msg, ec.ECDSA(self.hash_alg()))
-                return True
-            except InvalidSignature:
-                return False
-
-    class RSAPSSAlgorithm(RSAAlgorithm):
-        """
-        Performs a signature using RSASSA-PSS with MGF1
-        """
-
-        def sign(self, msg, key):
-            return key.sign(
-                msg,
-                padding.PSS(
-                    mgf=padding.MGF1(self.hash_alg()),
-                    salt_length=self.hash_alg.digest_size
-                ),
-                self.hash_alg()
-            )
-
-        def verify(self, msg, key, sig):
-            try:
-                key.verify(
-                    sig,
-                    msg,
-                    padding.PSS(
-                        mgf=padding.MGF1(self.hash_alg()),
-                        salt_length=self.hash_alg.digest_size
-                    ),
-                    self.hash_alg()
-                )
-                return True
-            except InvalidSignature:
-                return False
@@ -7,8 +7,9 @@ try:
 except ImportError:
     pass
 
+from . import algorithms as jwt_algorithms
 from .algorithms import (
-    Algorithm, get_default_algorithms, has_crypto, requires_cryptography  # NOQA
+    Algorithm, get_default_algorithms, requires_cryptography  # NOQA
 )
 from .compat import Mapping, binary_type, string_types, text_type
 from .exceptions import (
@@ -114,7 +115,7 @@ class PyJWS(object):
             signature = alg_obj.sign(signing_input, key)
 
         except KeyError:
-            if not has_crypto and algorithm in requires_cryptography:
+            if not jwt_algorithms.has_crypto and algorithm in requires_cryptography:
                 raise NotImplementedError(
                     "Algorithm '%s' could not be found. Do you have cryptography "
                     "installed?" % algorithm
@@ -22,9 +22,9 @@ string_types = (text_type, binary_type)
 
 try:
     # Importing ABCs from collections will be removed in PY3.8
-    from collections.abc import Iterable, Mapping
+    from collections.abc import Iterable, Mapping, MutableMapping
 except ImportError:
-    from collections import Iterable, Mapping
+    from collections import Iterable, Mapping, MutableMapping
 
 try:
     constant_time_compare = hmac.compare_digest
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Decodes the body of an API Gateway event into the object key and value.
+    JSON  - {"key": ..., "value": ...}; "encoding": "base64" marks a binary
+            value. {"items": [...]} of such objects is a batch, returned
+            as "objects". Bodies that are not valid JSON are read as the
+            legacy single-quoted form {'key': ..., 'value': ...}
+    multipart/form-data - every file part is an object named by its
+            file name, returned as "objects" (see multipart)
+    raw   - any other content type; the body is the object and the key
+            comes from the "key" query parameter or the x-object-key header
+Bodies with isBase64Encoded are decoded once, straight from the event
+string into bytes. Values are returned as bytes (seekable views of the
+body for multipart files), ready for put_object; raw base64 bodies above
+the multipart threshold are returned as an upload_engine.Base64Reader
+that decodes them part by part during the upload.
+orjson is used for JSON when it is installed.
+"""
+
+import ast
+import binascii
+import json
+import os
+
+import constants
+import multipart
+import upload_engine
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+X_OBJECT_KEY = "x-object-key"
+JSON_CONTENT_TYPES = ("application/json", "text/json")
+MULTIPART_FORM_DATA = "multipart/form-data"
+
+
+class InvalidBodyError(ValueError):
+    pass
+
+
+def get_batch_max():
+    """
+    Returns the maximum number of objects in one request
+    """
+    return int(os.environ.get("PUT_BATCH_MAX", constants.PUT_BATCH_MAX))
+
+
+def loads(data):
+    """
+    Parses JSON from str or bytes with the fastest available backend
+        :param data:
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_body(event):
+    """
+    Returns {"object_key", "object_value"} for the event body,
+    {"objects": [...]} for a multipart body, or {} when there is no body.
+    Raises InvalidBodyError for a malformed body
+        :param event:
+    """
+    body = event.get("body")
+    if not body:
+        return {}
+
+    headers = {name.lower(): value for name, value in
+               (event.get("headers") or {}).items()}
+    content_header = headers.get("content-type") or ""
+    content_type = content_header.split(";", 1)[0].strip().lower()
+
+    is_raw = content_type and content_type != MULTIPART_FORM_DATA and \
+        content_type not in JSON_CONTENT_TYPES
+    if event.get("isBase64Encoded") and is_raw and \
+            len(body) // 4 * 3 > upload_engine.get_settings()[0]:
+        try:
+            body = upload_engine.Base64Reader(body)
+        except ValueError as ex:
+            raise InvalidBodyError(str(ex))
+    elif event.get("isBase64Encoded"):
+        try:
+            # a2b_base64 reads the ASCII str in place, without an encode() copy
+            body = binascii.a2b_base64(body)
+        except (binascii.Error, ValueError) as ex:
+            raise InvalidBodyError("body is not valid base64: {0}".format(ex))
+
+    if content_type == MULTIPART_FORM_DATA:
+        try:
+            objects = multipart.get_files(
+                body.encode("utf-8") if isinstance(body, str) else body,
+                content_header)
+        except multipart.MultipartError as ex:
+            raise InvalidBodyError(str(ex))
+        if len(objects) > get_batch_max():
+            raise InvalidBodyError("at most {0} files per request".format(get_batch_max()))
+        return {"objects": objects}
+
+    if content_type in JSON_CONTENT_TYPES or \
+            (not content_type and body[:1] in ("{", b"{")):
+        return decode_json(body)
+
+    query_string = event.get("queryStringParameters") or {}
+    object_key = query_string.get("key") or headers.get(X_OBJECT_KEY)
+    if not object_key:
+        raise InvalidBodyError("raw body requires a key query parameter "
+                               "or {0} header".format(X_OBJECT_KEY))
+    return {
+        "object_key": object_key,
+        "object_value": body.encode("utf-8") if isinstance(body, str) else body
+    }
+
+
+def decode_json(body):
+    """
+    Decodes a JSON (or legacy single-quoted) object body. A body with
+    "items" is a batch: {"items": [{"key", "value", "encoding"}, ...]}
+        :param body: str or bytes
+    """
+    try:
+        document = loads(body)
+    except ValueError:
+        document = decode_legacy(body)
+    if not isinstance(document, dict):
+        raise InvalidBodyError("body must be a JSON object")
+
+    if "items" not in document:
+        return decode_item(document)
+
+    items = document["items"]
+    if not isinstance(items, list) or not items or len(items) > get_batch_max():
+        raise InvalidBodyError("items must be a list of 1 to {0} objects".format(
+            get_batch_max()))
+    if not all(isinstance(item, dict) and item.get("key") for item in items):
+        raise InvalidBodyError("every item requires a key")
+    objects = [decode_item(item) for item in items]
+    if len({obj["object_key"] for obj in objects}) != len(objects):
+        raise InvalidBodyError("duplicate keys in items")
+    return {"objects": objects}
+
+
+def decode_item(document):
+    """
+    Returns {"object_key", "object_value"} of a {"key", "value"} document
+        :param document:
+    """
+    value = document.get("value", "")
+    if document.get("encoding") == "base64":
+        try:
+            value = binascii.a2b_base64(value)
+        except (binascii.Error, ValueError, TypeError) as ex:
+            raise InvalidBodyError("value is not valid base64: {0}".format(ex))
+    elif isinstance(value, str):
+        value = value.encode("utf-8")
+    else:
+        value = json.dumps(value).encode("utf-8")
+
+    return {
+        "object_key": str(document.get("key", "")),
+        "object_value": value
+    }
+
+
+def decode_legacy(body):
+    """
+    Parses the single-quoted dict bodies accepted by earlier releases,
+    keeping apostrophes inside values intact
+        :param body:
+    """
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    try:
+        return ast.literal_eval(body)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        raise InvalidBodyError("body is not valid JSON")
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Encodes the body of API responses.
+    projection  - results built from boto3 responses keep only the fields
+                  clients use, never ResponseMetadata and HTTP headers
+    JSON        - orjson is used when it is installed
+    compression - JSON bodies of at least RESPONSE_COMPRESS_MIN_BYTES are
+                  gzip or deflate encoded when the Accept-Encoding header
+                  of the request allows it, and returned base64 encoded
+                  with isBase64Encoded as API Gateway expects
+"""
+
+import base64
+import json
+import os
+import zlib
+
+import constants
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fields of a PutObject or CompleteMultipartUpload response returned to clients
+PUT_OBJECT_FIELDS = ("ETag", "VersionId")
+# zlib wbits of each content coding
+CONTENT_CODINGS = {"gzip": 16 + zlib.MAX_WBITS, "deflate": zlib.MAX_WBITS}
+
+
+def project(api_resp, fields):
+    """
+    Returns the fields of a boto3 response that are present
+        :param api_resp:
+        :param fields:
+    """
+    return {field: api_resp[field] for field in fields if field in api_resp}
+
+
+def dumps(value):
+    """
+    Returns value as a JSON str with the fastest available backend
+        :param value:
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(value).decode("utf-8")
+        except TypeError:
+            # e.g. integers beyond 64 bits, which json still encodes
+            pass
+    return json.dumps(value)
+
+
+def get_content_coding(accept_encoding):
+    """
+    Returns gzip or deflate when an Accept-Encoding header allows it,
+    preferring gzip, else None
+        :param accept_encoding:
+    """
+    accepted = {}
+    for coding in (accept_encoding or "").lower().split(","):
+        name, _, params = coding.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            param_name, _, value = param.partition("=")
+            if param_name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name.strip()] = quality
+
+    for name in CONTENT_CODINGS:
+        if accepted.get(name, accepted.get("*", 0.0)) > 0:
+            return name
+    return None
+
+
+def encode(response, event):
+    """
+    Compresses the JSON body of a response for the request's
+    Accept-Encoding. Binary and small bodies are returned as they are,
+    streamed bodies (see streaming) are compressed chunk by chunk
+        :param response: from helper.create_response()
+        :param event:
+    """
+    body = response.get("body")
+    if not body or response.get("isBase64Encoded"):
+        return response
+    response["headers"]["Vary"] = "Accept-Encoding"
+    streamed = not isinstance(body, str)
+    min_bytes = int(os.environ.get("RESPONSE_COMPRESS_MIN_BYTES",
+                                   constants.RESPONSE_COMPRESS_MIN_BYTES))
+    if not streamed and len(body) < min_bytes:
+        return response
+
+    headers = {name.lower(): value for name, value in
+               (event.get("headers") or {}).items()}
+    coding = get_content_coding(headers.get("accept-encoding"))
+    if coding is None:
+        return response
+
+    level = int(os.environ.get("RESPONSE_COMPRESS_LEVEL", constants.RESPONSE_COMPRESS_LEVEL))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, CONTENT_CODINGS[coding])
+    response["headers"]["Content-Encoding"] = coding
+    if streamed:
+        response["body"] = compress_chunks(compressor, body)
+        return response
+
+    data = compressor.compress(body.encode("utf-8")) + compressor.flush()
+    response["body"] = base64.b64encode(data).decode("ascii")
+    response["isBase64Encoded"] = True
+    etag = response["headers"].get("ETag")
+    if etag and not etag.startswith("W/"):
+        # The encoded bytes differ from the identity representation
+        response["headers"]["ETag"] = "W/" + etag
+    return response
+
+
+def compress_chunks(compressor, chunks):
+    """
+    Yields the compressed chunks, each flushed so that the client can
+    decode every chunk as soon as it arrives
+        :param compressor: zlib compressobj
+        :param chunks: iterable of bytes
+    """
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Runs the API handlers as a long-running HTTP service, for container
+deployments outside Lambda.
+application is a WSGI application that translates each HTTP request
+into the API Gateway event of samples/event_apis_*.json and calls the
+same handler as the Lambda function of its route, so it can be served by
+any WSGI server (e.g. gunicorn --workers 4 --threads 16 server:application).
+serve() is a built-in server: requests run on a pool of SERVER_THREADS
+threads in each of SERVER_PROCESSES pre-forked processes sharing the
+listening socket. Processes live across requests, so the token, listing,
+object and session caches (AssumeRole credentials, boto3 clients and
+their connection pools) stay warm.
+The listing cache of the memory backend is private to a process, so a
+PUT would not invalidate the listings cached by the other processes:
+several processes (or WSGI workers) need CACHE_BACKEND=sqlite or redis,
+and serve() refuses to fork without one.
+    CACHE_BACKEND=sqlite python server.py --port 8080 --threads 16 --processes 4
+"""
+
+import argparse
+import base64
+import importlib
+import os
+import signal
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+import apis
+import constants
+import helper
+import listing_cache
+import object_cache
+import request_body
+import session_cache
+import streaming
+import token_manager as tkmgr
+from partition_approaches import PartitionApproach
+
+# Handler of each route, as integrated with API Gateway
+ROUTES = {
+    ("PUT", "/object"): apis.put_object,
+    ("GET", "/object"): apis.get_object_stream,
+    ("PUT", "/objects"): apis.put_objects,
+    ("GET", "/objects/contents"): apis.get_objects,
+    ("GET", "/object/content"): apis.get_object_content,
+    ("POST", "/object/upload"): apis.init_upload,
+    ("GET", "/object/tenant"): apis.get_tenant_object,
+    ("GET", "/token"): helper.get_token,
+    ("POST", "/token/batch"): helper.get_tokens,
+}
+HEALTH_PATH = "/health"
+
+
+def application(environ, start_response):
+    """
+    WSGI application calling the handler of the request's route
+        :param environ:
+        :param start_response:
+    """
+    method = environ["REQUEST_METHOD"]
+    path = environ.get("PATH_INFO") or "/"
+    if method == "GET" and path == HEALTH_PATH:
+        response = helper.success_response(get_stats(), HTTPStatus.OK)
+    elif (method, path) in ROUTES:
+        response = ROUTES[(method, path)](get_event(environ), None)
+    elif any(route_path == path for _, route_path in ROUTES):
+        response = helper.failure_response({"invalid": "method {0}".format(method)},
+                                           HTTPStatus.METHOD_NOT_ALLOWED)
+    else:
+        response = helper.failure_response({"invalid": "path {0}".format(path)},
+                                           HTTPStatus.NOT_FOUND)
+    return write_response(response, start_response)
+
+
+def get_event(environ):
+    """
+    Returns the API Gateway proxy event of a WSGI request. Header names
+    are lower case; JSON and text bodies are passed as str, others base64
+    encoded with isBase64Encoded, as for binary media types
+        :param environ:
+    """
+    method = environ["REQUEST_METHOD"]
+    path = environ.get("PATH_INFO") or "/"
+    headers = {}
+    for name, value in environ.items():
+        if name.startswith("HTTP_"):
+            headers[name[5:].replace("_", "-").lower()] = value
+        elif name in ("CONTENT_TYPE", "CONTENT_LENGTH") and value:
+            headers[name.replace("_", "-").lower()] = value
+
+    query = parse_qs(environ.get("QUERY_STRING", ""), keep_blank_values=True)
+
+    body, is_base64 = None, False
+    length = int(environ.get("CONTENT_LENGTH") or 0)
+    if length:
+        data = environ["wsgi.input"].read(length)
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        is_base64 = bool(content_type) and \
+            content_type not in request_body.JSON_CONTENT_TYPES and \
+            not content_type.startswith("text/")
+        if not is_base64:
+            try:
+                body = data.decode("utf-8")
+            except UnicodeDecodeError:
+                is_base64 = True
+        if is_base64:
+            body = base64.b64encode(data).decode("ascii")
+
+    return {
+        "resource": path,
+        "path": path,
+        "httpMethod": method,
+        "headers": headers,
+        "multiValueHeaders": {name: [value] for name, value in headers.items()},
+        "queryStringParameters": {name: values[-1] for name, values in query.items()} or None,
+        "multiValueQueryStringParameters": query or None,
+        "pathParameters": None,
+        "stageVariables": None,
+        "requestContext": {
+            "resourcePath": path,
+            "httpMethod": method,
+            "path": path,
+            "requestId": str(uuid.uuid4()),
+            "requestTimeEpoch": int(time.time() * 1000),
+            "identity": {
+                "sourceIp": environ.get("REMOTE_ADDR"),
+                "userAgent": headers.get("user-agent")
+            }
+        },
+        "body": body,
+        "isBase64Encoded": is_base64
+    }
+
+
+def write_response(response, start_response):
+    """
+    Starts the HTTP response of a handler response and returns its body:
+    decoded when base64 encoded, or the chunks of a streamed body
+        :param response: from helper.create_response()
+        :param start_response:
+    """
+    status = HTTPStatus(int(response["statusCode"]))
+    headers = {name: format_header(value)
+               for name, value in (response.get("headers") or {}).items()}
+    headers.setdefault("Content-Type", "application/json")
+
+    if streaming.is_streamed(response):
+        start_response("{0} {1}".format(status.value, status.phrase), list(headers.items()))
+        return response["body"]
+
+    body = response.get("body") or ""
+    if response.get("isBase64Encoded"):
+        body = base64.b64decode(body)
+    elif isinstance(body, str):
+        body = body.encode("utf-8")
+    headers["Content-Length"] = str(len(body))
+    start_response("{0} {1}".format(status.value, status.phrase), list(headers.items()))
+    return [body]
+
+
+def format_header(value):
+    """
+    Returns a header value as API Gateway renders it
+        :param value:
+    """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def get_stats():
+    """
+    Returns the cache statistics of this process
+    """
+    return {
+        "pid": os.getpid(),
+        "tokens": tkmgr.token_cache_stats(),
+        "sessions": session_cache.stats(),
+        "listings": listing_cache.stats(),
+        "objects": object_cache.stats()
+    }
+
+
+def warm_up():
+    """
+    Imports the approach modules and creates the STS client before the
+    first request
+    """
+    for partition_approach in PartitionApproach:
+        importlib.import_module(partition_approach.value)
+    helper.get_sts_client()
+
+
+class RequestHandler(WSGIRequestHandler):
+    """
+    Request handler logging to stderr only when access_log is set
+    """
+    access_log = False
+
+    def log_message(self, format, *args):
+        if self.access_log:
+            WSGIRequestHandler.log_message(self, format, *args)
+
+
+class PooledWSGIServer(WSGIServer):
+    """
+    WSGIServer handling each connection on a fixed pool of threads
+        :param server_address:
+        :param threads:
+        :param access_log=False:
+    """
+    request_queue_size = 128
+
+    def __init__(self, server_address, threads, access_log=False):
+        handler = type("PooledRequestHandler", (RequestHandler,), {"access_log": access_log})
+        WSGIServer.__init__(self, server_address, handler)
+        # Threads start with the first request, so the server can be forked before
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        WSGIServer.server_close(self)
+        self.executor.shutdown(wait=False)
+
+
+def check_processes(processes):
+    """
+    Raises ValueError when processes would each cache listings that the
+    PUTs served by the others do not invalidate
+        :param processes:
+    """
+    if processes > 1 and listing_cache.is_process_local():
+        raise ValueError("{0} processes need a shared listing cache: set CACHE_BACKEND "
+                         "to sqlite or redis, or LISTING_CACHE_TTL to 0".format(processes))
+
+
+def serve(host, port, threads, processes, access_log=False):
+    """
+    Serves application until SIGTERM or SIGINT on threads in each of
+    processes forked after binding the port
+        :param host:
+        :param port:
+        :param threads: per process
+        :param processes:
+        :param access_log=False:
+    """
+    check_processes(processes)
+    httpd = PooledWSGIServer((host, port), threads, access_log)
+    httpd.set_app(application)
+
+    children = []
+    for _ in range(processes - 1):
+        pid = os.fork()
+        if pid == 0:
+            children = None
+            break
+        children.append(pid)
+
+    warm_up()
+    if children is not None:
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        for pid in children or ():
+            os.kill(pid, signal.SIGTERM)
+        for pid in children or ():
+            os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.environ.get("SERVER_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int,
+                        default=int(os.environ.get("SERVER_PORT", constants.SERVER_PORT)))
+    parser.add_argument("--threads", type=int,
+                        default=int(os.environ.get("SERVER_THREADS", constants.SERVER_THREADS)))
+    parser.add_argument("--processes", type=int,
+                        default=int(os.environ.get("SERVER_PROCESSES",
+                                                   constants.SERVER_PROCESSES)))
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        check_processes(args.processes)
+    except ValueError as ex:
+        parser.error(str(ex))
+
+    print("Serving on {0}:{1} with {2} processes x {3} threads".format(
+        args.host, args.port, args.processes, args.threads))
+    serve(args.host, args.port, args.threads, args.processes, args.access_log)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+AWS sessions kept warm across the requests of a Lambda container or of
+the HTTP server (see server).
+AssumeRole credentials are cached per rendered session policy, which
+holds the tenant context, until they have less than
+CREDENTIALS_MIN_LIFETIME seconds left, so that presigned URLs signed
+with them stay valid. boto3 clients are cached per service and
+credentials: they are thread-safe and keep their connection pools.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import constants
+
+
+class SessionCache(object):
+    """
+    LRU caches of assumed role credentials and of clients
+        :param max_entries: 0 disables the cache
+        :param min_lifetime: seconds credentials must remain valid to be reused
+    """
+    def __init__(self, max_entries, min_lifetime):
+        self.max_entries = max_entries
+        self.min_lifetime = min_lifetime
+        self.counters = dict.fromkeys(("hits", "misses", "refreshes",
+                                       "client_hits", "client_misses"), 0)
+        self._credentials = OrderedDict()
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_credentials(self, assume_role_policy, assume_role):
+        """
+        Returns cached credentials for the session policy, or calls
+        assume_role(assume_role_policy) and caches its result
+            :param assume_role_policy: rendered session policy
+            :param assume_role: callable returning STS Credentials
+        """
+        if self.max_entries <= 0:
+            return assume_role(assume_role_policy)
+
+        key = policy_key(assume_role_policy)
+        with self._lock:
+            sts_creds = self._credentials.get(key)
+            if sts_creds is not None and self._lifetime(sts_creds) >= self.min_lifetime:
+                self._credentials.move_to_end(key)
+                self.counters["hits"] += 1
+                return sts_creds
+            self.counters["refreshes" if sts_creds is not None else "misses"] += 1
+
+        sts_creds = assume_role(assume_role_policy)
+        self._put(self._credentials, key, sts_creds)
+        return sts_creds
+
+    def get_client(self, service_name, sts_creds, create_client):
+        """
+        Returns the cached client of a service for the credentials, or
+        calls create_client() and caches its result
+            :param service_name:
+            :param sts_creds: None for the container's own credentials
+            :param create_client: callable returning a boto3 client
+        """
+        if self.max_entries <= 0:
+            return create_client()
+
+        key = (service_name, sts_creds["AccessKeyId"] if sts_creds else None)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.counters["client_hits"] += 1
+                return client
+            self.counters["client_misses"] += 1
+
+        client = create_client()
+        self._put(self._clients, key, client)
+        return client
+
+    def stats(self):
+        """
+        Returns counters and the number of cached credentials and clients
+        """
+        with self._lock:
+            stats = dict(self.counters)
+            stats["credentials"] = len(self._credentials)
+            stats["clients"] = len(self._clients)
+        lookups = stats["hits"] + stats["misses"] + stats["refreshes"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+    def _put(self, entries, key, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    @staticmethod
+    def _lifetime(sts_creds):
+        expiration = sts_creds.get("Expiration")
+        if expiration is None:
+            return float("inf")
+        return (expiration - datetime.datetime.now(expiration.tzinfo)).total_seconds()
+
+
+def policy_key(assume_role_policy):
+    """
+    Returns the digest identifying a rendered session policy
+        :param assume_role_policy:
+    """
+    return hashlib.sha256(json.dumps(assume_role_policy, sort_keys=True)
+                          .encode("utf-8")).digest()
+
+
+_CACHE = SessionCache(
+    int(os.environ.get("SESSION_CACHE_SIZE", constants.SESSION_CACHE_SIZE)),
+    float(os.environ.get("CREDENTIALS_MIN_LIFETIME", constants.CREDENTIALS_MIN_LIFETIME)))
+
+
+def get_credentials(assume_role_policy, assume_role):
+    """
+    Returns credentials for the session policy from the session cache
+        :param assume_role_policy:
+        :param assume_role: callable(assume_role_policy) calling STS
+    """
+    return _CACHE.get_credentials(assume_role_policy, assume_role)
+
+
+def get_client(service_name, sts_creds, create_client):
+    """
+    Returns a client of the service for the credentials from the session cache
+        :param service_name:
+        :param sts_creds:
+        :param create_client: callable returning a new client
+    """
+    return _CACHE.get_client(service_name, sts_creds, create_client)
+
+
+def stats():
+    """
+    Returns hit ratio and size of the session cache
+    """
+    return _CACHE.stats()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Streamed listing responses.
+A listing is sent page by page as list_objects_v2 or DynamoDB query
+pages arrive instead of after the last one, so the first names reach the
+client after a single request and memory is bounded by a page.
+    ndjson - application/x-ndjson, one JSON string per line
+    json   - the body of the buffered response, written in chunks
+The response body is an iterator of bytes: a local HTTP server, or
+Lambda response streaming through a web adapter, writes the chunks as
+they come, API Gateway receives them joined (see apis.get_object_stream).
+Streamed listings bypass the listing cache and carry no ETag, both need
+the whole listing before the first byte.
+"""
+
+from http import HTTPStatus
+
+import helper
+import response_body
+
+STREAM_NDJSON = "ndjson"
+STREAM_JSON = "json"
+# Content-Type of each stream format
+STREAM_FORMATS = {STREAM_NDJSON: "application/x-ndjson",
+                  STREAM_JSON: "application/json"}
+
+
+def get_stream_format(event):
+    """
+    Returns the stream format of a listing request: its stream parameter,
+    ndjson when the Accept header asks for it, else None
+        :param event:
+    """
+    stream_format = (event.get("queryStringParameters") or {}).get("stream")
+    if stream_format:
+        if stream_format not in STREAM_FORMATS:
+            raise ValueError("stream must be one of {0}".format(
+                ", ".join(sorted(STREAM_FORMATS))))
+        return stream_format
+
+    headers = {name.lower(): value for name, value in
+               (event.get("headers") or {}).items()}
+    if STREAM_FORMATS[STREAM_NDJSON] in headers.get("accept", ""):
+        return STREAM_NDJSON
+    return None
+
+
+def s3_pages(s3_client, bucket_name, prefix):
+    """
+    Yields the Contents of each list_objects_v2 page under a prefix
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param prefix:
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        yield page.get("Contents", [])
+
+
+def object_names(contents):
+    """
+    Returns the object names (last key segment) of a list_objects_v2 page
+        :param contents:
+    """
+    return [obj["Key"].rsplit("/", 1)[-1] for obj in contents]
+
+
+def listing_response(pages, get_names, stream_format, required=True):
+    """
+    Returns 200 with a body yielding the listing page by page. The first
+    page is read before returning so that its errors still produce an
+    error status, and an empty first page is 503 when required, as for
+    the buffered listing
+        :param pages: iterable of pages, e.g. s3_pages()
+        :param get_names: callable(page) returning the object names of a page
+        :param stream_format: STREAM_NDJSON or STREAM_JSON
+        :param required=True:
+    """
+    pages = iter(pages)
+    first_page = next(pages, [])
+    if required and not first_page:
+        return helper.failure_response("Operation failed. Please retry.",
+                                       HTTPStatus.SERVICE_UNAVAILABLE)
+
+    response = helper.create_response(None, HTTPStatus.OK)
+    response["headers"]["Content-Type"] = STREAM_FORMATS[stream_format]
+    response["body"] = iter_body(get_names(first_page), pages, get_names, stream_format)
+    return response
+
+
+def iter_body(first_names, pages, get_names, stream_format):
+    """
+    Yields the encoded names of each page. A page failing once the
+    status is sent ends the body with an error line (ndjson) or an
+    "error" member (json)
+        :param first_names:
+        :param pages:
+        :param get_names:
+        :param stream_format:
+    """
+    ndjson = stream_format == STREAM_NDJSON
+    if not ndjson:
+        yield '{{"status": {0}, "result": ['.format(
+            response_body.dumps(HTTPStatus.OK.phrase)).encode("utf-8")
+
+    names, separator, error = first_names, "", None
+    while True:
+        if names:
+            if ndjson:
+                yield "".join(response_body.dumps(name) + "\n"
+                              for name in names).encode("utf-8")
+            else:
+                yield (separator + response_body.dumps(names)[1:-1]).encode("utf-8")
+                separator = ","
+        try:
+            page = next(pages, None)
+            if page is None:
+                break
+            names = get_names(page)
+        except Exception as ex:
+            error = helper.format_exception(ex)
+            break
+
+    if ndjson:
+        if error:
+            yield (response_body.dumps({"error": error}) + "\n").encode("utf-8")
+    elif error:
+        yield '], "error": {0}}}'.format(response_body.dumps(error)).encode("utf-8")
+    else:
+        yield b"]}"
+
+
+def is_streamed(response):
+    """
+    Returns True when the body of a response is an iterator of chunks
+        :param response:
+    """
+    body = response.get("body")
+    return body is not None and not isinstance(body, (str, bytes))
+
+
+def buffer(response):
+    """
+    Joins a streamed body into the str body API Gateway expects
+        :param response:
+    """
+    if is_streamed(response):
+        response["body"] = b"".join(response["body"]).decode("utf-8")
+    return response
@@ -14,14 +14,19 @@ from http import HTTPStatus
 
 import botocore
 
+import async_pipeline
 import constants
 import helper
+import lister
+import streaming
+import upload_engine
+from compact_listing import digest_objects
 
 
 def put_object(sts_creds, req_header):
     """
-    Uploads objects into s3 bucket/prefix with {tenant_id/user_id}
-    and tags with tenant_id and user_id
+    Uploads objects into s3 bucket/prefix with {tenant_id/user_id},
+    tagged with tenant_id and user_id as part of the upload
         :param sts_creds:
         :param req_header:
         :return: 201 - Success
@@ -32,18 +37,15 @@ def put_object(sts_creds, req_header):
         s3_client = helper.get_boto3_client("s3", sts_creds)
         helper.check_create_bucket(s3_client, req_header["bucket_name"])
 
-        api_put_resp = s3_client.put_object(Bucket=req_header["bucket_name"],
-                                            Key='{0}/{1}'.format(req_header["prefix"],
-                                                                 req_header["object_key"]),
-                                            Body=req_header["object_value"])
+        api_put_resp = upload_engine.upload_object(s3_client, req_header["bucket_name"],
+                                                   '{0}/{1}'.format(req_header["prefix"],
+                                                                    req_header["object_key"]),
+                                                   req_header["object_value"],
+                                                   helper.get_tagging(req_header["tag_set"]))
 
         if api_put_resp and \
                 api_put_resp['ResponseMetadata']['HTTPStatusCode'] == HTTPStatus.OK.value:
-            api_tag_resp = s3_client.put_object_tagging(Bucket=req_header["bucket_name"],
-                                                        Key='{0}/{1}'.format(req_header["prefix"],
-                                                                             req_header["object_key"]),
-                                                        Tagging=req_header["tag_set"])
-            return helper.success_response(api_tag_resp)
+            return helper.success_response(helper.put_result(api_put_resp))
         else:
             return helper.failure_response("Operation failed. Please retry.",
                                            HTTPStatus.SERVICE_UNAVAILABLE)
@@ -52,11 +54,105 @@ def put_object(sts_creds, req_header):
         return helper.failure_response(helper.format_exception(ex))
 
 
+def put_objects(sts_creds, req_header):
+    """
+    Uploads a batch of tagged objects with one client and bucket check,
+    concurrently on the async pipeline or the fan-out pool
+        :param sts_creds:
+        :param req_header: tenant context with "objects"
+        :return: 201 - Success, 207 - Some objects failed
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+
+        tagging = helper.get_tagging(req_header["tag_set"])
+
+        def get_key(obj):
+            return '{0}/{1}'.format(req_header["prefix"], obj["object_key"])
+
+        if async_pipeline.is_enabled():
+            return helper.batch_response(async_pipeline.put_objects(
+                sts_creds, s3_client, req_header["bucket_name"], req_header["objects"],
+                get_key, tagging))
+        return helper.batch_response(helper.put_objects(
+            lambda obj: helper.put_s3_object(s3_client, req_header["bucket_name"],
+                                             get_key(obj), obj["object_value"], tagging),
+            req_header["objects"]))
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def init_upload(sts_creds, req_header):
+    """
+    Returns presigned uploads of the requested objects below
+    {tenant_id/user_id} that must carry the tenant_id and user_id tags
+        :param sts_creds:
+        :param req_header: tenant context with "object_keys", "upload_method",
+            "expires_in" and "max_bytes"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+        keys = [(name, '{0}/{1}'.format(req_header["prefix"], name))
+                for name in req_header["object_keys"]]
+        return helper.presigned_uploads_response(sts_creds, req_header["bucket_name"], keys,
+                                                 req_header, req_header["tag_set"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
 def get_object(sts_creds, req_header):
     """
     Retrieve objects based on tags
         :param sts_creds:
         :param req_header:
+        :return: 200 - Success, 304 - Not Modified
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error, 503 - Unavailable
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        helper.check_create_bucket(s3_client, req_header["bucket_name"])
+        objects = lister.list_objects(s3_client,
+                                      req_header["bucket_name"],
+                                      req_header["prefix"])
+
+        if objects:
+            # Tags are set when an object is written, so its key and ETag
+            # identify the result before any GetObjectTagging is sent
+            etag = helper.format_etag(digest_objects(objects))
+            if helper.etag_matches(req_header.get("if_none_match"), etag):
+                return helper.not_modified_response(etag)
+            user_objects = find_tagged_objects(sts_creds, s3_client,
+                                               req_header["bucket_name"],
+                                               objects)
+            return helper.listing_response(user_objects, req_header, etag)
+        else:
+            return helper.failure_response("Operation failed. Please retry.",
+                                           HTTPStatus.SERVICE_UNAVAILABLE)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def stream_object(sts_creds, req_header):
+    """
+    Streams the objects tagged with the caller's tenant context page by page as
+    list_objects_v2 returns them
+        :param sts_creds:
+        :param req_header: tenant context with "stream_format"
         :return: 200 - Success
                  400 - Bad Request, 401 - Unauthorized
                  500 - Error, 503 - Unavailable
@@ -64,29 +160,144 @@ def get_object(sts_creds, req_header):
     try:
         s3_client = helper.get_boto3_client("s3", sts_creds)
         helper.check_create_bucket(s3_client, req_header["bucket_name"])
-        api_list_resp = s3_client.list_objects_v2(
-            Bucket=req_header["bucket_name"],
-            Prefix=req_header["prefix"],
-        )
-
-        if api_list_resp and api_list_resp['KeyCount'] > 0:
-            user_objects = []
-            for obj in api_list_resp['Contents']:
-                try:
-                    api_tag_resp = s3_client.get_object_tagging(Bucket=req_header["bucket_name"],
-                                                                Key=obj['Key'])
-                    if api_tag_resp and \
-                            api_tag_resp["ResponseMetadata"]["HTTPStatusCode"] == HTTPStatus.OK.value:
-                        user_objects.append(obj['Key'].rsplit('/', 1)[-1])
-
-                except botocore.exceptions.ClientError as ex:
-                    if ex.response["Error"]["Code"] == "AccessDenied":
-                        # boto3 throws an exception, so do nothing
-                        pass
-                    else:
-                        raise ex
-
-            return helper.success_response(user_objects,
+        return streaming.listing_response(
+            streaming.s3_pages(s3_client, req_header["bucket_name"], req_header["prefix"]),
+            lambda page: find_tagged_objects(sts_creds, s3_client,
+                                             req_header["bucket_name"], page),
+            req_header["stream_format"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_objects(sts_creds, req_header):
+    """
+    Retrieve the contents of several objects below {tenant_id/user_id}
+    with one client, concurrently on the fan-out pool. The session policy
+    only allows reading objects tagged with the caller's tenant context
+        :param sts_creds:
+        :param req_header: tenant context with "object_keys" or "limit"
+        :return: 200 - Success, 207 - Some objects failed or did not fit
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        if "object_keys" in req_header:
+            keys = [(name, '{0}/{1}'.format(req_header["prefix"], name))
+                    for name in req_header["object_keys"]]
+        else:
+            objects = lister.list_objects(s3_client,
+                                          req_header["bucket_name"],
+                                          req_header["prefix"])[:req_header["limit"]]
+            keys = [(obj['Key'].rsplit('/', 1)[-1], obj['Key']) for obj in objects]
+
+        results = helper.get_objects(s3_client, req_header["bucket_name"], keys)
+        return helper.batch_response(results, HTTPStatus.OK)
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_object_content(sts_creds, req_header):
+    """
+    Retrieve the contents of one object, or a Range of it, tagged with
+    the tenant_id and user_id
+        :param sts_creds:
+        :param req_header: tenant context with "object_key" and "range"
+        :return: 200 - Success, 206 - Partial Content
+                 400 - Bad Request, 401 - Unauthorized, 404 - Not Found
+                 413 - Too Large, 416 - Range Not Satisfiable, 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        return helper.object_content_response(s3_client, req_header["bucket_name"],
+                                              '{0}/{1}'.format(req_header["prefix"], req_header["object_key"]),
+                                              req_header["range"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_object_urls(sts_creds, req_header):
+    """
+    Returns presigned download URLs for the user's objects below
+    {tenant_id/user_id}. Objects are not filtered by their tags here:
+    the session policy only lets the URLs read correctly tagged objects
+        :param sts_creds:
+        :param req_header: tenant context with "expires_in" and "limit"
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized
+                 500 - Error
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+        objects = lister.list_objects(s3_client,
+                                      req_header["bucket_name"],
+                                      req_header["prefix"])[:req_header["limit"]]
+        keys = [(obj['Key'].rsplit('/', 1)[-1], obj['Key']) for obj in objects]
+        return helper.presigned_urls_response(sts_creds, req_header["bucket_name"], keys,
+                                              req_header["expires_in"])
+
+    except botocore.exceptions.ClientError as ex:
+        return helper.failure_response_message(helper.format_exception(ex),
+                                               ex.response["Error"]["Code"])
+
+    except Exception as ex:
+        return helper.failure_response(helper.format_exception(ex))
+
+
+def get_tenant_object(sts_creds, req_header):
+    """
+    Retrieve objects of every user below the tenant prefix,
+    filtered by the tenant tags
+        :param sts_creds:
+        :param req_header:
+        :return: 200 - Success
+                 400 - Bad Request, 401 - Unauthorized, 403 - Forbidden
+                 500 - Error, 503 - Unavailable
+    """
+    try:
+        s3_client = helper.get_boto3_client("s3", sts_creds)
+
+        def list_user_objects(user_prefix):
+            return get_tagged_objects(s3_client,
+                                      req_header["bucket_name"],
+                                      helper.list_objects(s3_client,
+                                                         req_header["bucket_name"],
+                                                         user_prefix))
+
+        async def list_user_objects_async(async_client, user_prefix):
+            return await get_tagged_objects_async(
+                async_client, req_header["bucket_name"],
+                await async_pipeline.list_objects(async_client,
+                                                  req_header["bucket_name"],
+                                                  user_prefix))
+
+        if async_pipeline.is_enabled():
+            tenant_objects = async_pipeline.get_tenant_listing(sts_creds,
+                                                               req_header["bucket_name"],
+                                                               req_header["tenant_prefix"],
+                                                               list_user_objects_async)
+        else:
+            tenant_objects = helper.get_tenant_listing(s3_client,
+                                                       req_header["bucket_name"],
+                                                       req_header["tenant_prefix"],
+                                                       list_user_objects)
+        if tenant_objects:
+            return helper.success_response(tenant_objects,
                                            HTTPStatus.OK)
         else:
             return helper.failure_response("Operation failed. Please retry.",
@@ -100,6 +311,73 @@ def get_object(sts_creds, req_header):
         return helper.failure_response(helper.format_exception(ex))
 
 
+def get_tagged_objects(s3_client, bucket_name, objects):
+    """
+    Returns names of the objects whose tags are readable with the
+    session policy, i.e. tagged with the caller's tenant context
+        :param s3_client:
+        :param bucket_name:
+        :param objects: list_objects_v2 Contents
+    """
+    user_objects = []
+    for obj in objects:
+        try:
+            api_tag_resp = s3_client.get_object_tagging(Bucket=bucket_name,
+                                                        Key=obj['Key'])
+            if api_tag_resp and \
+                    api_tag_resp["ResponseMetadata"]["HTTPStatusCode"] == HTTPStatus.OK.value:
+                user_objects.append(obj['Key'].rsplit('/', 1)[-1])
+
+        except botocore.exceptions.ClientError as ex:
+            if ex.response["Error"]["Code"] == "AccessDenied":
+                # boto3 throws an exception, so do nothing
+                pass
+            else:
+                raise ex
+
+    return user_objects
+
+
+async def get_tagged_objects_async(s3_client, bucket_name, objects):
+    """
+    Same as get_tagged_objects() with the GetObjectTagging calls in flight
+    together on the async pipeline
+        :param s3_client: async client
+        :param bucket_name:
+        :param objects: list_objects_v2 Contents
+    """
+    async def get_tagged_object(obj):
+        try:
+            api_tag_resp = await s3_client.get_object_tagging(Bucket=bucket_name,
+                                                              Key=obj['Key'])
+        except botocore.exceptions.ClientError as ex:
+            if ex.response["Error"]["Code"] == "AccessDenied":
+                return None
+            raise ex
+        if api_tag_resp and \
+                api_tag_resp["ResponseMetadata"]["HTTPStatusCode"] == HTTPStatus.OK.value:
+            return obj['Key'].rsplit('/', 1)[-1]
+        return None
+
+    return [name for _, name in await async_pipeline.gather(get_tagged_object, objects)
+            if name is not None]
+
+
+def find_tagged_objects(sts_creds, s3_client, bucket_name, objects):
+    """
+    Returns get_tagged_objects() of the objects, checked concurrently on
+    the async pipeline when it is enabled
+        :param sts_creds:
+        :param s3_client:
+        :param bucket_name:
+        :param objects: list_objects_v2 Contents
+    """
+    if async_pipeline.is_enabled():
+        return async_pipeline.call(sts_creds, "s3", get_tagged_objects_async,
+                                   bucket_name, objects)
+    return get_tagged_objects(s3_client, bucket_name, objects)
+
+
 def populate_context(event):
     """
     Adds derived fields to support operations
@@ -117,6 +395,7 @@ def populate_context(event):
         "bucket_arn": "arn:aws:s3:::{0}".format(bucket_name),
         "prefix": "{0}/{1}".format(req_header["tenant_id"],
                                    req_header["user_id"]),
+        "tenant_prefix": "{0}/".format(req_header["tenant_id"]),
         "tag_set": {
             'TagSet': [
                 {'Key': 'tenant_id', 'Value': req_header["tenant_id"]},
@@ -0,0 +1,100 @@
+import os
+import sys
+import unittest
+from os.path import abspath, dirname, join
+
+import botocore
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import async_pipeline
+import tag
+from local_s3 import AsyncLocalS3, LocalS3
+
+BUCKET = "aws-saas-s3-tag"
+CREDS = {"AccessKeyId": "AKIA1", "SecretAccessKey": "s", "SessionToken": "t"}
+
+
+class TestAsyncPipeline(unittest.TestCase):
+    def setUp(self):
+        self.s3_client = LocalS3()
+        self.async_client = AsyncLocalS3(self.s3_client, latency=0.01,
+                                         denied=("t/u1/secret",))
+
+        async def create_client(service_name, sts_creds):
+            return self.async_client
+
+        self.previous = async_pipeline.set_client_factory(create_client)
+        os.environ["ASYNC_MAX_IN_FLIGHT"] = "8"
+
+
+    def tearDown(self):
+        async_pipeline.set_client_factory(self.previous)
+        del os.environ["ASYNC_MAX_IN_FLIGHT"]
+
+
+    def test_tagged_objects_and_tenant_listing(self):
+        self.s3_client.load(BUCKET, [("t/u1/obj-{0:02d}".format(i), b"x") for i in range(30)]
+                            + [("t/u1/secret", b"x"), ("t/u2/a", b"x")])
+        objects = self.s3_client.list_objects_v2(Bucket=BUCKET, Prefix="t/u1/")["Contents"]
+        names = tag.find_tagged_objects(CREDS, self.s3_client, BUCKET, objects)
+        self.assertEqual(names, ["obj-{0:02d}".format(i) for i in range(30)])
+        self.assertEqual(self.async_client.max_in_flight, 8)
+
+        listing = async_pipeline.get_tenant_listing(CREDS, BUCKET, "t/")
+        self.assertEqual(list(listing), ["u1", "u2"])
+        self.assertEqual(listing["u2"], ["a"])
+
+
+    def test_put_objects(self):
+        os.environ.update({"UPLOAD_MULTIPART_THRESHOLD": "16",
+                           "UPLOAD_PART_SIZE": str(5 << 20)})
+        try:
+            objects = [{"object_key": "small", "object_value": b"x"},
+                       {"object_key": "large", "object_value": b"y" * (6 << 20)},
+                       {"object_key": "secret", "object_value": b"z"}]
+            results = async_pipeline.put_objects(CREDS, self.s3_client, BUCKET, objects,
+                                                 lambda obj: "t/u1/" + obj["object_key"])
+        finally:
+            del os.environ["UPLOAD_MULTIPART_THRESHOLD"]
+            del os.environ["UPLOAD_PART_SIZE"]
+
+        self.assertEqual([result["statusCode"] for result in results], [201, 201, 403])
+        self.assertEqual(results[2]["error"], "AccessDenied")
+        self.assertEqual(self.s3_client.requests["complete_multipart_upload"], 1)
+        heads = async_pipeline.head_objects(CREDS, BUCKET, ["t/u1/small", "t/u1/missing"])
+        self.assertEqual(list(heads), ["t/u1/small"])
+        with self.assertRaises(botocore.exceptions.ClientError):
+            async_pipeline.head_objects(CREDS, BUCKET, ["t/u1/small", "t/u1/secret"])
+
+
+    def test_evicted_client_closed_on_release(self):
+        closed = []
+
+        class Client(object):
+            def __init__(self, name):
+                self.name = name
+
+            async def close(self):
+                closed.append(self.name)
+
+        async def create_client(service_name, sts_creds):
+            return Client(sts_creds["AccessKeyId"])
+
+        pipeline = async_pipeline.AsyncPipeline(create_client, 1)
+
+        async def evict_held_client():
+            held = await pipeline.get_client("s3", CREDS)
+            other = await pipeline.get_client("s3", dict(CREDS, AccessKeyId="AKIA2"))
+            self.assertEqual(closed, [])
+            await pipeline.release_client(held)
+            self.assertEqual(closed, ["AKIA1"])
+            await pipeline.release_client(other)
+            self.assertEqual(closed, ["AKIA1"])
+
+        pipeline.run(evict_held_client())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import sys
+import unittest
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import download_engine
+import helper
+from local_s3 import LocalS3
+
+BUCKET = "aws-saas-s3-prefix"
+
+
+class TestBatchGet(unittest.TestCase):
+    def test_contents_and_errors(self):
+        s3_client = LocalS3()
+        s3_client.load(BUCKET, [("t/u/a.txt", b"hello"), ("t/u/b.bin", b"\xff\x00"),
+                                ("t/u/empty", b"")])
+        keys = [(name, "t/u/" + name) for name in ("a.txt", "b.bin", "empty", "missing")]
+        results = {result["key"]: result
+                   for result in helper.get_objects(s3_client, BUCKET, keys)}
+        self.assertEqual(results["a.txt"]["value"], "hello")
+        self.assertEqual(results["b.bin"], {"key": "b.bin", "statusCode": 200,
+                                            "value": "/wA=", "encoding": "base64"})
+        self.assertEqual(results["empty"]["value"], "")
+        self.assertEqual(results["missing"]["statusCode"], 404)
+
+
+    def test_size_budget(self):
+        s3_client = LocalS3()
+        s3_client.load(BUCKET, [("k{0}".format(i), b"x" * 40) for i in range(10)]
+                       + [("big", b"x" * 500)])
+        keys = [(key, key) for key in ["big"] + ["k{0}".format(i) for i in range(10)]]
+        results = list(helper.get_objects(s3_client, BUCKET, keys, max_bytes=100,
+                                          max_workers=1))
+        returned = [result for result in results if result["statusCode"] == 200]
+        self.assertEqual(len(returned), 2)
+        self.assertEqual(len(results), 11)
+        self.assertTrue(all(result["statusCode"] == 413 for result in results
+                            if result not in returned))
+        self.assertNotIn("big", [result["key"] for result in returned])
+
+
+    def test_request_order_and_item_errors(self):
+        class FailingS3(LocalS3):
+            def get_object(self, Bucket, Key, **kwargs):
+                if Key == "broken":
+                    raise download_engine.RangeNotSatisfiable(3)
+                return super(FailingS3, self).get_object(Bucket=Bucket, Key=Key, **kwargs)
+
+        s3_client = FailingS3()
+        s3_client.load(BUCKET, [("k{0}".format(i), b"x") for i in range(20)]
+                       + [("broken", b"xyz")])
+        keys = [("broken", "broken")] + [("k{0}".format(i), "k{0}".format(i))
+                                           for i in reversed(range(20))]
+        results = helper.get_objects(s3_client, BUCKET, keys)
+        self.assertEqual([result["key"] for result in results], [name for name, _ in keys])
+        self.assertEqual(results[0]["statusCode"], 500)
+        self.assertTrue(all(result["statusCode"] == 200 for result in results[1:]))
+
+
+    def test_budget_counts_bytes(self):
+        s3_client = LocalS3()
+        s3_client.load(BUCKET, [("a", "\u00e9".encode("utf-8") * 15), ("b", b"x" * 20)])
+        results = helper.get_objects(s3_client, BUCKET, [("a", "a"), ("b", "b")],
+                                     max_bytes=40, max_workers=1)
+        self.assertEqual([result["statusCode"] for result in results], [200, 413])
+
+
+    def test_budget_bounds_concurrent_transfers(self):
+        class CountingS3(LocalS3):
+            transferred = 0
+
+            def get_object(self, **kwargs):
+                resp = super(CountingS3, self).get_object(**kwargs)
+                with self._lock:
+                    CountingS3.transferred += resp["ContentLength"]
+                return resp
+
+        s3_client = CountingS3(latency=0.01)
+        s3_client.load(BUCKET, [("k{0}".format(i), b"x" * 40) for i in range(10)])
+        keys = [("k{0}".format(i), "k{0}".format(i)) for i in range(10)]
+        results = helper.get_objects(s3_client, BUCKET, keys, max_bytes=100, max_workers=10)
+        self.assertEqual(len([result for result in results if result["statusCode"] == 200]), 2)
+        self.assertLessEqual(CountingS3.transferred, 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
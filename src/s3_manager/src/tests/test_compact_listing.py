@@ -0,0 +1,65 @@
+import json
+import unittest
+
+import cache_backends
+import helper
+from compact_listing import CompactListing
+
+
+def make_objects(keys):
+    return [{"Key": key, "Size": len(key)} for key in sorted(keys)]
+
+
+class TestCompactListing(unittest.TestCase):
+    def test_names_match_list_of_dicts(self):
+        objects = make_objects(["tenanta/user1/a.txt", "tenanta/user1/b/c.txt",
+                                "tenanta/user1/été.txt"])
+        listing = CompactListing.from_objects(objects, with_sizes=True)
+        self.assertEqual(listing.prefix, "tenanta/user1/")
+        self.assertEqual(list(listing.names()),
+                         [obj["Key"].rsplit("/", 1)[-1] for obj in objects])
+        self.assertEqual(json.loads(listing.names_json()), list(listing.names()))
+        self.assertEqual(listing.size(1), len(objects[1]["Key"]))
+
+
+    def test_slice_and_search(self):
+        keys = ["user1/obj-{0:04d}.txt".format(i) for i in range(100)]
+        listing = CompactListing.from_objects(make_objects(keys))
+        page = listing[10:20]
+        self.assertEqual(len(page), 10)
+        self.assertEqual(page.key(0), keys[10])
+        self.assertEqual(page.index(keys[15]), 5)
+        self.assertEqual(page.index(keys[25]), -1)
+        self.assertIn(keys[99], listing)
+        self.assertNotIn("user1/missing.txt", listing)
+
+
+    def test_escaped_names_and_round_trip(self):
+        keys = ['user1/say "hi".txt', "user1/tab\t.txt", "user1/plain.txt"]
+        listing = CompactListing.from_objects(make_objects(keys), with_sizes=True)
+        data = cache_backends.serialize(listing[1:])
+        restored = cache_backends.deserialize(data)
+        self.assertEqual(list(restored), list(listing[1:]))
+        self.assertEqual(json.loads(restored.names_json()), list(listing[1:].names()))
+        self.assertEqual(restored.size(0), listing.size(1))
+
+
+    def test_listing_etag_and_not_modified(self):
+        objects = [dict(obj, ETag='"{0}"'.format(index)) for index, obj in
+                   enumerate(make_objects(["user1/a.txt", "user1/b.txt"]))]
+        listing = CompactListing.from_objects(objects, with_sizes=True)
+        restored = cache_backends.deserialize(cache_backends.serialize(listing))
+        self.assertEqual(restored.digest, listing.digest)
+        self.assertIsNone(listing[1:].digest)
+        objects[1]["ETag"] = '"overwritten"'
+        self.assertNotEqual(CompactListing.from_objects(objects).digest, listing.digest)
+
+        response = helper.listing_response(listing, {"if_none_match": None})
+        etag = response["headers"]["ETag"]
+        self.assertEqual(json.loads(response["body"])["result"], ["a.txt", "b.txt"])
+        response = helper.listing_response(listing, {"if_none_match": 'W/"x", W/' + etag})
+        self.assertEqual((response["statusCode"], response["body"]), (304, ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+import apis
+import helper
+import token_manager
+
+ENVIRON = {"AWS_ACCOUNT_ID": "123456789012", "AWS_REGION": "us-east-1",
+           "NOSQL_DBTABLE_NAME": "aws-saas-s3-tenantmd",
+           "IAMROLE_LMDEXEC_ARN": "arn:aws:iam::123456789012:role/aws-saas-s3-lambdaexec",
+           "LISTING_CACHE_DISABLED": "db_nosql"}
+CREDS = {"AccessKeyId": "AKIA1", "SecretAccessKey": "s", "SessionToken": "t"}
+
+
+class MetadataTable(object):
+    """
+    In-memory stand-in of the metadata table for one user
+    """
+    def __init__(self):
+        self.items = {}
+
+    def put(self, key_name, etag):
+        self.items[key_name] = {"key_name": {"S": key_name}, "etag": {"S": etag},
+                                "size": {"N": "1"}}
+
+    def query(self, ProjectionExpression, **kwargs):
+        names = [name.strip() for name in ProjectionExpression.split(",")]
+        return {"Items": [{name: item[name] for name in names if name in item}
+                          for _, item in sorted(self.items.items())]}
+
+
+class TestDbNosql(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, ENVIRON)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.table = MetadataTable()
+        for patched in (mock.patch.object(helper, "get_assumed_role_creds",
+                                          return_value=CREDS),
+                        mock.patch.object(helper, "get_boto3_client",
+                                          return_value=self.table)):
+            patched.start()
+            self.addCleanup(patched.stop)
+
+
+    def test_overwrite_changes_listing_etag(self):
+        token = token_manager.vend("TenantA", "user1")
+        self.table.put("TenantA/user1/a.txt", '"1"')
+
+        def get_listing(if_none_match=None):
+            headers = {"x-token": token}
+            if if_none_match:
+                headers["If-None-Match"] = if_none_match
+            return apis.get_object({"headers": headers,
+                                    "queryStringParameters": {"partition": "db_nosql"}}, {})
+
+        response = get_listing()
+        self.assertEqual(response["statusCode"], HTTPStatus.OK)
+        etag = response["headers"]["ETag"]
+        self.assertEqual(get_listing(etag)["statusCode"], HTTPStatus.NOT_MODIFIED)
+
+        # Same key, new content
+        self.table.put("TenantA/user1/a.txt", '"2"')
+        response = get_listing(etag)
+        self.assertEqual(response["statusCode"], HTTPStatus.OK)
+        self.assertNotEqual(response["headers"]["ETag"], etag)
+
+
+if __name__ == "__main__":
+    unittest.main()
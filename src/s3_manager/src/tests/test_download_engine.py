@@ -0,0 +1,55 @@
+import sys
+import unittest
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import botocore
+
+import download_engine
+from local_s3 import LocalS3
+
+BODY = bytes(index % 251 for index in range(1000))
+
+
+class TestDownloadEngine(unittest.TestCase):
+    def test_ranged_reads(self):
+        s3_client = LocalS3()
+        s3_client.load("bucket", [("object", BODY)])
+        download = download_engine.RangedDownload(s3_client, "bucket", "object",
+                                                  part_size=64, max_workers=3)
+        self.assertEqual(bytes(download.read_all()), BODY)
+        self.assertIsNone(download.content_range)
+        self.assertEqual(s3_client.requests["get_object"], 16)
+        self.assertEqual(s3_client.requests["head_object"], 0)
+
+        download = download_engine.RangedDownload(s3_client, "bucket", "object",
+                                                  range_header="bytes=100-899", part_size=64)
+        self.assertEqual(b"".join(download.iter_chunks()), BODY[100:900])
+        self.assertEqual(download.content_range, "bytes 100-899/1000")
+
+        download = download_engine.RangedDownload(s3_client, "bucket", "object",
+                                                  range_header="bytes=-300", part_size=64)
+        self.assertEqual(bytes(download.read_all()), BODY[-300:])
+        self.assertEqual(download.content_range, "bytes 700-999/1000")
+
+
+    def test_unsatisfiable_and_overwritten(self):
+        s3_client = LocalS3()
+        s3_client.load("bucket", [("object", BODY)])
+        with self.assertRaises(download_engine.RangeNotSatisfiable) as context:
+            download_engine.RangedDownload(s3_client, "bucket", "object",
+                                           range_header="bytes=1000-")
+        self.assertEqual(context.exception.size, 1000)
+
+        download = download_engine.RangedDownload(s3_client, "bucket", "object",
+                                                  part_size=64, retries=0)
+        s3_client.load("bucket", [("object", BODY[::-1])])
+        with self.assertRaises(botocore.exceptions.ClientError) as context:
+            download.read_all()
+        self.assertEqual(context.exception.response["Error"]["Code"], "PreconditionFailed")
+
+
+if __name__ == "__main__":
+    unittest.main()
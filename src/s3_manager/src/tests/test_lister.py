@@ -0,0 +1,101 @@
+import fnmatch
+import random
+import sys
+import unittest
+from os.path import abspath, dirname, join
+
+import botocore.exceptions
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import helper
+import lister
+from local_s3 import LocalS3
+
+BUCKET = "aws-saas-s3-prefix"
+PREFIX = "tenanta/user1"
+
+
+class PolicyS3(LocalS3):
+    """
+    LocalS3 that denies list_objects_v2 outside the s3:prefix conditions
+    of the prefix approach's session policy
+    """
+    def __init__(self, tenant_id, user_id, **kwargs):
+        super(PolicyS3, self).__init__(**kwargs)
+        statement = [statement for statement in helper.get_policy_template("prefix")["Statement"]
+                     if statement["Action"] == ["s3:ListBucket"]][0]
+        self.allowed = [pattern.format(tenant_id=tenant_id, user_id=user_id)
+                        for pattern in statement["Condition"]["StringLike"]["s3:prefix"]]
+
+    def list_objects_v2(self, Bucket, Prefix="", **kwargs):
+        if not any(fnmatch.fnmatchcase(Prefix, pattern) for pattern in self.allowed):
+            raise botocore.exceptions.ClientError(
+                {"Error": {"Code": "AccessDenied", "Message": "Access Denied"}},
+                "ListObjectsV2")
+        return super(PolicyS3, self).list_objects_v2(Bucket=Bucket, Prefix=Prefix, **kwargs)
+
+
+class TestLister(unittest.TestCase):
+    def test_single_page(self):
+        s3_client = self.get_client(["a.txt", "b.txt"])
+        objects = lister.list_objects(s3_client, BUCKET, PREFIX)
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(s3_client.requests["list_objects_v2"], 1)
+
+
+    def test_start_after_split(self):
+        names = ["obj-{0:05d}.txt".format(i) for i in range(2000)]
+        self.assert_listed(names, lister.SPLIT_START_AFTER)
+
+
+    def test_start_after_split_random_keys(self):
+        rnd = random.Random(7)
+        names = ["".join(rnd.choice("abcXYZ019-_.") for _ in range(rnd.randint(1, 12)))
+                 for _ in range(3000)]
+        self.assert_listed(names, lister.SPLIT_START_AFTER)
+
+
+    def test_delimiter_split(self):
+        names = ["{0}/{1}.txt".format(folder, i)
+                 for folder in ("2019", "2020", "2021") for i in range(500)]
+        names += ["top-{0}.txt".format(i) for i in range(50)]
+        self.assert_listed(names, lister.SPLIT_DELIMITER)
+
+
+    def test_delimiter_split_with_user_prefix(self):
+        # Production callers pass the user prefix without the delimiter
+        s3_client = PolicyS3("tenanta", "user1", page_size=100)
+        names = ["{0}/{1}.txt".format(folder, i) for folder in ("a", "b") for i in range(150)]
+        s3_client.load(BUCKET, [("{0}/{1}".format(PREFIX, name), b"") for name in names])
+        s3_client.load(BUCKET, [("tenanta/user10/x/other.txt", b"")])
+        objects = lister.list_objects(s3_client, BUCKET, PREFIX, lister.SPLIT_DELIMITER, 4)
+        self.assertEqual([obj["Key"] for obj in objects],
+                         sorted("{0}/{1}".format(PREFIX, name) for name in names))
+
+
+    def test_split_range_tiles_range(self):
+        ranges = lister.split_range("p/k5", "p/x", "p/", list("0123456789kxyz"), 8)
+        self.assertEqual(ranges[0][0], "p/k5")
+        self.assertEqual(ranges[-1][1], "p/x")
+        for (_, upper), (lower, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(upper, lower)
+
+
+    def assert_listed(self, names, split):
+        s3_client = self.get_client(names)
+        # A neighbouring user sharing the prefix string must stay excluded
+        s3_client.load(BUCKET, [("tenanta/user2/other.txt", b"")])
+        objects = lister.list_objects(s3_client, BUCKET, PREFIX + "/", split, 4)
+        expected = sorted(set("{0}/{1}".format(PREFIX, name) for name in names))
+        self.assertEqual([obj["Key"] for obj in objects], expected)
+
+
+    def get_client(self, names):
+        s3_client = LocalS3(page_size=100)
+        s3_client.load(BUCKET, [("{0}/{1}".format(PREFIX, name), b"") for name in names])
+        return s3_client
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import time
+import unittest
+
+import cache_backends
+import listing_cache
+
+
+class TestListingCache(unittest.TestCase):
+    def test_hit_after_miss(self):
+        cache = cache_backends.ListingCache(max_bytes=1 << 20, ttl=60)
+        self.assertIsNone(cache.get("user1"))
+        cache.put("user1", ["a.txt"])
+        self.assertEqual(cache.get("user1"), ["a.txt"])
+        self.assertEqual(cache.stats()["hit_ratio"], 0.5)
+
+
+    def test_expired_entry_is_a_miss(self):
+        cache = cache_backends.ListingCache(max_bytes=1 << 20, ttl=0.01)
+        cache.put("user1", ["a.txt"])
+        time.sleep(0.02)
+        self.assertIsNone(cache.get("user1"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+
+    def test_lru_eviction_by_bytes(self):
+        listing = ["object-{0}.txt".format(i) for i in range(10)]
+        size = cache_backends.estimate_size(listing)
+        cache = cache_backends.ListingCache(max_bytes=2 * size, ttl=60)
+        cache.put("user1", listing)
+        cache.put("user2", list(listing))
+        cache.get("user1")
+        cache.put("user3", list(listing))
+        self.assertIsNone(cache.get("user2"))
+        self.assertIsNotNone(cache.get("user1"))
+        self.assertLessEqual(cache.stats()["bytes"], 2 * size)
+
+
+    def test_put_invalidates_listing(self):
+        req_header = {"tenant_id": "tenanta", "user_id": "user1"}
+        listings = iter([["a.txt"], ["a.txt", "b.txt"]])
+        load = lambda: next(listings)
+        self.assertEqual(listing_cache.get_listing("prefix", req_header, load), ["a.txt"])
+        self.assertEqual(listing_cache.get_listing("prefix", req_header, load), ["a.txt"])
+        listing_cache.record_put("prefix", req_header)
+        self.assertEqual(listing_cache.get_listing("prefix", req_header, load),
+                         ["a.txt", "b.txt"])
+
+
+    def test_shared_only_listing_skips_memory_backend(self):
+        req_header = {"tenant_id": "tenanta", "user_id": "user3"}
+        listings = iter([["a.txt"], ["a.txt", "b.txt"], ["a.txt", "b.txt"]])
+        load = lambda: next(listings)
+        self.assertEqual(listing_cache.get_listing("db_nosql", req_header, load,
+                                                   shared_only=True), ["a.txt"])
+        self.assertEqual(listing_cache.get_listing("db_nosql", req_header, load,
+                                                   shared_only=True), ["a.txt", "b.txt"])
+
+        os.environ["CACHE_BACKEND"] = "sqlite"
+        try:
+            self.assertFalse(listing_cache.is_process_local())
+        finally:
+            del os.environ["CACHE_BACKEND"]
+
+
+    def test_shared_backend_versions(self):
+        path = os.path.join(tempfile.mkdtemp(), "cache.db")
+        container1 = listing_cache.VersionedCache(cache_backends.SQLiteBackend(path), 60)
+        container2 = listing_cache.VersionedCache(cache_backends.SQLiteBackend(path), 60)
+        req_header = {"tenant_id": "tenanta", "user_id": "user1"}
+        container1.get("prefix", req_header, lambda: ["a.txt"])
+        self.assertEqual(container2.get("prefix", req_header, lambda: []), ["a.txt"])
+        container2.bump("prefix", req_header)
+        self.assertEqual(container1.get("prefix", req_header, lambda: ["a.txt", "b.txt"]),
+                         ["a.txt", "b.txt"])
+
+
+    def test_put_in_other_process_invalidates_listing(self):
+        os.environ.update({"CACHE_BACKEND": "sqlite",
+                           "CACHE_SQLITE_PATH": os.path.join(tempfile.mkdtemp(), "cache.db")})
+        listing_cache._STATE["cache"] = None
+        try:
+            req_header = {"tenant_id": "tenanta", "user_id": "user2"}
+            self.assertEqual(listing_cache.get_listing("prefix", req_header, lambda: ["a.txt"]),
+                             ["a.txt"])
+            cache = listing_cache.get_cache()
+            pid = os.fork()
+            if pid == 0:
+                # The forked process opens its own connection to the shared file
+                forked_cache = listing_cache.get_cache()
+                listing_cache.record_put("prefix", req_header)
+                os._exit(0 if forked_cache is not cache else 1)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            self.assertEqual(listing_cache.get_listing("prefix", req_header,
+                                                       lambda: ["a.txt", "b.txt"]),
+                             ["a.txt", "b.txt"])
+        finally:
+            del os.environ["CACHE_BACKEND"]
+            del os.environ["CACHE_SQLITE_PATH"]
+            listing_cache._STATE["cache"] = None
+
+
+    def test_disabled_approach(self):
+        os.environ["LISTING_CACHE_DISABLED"] = "bucket"
+        try:
+            self.assertFalse(listing_cache.is_enabled("bucket"))
+            self.assertTrue(listing_cache.is_enabled("prefix"))
+        finally:
+            del os.environ["LISTING_CACHE_DISABLED"]
+
+if __name__ == '__main__':
+    unittest.main()
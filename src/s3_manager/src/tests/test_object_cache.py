@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+import unittest
+from os.path import abspath, dirname, join
+from unittest import mock
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import object_cache
+from local_s3 import LocalS3
+
+BODY = bytes(index % 251 for index in range(1000))
+
+
+def read(cache, s3_client, key, range_header=None):
+    download = cache.open(s3_client, "bucket", key, range_header)
+    try:
+        return type(download).__name__, bytes(download.read_all())
+    finally:
+        download.close()
+
+
+class TestObjectCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.s3_client = LocalS3()
+        self.s3_client.load("bucket", [("a", BODY), ("b", BODY[::-1]), ("c", BODY[:600])])
+
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+
+    def test_revalidated_hit(self):
+        cache = object_cache.ObjectCache(self.directory.name, max_bytes=1 << 20,
+                                         max_object_bytes=1 << 20)
+        self.assertEqual(read(cache, self.s3_client, "a"), ("CachingDownload", BODY))
+        self.assertEqual(read(cache, self.s3_client, "a"), ("CachedRead", BODY))
+        self.assertEqual(read(cache, self.s3_client, "a", "bytes=-10"),
+                         ("CachedRead", BODY[-10:]))
+        self.assertEqual(self.s3_client.requests["get_object"], 2)
+        self.assertEqual(self.s3_client.requests["head_object"], 1)
+
+        self.s3_client.load("bucket", [("a", BODY[::-1])])
+        self.assertEqual(read(cache, self.s3_client, "a"), ("CachingDownload", BODY[::-1]))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["stale"]), (2, 2, 1))
+        self.assertEqual(stats["bytes_saved"], 1010)
+        self.assertEqual((stats["entries"], stats["bytes"]), (1, 1000))
+
+
+    def test_lru_eviction_by_bytes(self):
+        cache = object_cache.ObjectCache(self.directory.name, max_bytes=2000,
+                                         max_object_bytes=1000)
+        read(cache, self.s3_client, "a")
+        read(cache, self.s3_client, "b")
+        read(cache, self.s3_client, "a")
+        read(cache, self.s3_client, "c")
+        self.assertEqual(read(cache, self.s3_client, "b")[0], "CachingDownload")
+        self.assertEqual(read(cache, self.s3_client, "c")[0], "CachedRead")
+        stats = cache.stats()
+        self.assertEqual(stats["evictions"], 2)
+        self.assertLessEqual(stats["bytes"], 2000)
+
+
+    def test_forked_process_has_own_directory(self):
+        environ = {"OBJECT_CACHE_DIR": self.directory.name, "OBJECT_CACHE_MAX_BYTES": "2000",
+                   "OBJECT_CACHE_MAX_OBJECT_BYTES": "1000"}
+        # Left by a process that no longer runs
+        os.makedirs(join(self.directory.name, "999999999"))
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.dict(object_cache._STATE, {"cache": None, "pid": None}):
+            cache = object_cache.get_cache()
+            read(cache, self.s3_client, "a")
+            parent_files = os.listdir(cache.directory)
+            pid = os.fork()
+            if pid == 0:
+                forked_cache = object_cache.get_cache()
+                read(forked_cache, self.s3_client, "b")
+                read(forked_cache, self.s3_client, "c")
+                os._exit(0 if forked_cache.directory != cache.directory else 1)
+            self.assertEqual(os.waitpid(pid, 0)[1], 0)
+            self.assertEqual(os.listdir(cache.directory), parent_files)
+            self.assertEqual(read(cache, self.s3_client, "a")[0], "CachedRead")
+        self.assertEqual(sorted(os.listdir(self.directory.name)),
+                         sorted([str(os.getpid()), str(pid)]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import base64
+import datetime
+import json
+import unittest
+
+import presigner
+
+CREDS = {"AccessKeyId": "AKIDEXAMPLE",
+         "SecretAccessKey": "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY",
+         "SessionToken": "token/with+chars="}
+NOW = datetime.datetime(2024, 5, 1, 12, 0, 0)
+
+
+class TestPresigner(unittest.TestCase):
+    def test_signature_matches_botocore(self):
+        # Signature of boto3 generate_presigned_url (s3v4, virtual host) at NOW
+        url = presigner.Presigner(CREDS, "us-west-2", 600, NOW).presign(
+            "GET", "tenant-bucket", "TenantA/user1/a b+c.txt")
+        self.assertTrue(url.startswith(
+            "https://tenant-bucket.s3.us-west-2.amazonaws.com/TenantA/user1/a%20b%2Bc.txt?"))
+        self.assertIn("X-Amz-Credential=AKIDEXAMPLE%2F20240501%2Fus-west-2%2Fs3%2F"
+                      "aws4_request", url)
+        self.assertIn("X-Amz-Security-Token=token%2Fwith%2Bchars%3D", url)
+        self.assertTrue(url.endswith("&X-Amz-Signature=0674d12039b21cbeeebc8efb1baac388"
+                                     "6bca22d96edf10e23000a1de3aa33ca1"))
+
+
+    def test_access_point_host_and_expiry(self):
+        self.assertEqual(presigner.get_host(
+            "arn:aws:s3:us-east-1:123456789012:accesspoint/tenanta", "us-east-1"),
+            "tenanta-123456789012.s3-accesspoint.us-east-1.amazonaws.com")
+        with self.assertRaises(ValueError):
+            presigner.Presigner(CREDS, "us-east-1", presigner.MAX_EXPIRES_IN + 1)
+
+
+    def test_signed_tagging_header(self):
+        url = presigner.Presigner(CREDS, "us-west-2", 600, NOW, {
+            "x-amz-tagging": "tenant_id=TenantA&user_id=user1"
+        }).presign("PUT", "tenant-bucket", "TenantA/user1/a.txt")
+        self.assertIn("X-Amz-SignedHeaders=host%3Bx-amz-tagging", url)
+        self.assertTrue(url.endswith("&X-Amz-Signature=19055845394f0c8adda8ea4982767cb8"
+                                     "f1761553391597b2d7a761e5a28b7e04"))
+
+
+    def test_post_policy_conditions(self):
+        form = presigner.Presigner(CREDS, "us-east-1", 60, NOW).presign_post(
+            "tenant-bucket", "TenantA/user1/a.txt", {"tagging": "<Tagging/>"},
+            [["content-length-range", 0, 10]])
+        policy = json.loads(base64.b64decode(form["fields"]["policy"]))
+        self.assertEqual(form["url"], "https://tenant-bucket.s3.us-east-1.amazonaws.com/")
+        self.assertEqual(policy["expiration"], "2024-05-01T12:01:00Z")
+        self.assertIn({"key": "TenantA/user1/a.txt"}, policy["conditions"])
+        self.assertIn({"tagging": "<Tagging/>"}, policy["conditions"])
+        self.assertIn(["content-length-range", 0, 10], policy["conditions"])
+        self.assertEqual(form["fields"]["x-amz-signature"],
+                         presigner.Presigner(CREDS, "us-east-1", 60, NOW).sign(
+                             form["fields"]["policy"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
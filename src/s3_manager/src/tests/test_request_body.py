@@ -0,0 +1,69 @@
+import base64
+import json
+import unittest
+
+import request_body
+
+
+class TestRequestBody(unittest.TestCase):
+    def test_json_and_legacy_bodies(self):
+        body = request_body.decode_body({"body": '{"key": "o1", "value": "it\'s here"}'})
+        self.assertEqual(body, {"object_key": "o1", "object_value": b"it's here"})
+        legacy = request_body.decode_body(
+            {"body": "{'key': 'o1', 'value': \"it's here\"}"})
+        self.assertEqual(legacy, body)
+        self.assertEqual(request_body.decode_body({"body": None}), {})
+        with self.assertRaises(request_body.InvalidBodyError):
+            request_body.decode_body({"body": "{not json"})
+
+
+    def test_batch_items(self):
+        body = request_body.decode_body({"body": json.dumps({"items": [
+            {"key": "a", "value": "A"},
+            {"key": "b", "value": "AAE=", "encoding": "base64"}]})})
+        self.assertEqual(body["objects"], [{"object_key": "a", "object_value": b"A"},
+                                           {"object_key": "b", "object_value": b"\x00\x01"}])
+        for items in ([], [{"key": "a"}, {"key": "a"}], [{"value": "no key"}]):
+            with self.assertRaises(request_body.InvalidBodyError):
+                request_body.decode_body({"body": json.dumps({"items": items})})
+
+
+    def test_binary_bodies(self):
+        payload = bytes(range(256))
+        encoded = base64.b64encode(payload).decode("ascii")
+        raw = request_body.decode_body({
+            "body": encoded,
+            "isBase64Encoded": True,
+            "headers": {"Content-Type": "application/octet-stream"},
+            "queryStringParameters": {"partition": "bucket", "key": "bin1"}})
+        self.assertEqual(raw, {"object_key": "bin1", "object_value": payload})
+        wrapped = request_body.decode_body({
+            "body": '{{"key": "bin1", "value": "{0}", "encoding": "base64"}}'.format(encoded)})
+        self.assertEqual(wrapped, raw)
+        with self.assertRaises(request_body.InvalidBodyError):
+            request_body.decode_body({"body": "abc", "headers": {"content-type": "text/plain"}})
+
+
+
+    def test_multipart_files_are_views_of_the_body(self):
+        body = (b'--b1\r\nContent-Disposition: form-data; name="note"\r\n\r\nhi\r\n'
+                b'--b1\r\nContent-Disposition: form-data; name="f"; filename="C:\\tmp\\a.bin"\r\n'
+                b'\r\n\x00\r\n--b\r\n--b1\r\nContent-Disposition: form-data; name="f"; '
+                b'filename="b.txt"\r\nContent-Type: text/plain\r\n\r\nB\r\n--b1--\r\n')
+        decoded = request_body.decode_body({
+            "body": base64.b64encode(body).decode("ascii"),
+            "isBase64Encoded": True,
+            "headers": {"Content-Type": 'multipart/form-data; boundary="b1"'}})
+        objects = decoded["objects"]
+        self.assertEqual([obj["object_key"] for obj in objects], ["a.bin", "b.txt"])
+        self.assertEqual(objects[0]["object_value"].read(), b"\x00\r\n--b")
+        objects[0]["object_value"].seek(0)
+        self.assertEqual(objects[0]["object_value"].read(2), b"\x00\r")
+        self.assertEqual(objects[1]["object_value"].read(), b"B")
+        with self.assertRaises(request_body.InvalidBodyError):
+            request_body.decode_body({"body": body.decode("latin-1").replace("b1--", "b1"),
+                                      "headers": {"content-type": "multipart/form-data; boundary=b1"}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import base64
+import gzip
+import json
+import unittest
+import zlib
+from http import HTTPStatus
+
+import helper
+import response_body
+
+
+class TestResponseBody(unittest.TestCase):
+    def test_projection_and_json(self):
+        api_put_resp = {"ResponseMetadata": {"HTTPStatusCode": 200, "HTTPHeaders": {}},
+                        "ETag": '"abc"', "ServerSideEncryption": "AES256"}
+        response = helper.success_response(helper.put_result(api_put_resp))
+        self.assertEqual(json.loads(response["body"]),
+                         {"status": "Created", "result": {"ETag": '"abc"'}})
+        self.assertEqual(json.loads(response_body.dumps({"big": 1 << 70})), {"big": 1 << 70})
+
+
+    def test_content_coding(self):
+        self.assertEqual(response_body.get_content_coding("gzip, deflate, br"), "gzip")
+        self.assertEqual(response_body.get_content_coding("gzip;q=0, deflate;q=0.5"),
+                         "deflate")
+        self.assertEqual(response_body.get_content_coding("*;q=0.1"), "gzip")
+        self.assertIsNone(response_body.get_content_coding("br, identity"))
+        self.assertIsNone(response_body.get_content_coding(None))
+
+
+    def test_compressed_listing(self):
+        names = ["object-{0:05d}.txt".format(index) for index in range(1000)]
+        response = helper.success_response(names, HTTPStatus.OK)
+        response["headers"]["ETag"] = '"abc"'
+        body = response["body"]
+        event = {"headers": {"Accept-Encoding": "gzip"}}
+        encoded = response_body.encode(response, event)
+        self.assertTrue(encoded["isBase64Encoded"])
+        self.assertEqual(encoded["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(encoded["headers"]["ETag"], 'W/"abc"')
+        self.assertEqual(gzip.decompress(base64.b64decode(encoded["body"])).decode("utf-8"),
+                         body)
+
+        response = response_body.encode(helper.success_response(names, HTTPStatus.OK),
+                                         {"headers": {"accept-encoding": "deflate"}})
+        self.assertEqual(zlib.decompress(base64.b64decode(response["body"])).decode("utf-8"),
+                         body)
+        small = response_body.encode(helper.success_response(["a.txt"], HTTPStatus.OK), event)
+        self.assertNotIn("Content-Encoding", small["headers"])
+
+
+if __name__ == "__main__":
+    unittest.main()
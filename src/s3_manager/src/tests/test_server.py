@@ -0,0 +1,70 @@
+import base64
+import io
+import json
+import unittest
+from http import HTTPStatus
+from wsgiref.util import setup_testing_defaults
+
+import helper
+import server
+
+
+def make_environ(method, path, query="", body=b"", headers=None):
+    environ = {"REQUEST_METHOD": method, "PATH_INFO": path, "QUERY_STRING": query,
+               "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body)}
+    for name, value in (headers or {}).items():
+        if name.lower() == "content-type":
+            environ["CONTENT_TYPE"] = value
+        else:
+            environ["HTTP_" + name.upper().replace("-", "_")] = value
+    setup_testing_defaults(environ)
+    return environ
+
+
+class TestServer(unittest.TestCase):
+    def test_event_matches_api_gateway_shape(self):
+        event = server.get_event(make_environ(
+            "PUT", "/object", "partition=bucket&key=a&key=b.bin", b"\xff\x00",
+            {"X-Token": "t", "Content-Type": "application/octet-stream"}))
+        self.assertEqual(event["httpMethod"], "PUT")
+        self.assertEqual(event["headers"]["x-token"], "t")
+        self.assertEqual(event["queryStringParameters"], {"partition": "bucket", "key": "b.bin"})
+        self.assertEqual(event["multiValueQueryStringParameters"]["key"], ["a", "b.bin"])
+        self.assertTrue(event["isBase64Encoded"])
+        self.assertEqual(base64.b64decode(event["body"]), b"\xff\x00")
+
+        event = server.get_event(make_environ("PUT", "/object", body=b'{"key": "a"}',
+                                              headers={"Content-Type": "application/json"}))
+        self.assertEqual(event["body"], '{"key": "a"}')
+        self.assertFalse(event["isBase64Encoded"])
+        self.assertIsNone(server.get_event(make_environ("GET", "/object"))["queryStringParameters"])
+
+
+    def test_responses(self):
+        started = []
+
+        def start_response(status, headers):
+            started.append((status, dict(headers)))
+
+        body = b"".join(server.application(make_environ("GET", "/health"), start_response))
+        self.assertEqual(started[-1][0], "200 OK")
+        self.assertEqual(started[-1][1]["Access-Control-Allow-Credentials"], "true")
+        self.assertIn("sessions", json.loads(body)["result"])
+
+        server.application(make_environ("DELETE", "/object"), start_response)
+        self.assertEqual(started[-1][0], "405 Method Not Allowed")
+        server.application(make_environ("GET", "/missing"), start_response)
+        self.assertEqual(started[-1][0], "404 Not Found")
+
+        with self.assertRaises(ValueError):
+            server.check_processes(2)
+        server.check_processes(1)
+
+        body = b"".join(server.write_response(
+            helper.binary_response(b"\x00\x01", HTTPStatus.PARTIAL_CONTENT), start_response))
+        self.assertEqual(body, b"\x00\x01")
+        self.assertEqual(started[-1][1]["Content-Length"], "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import datetime
+import unittest
+
+from session_cache import SessionCache
+
+
+def make_assume_role(calls, lifetime):
+    def assume_role(policy):
+        calls.append(policy)
+        return {"AccessKeyId": "AKIA{0}".format(len(calls)), "SecretAccessKey": "s",
+                "SessionToken": "t",
+                "Expiration": datetime.datetime.now(datetime.timezone.utc) +
+                datetime.timedelta(seconds=lifetime)}
+    return assume_role
+
+
+class TestSessionCache(unittest.TestCase):
+    def test_credentials_and_clients(self):
+        cache = SessionCache(max_entries=2, min_lifetime=900)
+        calls = []
+        assume_role = make_assume_role(calls, 3600)
+        policy_a = {"Statement": [{"Resource": "arn:aws:s3:::bucket/TenantA/*"}]}
+        policy_b = {"Statement": [{"Resource": "arn:aws:s3:::bucket/TenantB/*"}]}
+
+        creds_a = cache.get_credentials(policy_a, assume_role)
+        self.assertIs(cache.get_credentials(dict(policy_a), assume_role), creds_a)
+        self.assertIsNot(cache.get_credentials(policy_b, assume_role), creds_a)
+        self.assertEqual(len(calls), 2)
+
+        client = cache.get_client("s3", creds_a, object)
+        self.assertIs(cache.get_client("s3", creds_a, object), client)
+        self.assertIsNot(cache.get_client("dynamodb", creds_a, object), client)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["client_hits"]), (1, 2, 1))
+
+
+    def test_expiring_credentials_are_refreshed(self):
+        cache = SessionCache(max_entries=8, min_lifetime=900)
+        calls = []
+        assume_role = make_assume_role(calls, 600)
+        policy = {"Statement": []}
+        first = cache.get_credentials(policy, assume_role)
+        self.assertIsNot(cache.get_credentials(policy, assume_role), first)
+        self.assertEqual(cache.stats()["refreshes"], 1)
+
+        disabled = SessionCache(max_entries=0, min_lifetime=900)
+        disabled.get_credentials(policy, assume_role)
+        disabled.get_credentials(policy, assume_role)
+        self.assertEqual(len(calls), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import sys
+import unittest
+import zlib
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import response_body
+import streaming
+from local_s3 import LocalS3
+
+BUCKET = "aws-saas-s3-prefix"
+PREFIX = "tenanta/user1"
+
+
+def load_bucket(count):
+    s3_client = LocalS3(page_size=100)
+    keys = ["{0}/object-{1:05d}.txt".format(PREFIX, index) for index in range(count)]
+    s3_client.load(BUCKET, [(key, b"") for key in keys])
+    return s3_client, [key.rsplit("/", 1)[-1] for key in keys]
+
+
+class TestStreaming(unittest.TestCase):
+    def test_ndjson_and_json_formats(self):
+        s3_client, names = load_bucket(250)
+        response = streaming.listing_response(streaming.s3_pages(s3_client, BUCKET, PREFIX),
+                                              streaming.object_names, streaming.STREAM_NDJSON)
+        self.assertEqual(response["headers"]["Content-Type"], "application/x-ndjson")
+        # Only the first page is listed before the body is consumed
+        self.assertEqual(s3_client.requests["list_objects_v2"], 1)
+        chunks = list(response["body"])
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual([json.loads(line) for line in b"".join(chunks).splitlines()], names)
+
+        response = streaming.buffer(streaming.listing_response(
+            streaming.s3_pages(s3_client, BUCKET, PREFIX), streaming.object_names,
+            streaming.STREAM_JSON))
+        self.assertEqual(json.loads(response["body"]), {"status": "OK", "result": names})
+
+
+    def test_empty_and_failing_listings(self):
+        s3_client, _ = load_bucket(0)
+        response = streaming.listing_response(streaming.s3_pages(s3_client, BUCKET, PREFIX),
+                                              streaming.object_names, streaming.STREAM_JSON)
+        self.assertEqual(response["statusCode"], 503)
+
+        def pages():
+            yield [{"Key": PREFIX + "/a.txt"}]
+            raise RuntimeError("page failed")
+
+        response = streaming.buffer(streaming.listing_response(
+            pages(), streaming.object_names, streaming.STREAM_JSON))
+        body = json.loads(response["body"])
+        self.assertEqual(body["result"], ["a.txt"])
+        self.assertIn("page failed", body["error"])
+
+
+    def test_compressed_stream(self):
+        s3_client, names = load_bucket(250)
+        response = response_body.encode(
+            streaming.listing_response(streaming.s3_pages(s3_client, BUCKET, PREFIX),
+                                       streaming.object_names, streaming.STREAM_NDJSON),
+            {"headers": {"Accept-Encoding": "gzip"}})
+        self.assertEqual(response["headers"]["Content-Encoding"], "gzip")
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        lines = []
+        for chunk in response["body"]:
+            # Every chunk decodes on its own as soon as it arrives
+            lines.extend(decompressor.decompress(chunk).splitlines())
+        self.assertEqual([json.loads(line) for line in lines], names)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import sys
+import unittest
+from http import HTTPStatus
+from os.path import abspath, dirname, join
+from unittest import mock
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import apis
+import async_pipeline
+import constants
+import helper
+import token_manager
+from local_s3 import LocalS3
+
+ENVIRON = {"AWS_ACCOUNT_ID": "123456789012", "AWS_REGION": "us-east-1"}
+BUCKET = "aws-saas-s3-prefix-123456789012"
+CREDS = {"AccessKeyId": "AKIA1", "SecretAccessKey": "s", "SessionToken": "t"}
+
+
+def make_event(token):
+    return {"headers": {"x-token": token},
+            "queryStringParameters": {"partition": "prefix"}}
+
+
+class TestTenantListing(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, ENVIRON)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.s3_client = LocalS3()
+        self.s3_client.load(BUCKET, [("TenantA/user1/a.txt", b"x"),
+                                     ("TenantA/user1/b.txt", b"x"),
+                                     ("TenantA/user2/c.txt", b"x"),
+                                     ("TenantB/user3/d.txt", b"x")])
+        self.previous = async_pipeline.set_client_factory(None)
+
+
+    def tearDown(self):
+        async_pipeline.set_client_factory(self.previous)
+
+
+    def test_merges_listing_of_each_user(self):
+        listing = helper.get_tenant_listing(self.s3_client, BUCKET, "TenantA/")
+        self.assertEqual(listing, {"user1": ["a.txt", "b.txt"], "user2": ["c.txt"]})
+
+        listing = helper.get_tenant_listing(self.s3_client, BUCKET, "TenantA/",
+                                            list_user=lambda prefix: [prefix])
+        self.assertEqual(listing, {"user1": ["TenantA/user1/"],
+                                   "user2": ["TenantA/user2/"]})
+
+
+    def test_tenant_admin_role_required(self):
+        with mock.patch.object(helper, "get_assumed_role_creds",
+                               return_value=CREDS) as assume_role, \
+                mock.patch.object(helper, "get_boto3_client",
+                                  return_value=self.s3_client):
+            response = apis.get_tenant_object(
+                make_event(token_manager.vend("TenantA", "user1")), {})
+            self.assertEqual(response["statusCode"], HTTPStatus.FORBIDDEN)
+            assume_role.assert_not_called()
+
+            response = apis.get_tenant_object(make_event(token_manager.vend(
+                "TenantA", "user1", role=constants.ROLE_TENANT_ADMIN)), {})
+            self.assertEqual(response["statusCode"], HTTPStatus.OK)
+            self.assertEqual(json.loads(response["body"])["result"],
+                             {"user1": ["a.txt", "b.txt"], "user2": ["c.txt"]})
+
+            # The session is scoped to the tenant prefix, not to the user
+            policy = json.dumps(assume_role.call_args[0][1])
+            self.assertIn("TenantA/*", policy)
+            self.assertNotIn("TenantA/user1", policy)
+
+
+if __name__ == "__main__":
+    unittest.main()
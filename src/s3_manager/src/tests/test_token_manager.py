@@ -0,0 +1,239 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import helper
+import hs256
+import packages.jwt as jwt
+from packages.jwt import algorithms as jwt_algorithms
+import token_keyset
+import token_manager
+import token_revocation
+
+
+class RevocationTable(object):
+    """
+    In-memory stand-in of the DynamoDB revocation table
+    """
+    def __init__(self):
+        self.items = {}
+        self.scans = 0
+
+    def get_item(self, Key, **kwargs):
+        item = self.items.get(Key["token_hash"]["S"])
+        return {"Item": item} if item is not None else {}
+
+    def get_paginator(self, operation_name):
+        return self
+
+    def paginate(self, **kwargs):
+        self.scans += 1
+        yield {"Items": [{"token_hash": item["token_hash"]} for item in self.items.values()]}
+
+    def revoke(self, token, version):
+        digest = token_revocation.token_digest(token)
+        self.items[digest] = {"token_hash": {"S": digest}}
+        self.items["version"] = {"token_hash": {"S": "version"},
+                                 "version": {"N": str(version)}}
+
+
+class TestTokenManager(unittest.TestCase):
+    def setUp(self):
+        token_manager._TOKEN_CACHE = token_manager.TokenCache(2)
+
+
+    def test_repeat_token_is_served_from_cache(self):
+        token = token_manager.vend("TenantA", "user1", role="tenant_admin")
+        first = token_manager.get_header({token_manager.X_TOKEN: token})
+        second = token_manager.get_header({token_manager.X_TOKEN: token})
+        self.assertEqual(first, second)
+        self.assertEqual(second["role"], "tenant_admin")
+        self.assertEqual(token_manager.token_cache_stats()["hits"], 1)
+
+
+    def test_role_not_taken_from_headers(self):
+        header = token_manager.get_header({token_manager.X_TENANT_ID: "TenantA",
+                                           token_manager.X_USER_ID: "user1",
+                                           "x-user-role": "tenant_admin"})
+        self.assertIsNone(header["role"])
+        header = token_manager.get_header({token_manager.X_TOKEN: header["token"]})
+        self.assertIsNone(header["role"])
+
+
+    def test_cached_token_not_trusted_under_other_key(self):
+        token = token_manager.vend("TenantA", "user1")
+        token_manager.get_header({token_manager.X_TOKEN: token})
+        with self.assertRaises(jwt.InvalidSignatureError):
+            token_manager.get_header({token_manager.X_TOKEN: token}, "other-key")
+
+
+    def test_expired_claims_are_evicted(self):
+        cache = token_manager.TokenCache(2)
+        cache.put("token", "aws-saas-factory", {"user_id": "user1",
+                                                "exp": time.time() - 1})
+        self.assertIsNone(cache.get("token", "aws-saas-factory"))
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 1,
+                                         "expirations": 1, "entries": 0})
+
+
+    def test_fast_path_matches_pyjwt(self):
+        token = token_manager.vend("TenantA", "user1")
+        self.assertEqual(hs256.decode(token, "aws-saas-factory"),
+                         jwt.decode(token, "aws-saas-factory", algorithms=["HS256"]))
+        self.assertIsNone(hs256.decode(token[:-2] + "AA", "aws-saas-factory"))
+        with self.assertRaises(jwt.InvalidSignatureError):
+            token_manager.get_decoded_token(token[:-2] + "AA")
+
+
+    def test_vend_matches_pyjwt(self):
+        payload = token_manager.get_payload("TenantA", "user1", "tenant_admin",
+                                            expires_in=60, issued_at=1600000000)
+        self.assertEqual(payload["exp"], 1600000060)
+        self.assertEqual(token_manager.vend_payload(payload, "aws-saas-factory"),
+                         jwt.encode(payload, "aws-saas-factory",
+                                    algorithm="HS256").decode("utf-8"))
+
+
+    def test_vend_batch(self):
+        users = [{"tenant_id": "TenantA", "user_id": "user1"},
+                 {"tenant_id": "TenantB", "user_id": "admin1", "role": "tenant_admin"}]
+        tokens = token_manager.vend_batch(users, expires_in=60)
+        claims = [token_manager.get_decoded_token(token) for token in tokens]
+        self.assertEqual([claim["user_id"] for claim in claims], ["user1", "admin1"])
+        self.assertEqual(claims[1]["role"], "tenant_admin")
+        self.assertEqual(claims[0]["exp"] - claims[0]["iat"], 60)
+
+        # The batch endpoint does not vend roles from the request body
+        response = helper.get_tokens({"body": json.dumps({"users": users})}, None)
+        tokens = json.loads(response["body"])["result"]["tokens"]
+        self.assertNotIn("role", token_manager.get_decoded_token(tokens[1]["token"]))
+        for expires_in in (0, -60, "60", [60], {"s": 60}, True, 10 ** 9):
+            response = helper.get_tokens({"body": json.dumps(
+                {"users": users, "expires_in": expires_in})}, None)
+            self.assertEqual(response["statusCode"], 400)
+
+
+    def test_keyset_rotation(self):
+        old = token_manager.vend("TenantA", "user1")
+        keyset = token_keyset.Keyset.from_json(json.dumps({
+            "active": "2021-06", "default": "legacy",
+            "keys": [{"kid": "2021-06", "secret": "new-secret"},
+                     {"kid": "legacy", "secret": "aws-saas-factory"}]}))
+        token = keyset.sign({"tenant_id": "TenantA", "user_id": "user1"})
+        self.assertEqual(jwt.get_unverified_header(token)["kid"], "2021-06")
+        self.assertEqual(keyset.decode(token)["user_id"], "user1")
+        self.assertEqual(keyset.decode(old)["user_id"], "user1")
+        forged = jwt.encode({"user_id": "user1"}, "new-secret", algorithm="HS256",
+                            headers={"kid": "unknown"}).decode("utf-8")
+        with self.assertRaises(jwt.InvalidTokenError):
+            keyset.decode(forged)
+
+
+    def test_keyset_keys_are_keyed_once(self):
+        keyset = token_keyset.Keyset.from_json(json.dumps({
+            "active": "k0", "keys": [{"kid": "k{0}".format(index), "secret": str(index)}
+                                     for index in range(40)]}))
+        tokens = [hs256.encode({"user_id": "user1"}, str(index),
+                               hs256.header_segment("k{0}".format(index)))
+                  for index in range(40)]
+        with mock.patch.object(hs256, "get_hmac_state") as get_hmac_state:
+            for token in tokens * 2:
+                self.assertEqual(keyset.decode(token)["user_id"], "user1")
+            get_hmac_state.assert_not_called()
+
+
+    def test_keyset_file_refresh(self):
+        keyset_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        json.dump({"active": "k1", "keys": [{"kid": "k1", "secret": "one"}]}, keyset_file)
+        keyset_file.close()
+        environ = {"TOKEN_KEYSET_FILE": keyset_file.name, "TOKEN_KEYSET_REFRESH": "0"}
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.dict(token_keyset._STATE, {"keyset": None, "source": None,
+                                                     "check_after": float("-inf")}):
+            token = token_manager.vend("TenantA", "user1")
+            self.assertEqual(token_manager.get_header({token_manager.X_TOKEN: token})
+                             ["user_id"], "user1")
+            with open(keyset_file.name, "w") as rotated:
+                json.dump({"active": "k2", "keys": [{"kid": "k2", "secret": "two"}]},
+                          rotated)
+            os.utime(keyset_file.name, ns=(0, time.time_ns() + 10 ** 9))
+            with self.assertRaises(jwt.InvalidTokenError):
+                token_manager.get_header({token_manager.X_TOKEN: token})
+        os.remove(keyset_file.name)
+
+
+    @unittest.skipUnless(jwt_algorithms.has_crypto, "requires cryptography")
+    def test_keyset_rs256_public_key(self):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo).decode("utf-8")
+        keyset = token_keyset.Keyset.from_json(json.dumps({
+            "active": "hs", "keys": [{"kid": "hs", "secret": "secret"},
+                                     {"kid": "idp", "alg": "RS256", "public_key": public_pem}]}))
+        token = jwt.encode({"user_id": "user1"}, private_key, algorithm="RS256",
+                           headers={"kid": "idp"}).decode("utf-8")
+        self.assertEqual(keyset.decode(token)["user_id"], "user1")
+
+
+    def test_algorithms_are_created_on_first_use(self):
+        registry = jwt_algorithms.get_default_algorithms()
+        self.assertIn("HS256", registry)
+        self.assertEqual(registry._entries, {})
+        self.assertIsInstance(registry["HS256"], jwt_algorithms.HMACAlgorithm)
+        self.assertEqual(list(registry._entries), ["HS256"])
+
+
+    def test_revoked_token_is_rejected_after_cache_hit(self):
+        token = token_manager.vend("TenantA", "user1")
+        other = token_manager.vend("TenantA", "user2")
+        token_manager.get_header({token_manager.X_TOKEN: token})
+        revocation_file = tempfile.NamedTemporaryFile("w", delete=False)
+        revocation_file.write(token_revocation.token_digest(token) + "\n")
+        revocation_file.close()
+        environ = {"TOKEN_REVOCATION_FILE": revocation_file.name}
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.dict(token_revocation._STATE, {"revocations": None, "source": None,
+                                                          "check_after": float("-inf")}):
+            with self.assertRaises(token_revocation.TokenRevokedError):
+                token_manager.get_header({token_manager.X_TOKEN: token})
+            self.assertEqual(token_manager.get_header({token_manager.X_TOKEN: other})
+                             ["user_id"], "user2")
+            stats = token_revocation.stats()
+            self.assertEqual((stats["checks"], stats["revoked"]), (2, 1))
+        os.remove(revocation_file.name)
+
+
+    def test_revocation_table_scanned_when_version_changes(self):
+        table = RevocationTable()
+        table.revoke("token-1", 1)
+        environ = {"TOKEN_REVOCATION_TABLE": "revocations", "TOKEN_REVOCATION_REFRESH": "0"}
+        with mock.patch.dict(os.environ, environ), \
+                mock.patch.dict(token_revocation._STATE, {"revocations": None, "source": None,
+                                                          "check_after": float("-inf"),
+                                                          "dynamodb": table}):
+            with self.assertRaises(token_revocation.TokenRevokedError):
+                token_revocation.check("token-1")
+            token_revocation.check("token-2")
+            self.assertEqual(table.scans, 1)
+
+            table.revoke("token-2", 2)
+            with self.assertRaises(token_revocation.TokenRevokedError):
+                token_revocation.check("token-2")
+            self.assertEqual(table.scans, 2)
+
+            # Without a version item every refresh scans
+            del table.items["version"]
+            token_revocation.check("token-3")
+            token_revocation.check("token-3")
+            self.assertEqual(table.scans, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import base64
+import sys
+import unittest
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(dirname(dirname(dirname(abspath(__file__))))),
+                        "benchmarks"))
+
+import botocore
+
+import upload_engine
+from local_s3 import LocalS3
+
+ACCESS_POINT = "arn:aws:s3:us-east-1:123456789012:accesspoint/tenanta"
+BODY = bytes(index % 251 for index in range(1000))
+
+
+class TestUploadEngine(unittest.TestCase):
+    def test_single_and_multipart(self):
+        s3_client = LocalS3()
+        upload_engine.upload_object(s3_client, ACCESS_POINT, "small", BODY[:100],
+                                    threshold=100)
+        upload_engine.upload_object(s3_client, ACCESS_POINT, "large", BODY,
+                                    tagging="tenant_id=TenantA", threshold=100,
+                                    part_size=300, max_workers=2)
+        self.assertEqual(s3_client.get_object(Bucket=ACCESS_POINT, Key="small")["Body"].read(),
+                         BODY[:100])
+        self.assertEqual(s3_client.get_object(Bucket=ACCESS_POINT, Key="large")["Body"].read(),
+                         BODY)
+        self.assertEqual(s3_client.requests["put_object"], 1)
+        self.assertEqual(s3_client.requests["upload_part"], 4)
+
+
+    def test_retry_and_abort(self):
+        s3_client = LocalS3(fail_parts=[2])
+        reader = upload_engine.Base64Reader(base64.b64encode(BODY).decode("ascii"))
+        upload_engine.upload_object(s3_client, "bucket", "retried", reader, threshold=100,
+                                    part_size=256, retries=1)
+        self.assertEqual(s3_client.get_object(Bucket="bucket", Key="retried")["Body"].read(),
+                         BODY)
+        self.assertEqual(s3_client.requests["upload_part"], 5)
+
+        s3_client = LocalS3(fail_parts=[3])
+        with self.assertRaises(botocore.exceptions.ClientError):
+            upload_engine.upload_object(s3_client, "bucket", "failed", BODY, threshold=100,
+                                        part_size=256, retries=0)
+        self.assertEqual(len(s3_client.aborted), 1)
+        self.assertEqual(s3_client.requests["complete_multipart_upload"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Upload engine behind put_object. Bodies up to UPLOAD_MULTIPART_THRESHOLD
+are stored with one PutObject; larger or unsized bodies with a multipart
+upload whose parts are read one at a time from the source and uploaded
+concurrently. At most max_workers + 1 parts are held in memory (parts of
+an in-memory body are views of it, not copies), a failed part is retried
+UPLOAD_PART_RETRIES times, and a failed upload is aborted so that no
+orphaned parts are billed. Buckets may be access point ARNs.
+"""
+
+import binascii
+import io
+import logging
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import botocore
+
+import constants
+from multipart import PartReader
+
+# S3 limits of a multipart upload
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+RETRYABLE_ERRORS = ("InternalError", "RequestTimeout", "ServiceUnavailable", "SlowDown",
+                    "500", "503")
+BASE64_TEXT = re.compile(r"[A-Za-z0-9+/]*={0,2}")
+DECODE_CHUNK = 3 * 256 * 1024
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Base64Reader(io.RawIOBase):
+    """
+    File object that decodes a base64 str as it is read, so a large
+    request body is never held decoded in full
+        :param text: base64 str without line breaks
+    """
+    def __init__(self, text):
+        super(Base64Reader, self).__init__()
+        if len(text) % 4 or not BASE64_TEXT.fullmatch(text):
+            raise ValueError("body is not valid base64")
+        self._text = text
+        self._position = 0
+        self._pending = b""
+        self._read = 0
+        self._size = len(text) // 4 * 3 - (len(text) - len(text.rstrip("=")))
+
+    def __len__(self):
+        return self._size
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._read
+
+    def readall(self):
+        buffer = bytearray(self._size - self._read)
+        return bytes(buffer[:self.readinto(buffer)])
+
+    def readinto(self, buffer):
+        # Decodes DECODE_CHUNK bytes at a time straight into the buffer
+        view = memoryview(buffer).cast("B")
+        filled = len(self._pending[:len(view)])
+        view[:filled] = self._pending[:filled]
+        self._pending = self._pending[filled:]
+        while filled < len(view) and self._position < len(self._text):
+            chars = (min(len(view) - filled, DECODE_CHUNK) + 2) // 3 * 4
+            data = binascii.a2b_base64(self._text[self._position:self._position + chars])
+            self._position += chars
+            count = min(len(data), len(view) - filled)
+            view[filled:filled + count] = data[:count]
+            self._pending = data[count:]
+            filled += count
+        self._read += filled
+        return filled
+
+
+def get_settings():
+    """
+    Returns (threshold, part size, retries, workers) from the environment
+    """
+    return (int(os.environ.get("UPLOAD_MULTIPART_THRESHOLD",
+                               constants.UPLOAD_MULTIPART_THRESHOLD)),
+            max(int(os.environ.get("UPLOAD_PART_SIZE", constants.UPLOAD_PART_SIZE)),
+                MIN_PART_SIZE),
+            int(os.environ.get("UPLOAD_PART_RETRIES", constants.UPLOAD_PART_RETRIES)),
+            int(os.environ.get("UPLOAD_MAX_WORKERS", constants.UPLOAD_MAX_WORKERS)))
+
+
+def get_size(body):
+    """
+    Returns the number of bytes left in body, or None when unknown
+        :param body: bytes-like or file object
+    """
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        return memoryview(body).nbytes
+    if hasattr(body, "__len__"):
+        return len(body) - (body.tell() if hasattr(body, "tell") else 0)
+    if hasattr(body, "seekable") and body.seekable():
+        position = body.tell()
+        size = body.seek(0, io.SEEK_END) - position
+        body.seek(position)
+        return size
+    return None
+
+
+def upload_object(s3_client, bucket_name, key_name, body, tagging=None,
+                  threshold=None, part_size=None, max_workers=None, retries=None):
+    """
+    Stores body as one object and returns the PutObject or
+    CompleteMultipartUpload response
+        :param s3_client:
+        :param bucket_name: bucket name or access point ARN
+        :param key_name:
+        :param body: bytes-like or readable file object
+        :param tagging=None: URL-encoded tag set, e.g. tenant_id=a&user_id=b
+        :param threshold=None: largest body stored with one PutObject
+        :param part_size=None:
+        :param max_workers=None: concurrent part uploads
+        :param retries=None: attempts per part after the first
+    """
+    settings = get_settings()
+    threshold = settings[0] if threshold is None else threshold
+    part_size = part_size or settings[1]
+    retries = settings[2] if retries is None else retries
+    max_workers = max_workers or settings[3]
+    extra_args = {"Tagging": tagging} if tagging else {}
+
+    size = get_size(body)
+    if size is not None and size <= threshold:
+        return s3_client.put_object(Bucket=bucket_name, Key=key_name,
+                                    Body=as_payload(body), **extra_args)
+    if size is not None:
+        part_size = max(part_size, int(math.ceil(size / MAX_PARTS)))
+
+    parts = iter_parts(body, part_size)
+    first_part = next(parts, b"")
+    if len(first_part) < part_size:
+        # An unsized body that fits in one part
+        return s3_client.put_object(Bucket=bucket_name, Key=key_name,
+                                    Body=as_payload(first_part), **extra_args)
+
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket_name, Key=key_name,
+                                                  **extra_args)["UploadId"]
+    try:
+        etags = upload_parts(s3_client, bucket_name, key_name, upload_id,
+                             chain_first(first_part, parts), max_workers, retries)
+        return s3_client.complete_multipart_upload(
+            Bucket=bucket_name, Key=key_name, UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": number, "ETag": etags[number]}
+                                       for number in sorted(etags)]})
+    except BaseException:
+        try:
+            s3_client.abort_multipart_upload(Bucket=bucket_name, Key=key_name,
+                                             UploadId=upload_id)
+        except Exception as ex:
+            LOGGER.error("Abort of upload %s failed: %s", upload_id, ex)
+        raise
+
+
+def upload_parts(s3_client, bucket_name, key_name, upload_id, parts, max_workers, retries):
+    """
+    Uploads parts concurrently and returns {part number: ETag}. Reading
+    the next part waits for a free buffer, bounding memory to
+    max_workers + 1 parts; the first failed part stops the upload
+        :param s3_client:
+        :param bucket_name:
+        :param key_name:
+        :param upload_id:
+        :param parts: iterable of bytes-like parts
+        :param max_workers:
+        :param retries:
+    """
+    buffers = threading.BoundedSemaphore(max_workers + 1)
+    failed = threading.Event()
+    etags = {}
+
+    def upload_part(number, payload):
+        try:
+            for attempt in range(retries + 1):
+                if failed.is_set():
+                    return
+                try:
+                    payload.seek(0)
+                    api_part_resp = s3_client.upload_part(
+                        Bucket=bucket_name, Key=key_name, UploadId=upload_id,
+                        PartNumber=number, Body=payload)
+                    etags[number] = api_part_resp["ETag"]
+                    return
+                except (botocore.exceptions.ClientError,
+                        botocore.exceptions.BotoCoreError) as ex:
+                    if attempt == retries or not is_retryable(ex):
+                        failed.set()
+                        raise
+                    time.sleep(min(0.1 * 2 ** attempt, 2.0))
+        finally:
+            buffers.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        try:
+            for number, part in enumerate(parts, 1):
+                buffers.acquire()
+                if failed.is_set():
+                    buffers.release()
+                    break
+                futures.append(executor.submit(upload_part, number, as_payload(part)))
+        except BaseException:
+            # The source failed; stop the parts that have not started
+            failed.set()
+            raise
+        for future in futures:
+            future.result()
+    return etags
+
+
+def iter_parts(body, part_size):
+    """
+    Yields the parts of body: views of a bytes-like or in-memory body,
+    part-sized buffers filled from a file object
+        :param body:
+        :param part_size:
+    """
+    if hasattr(body, "getbuffer"):
+        # BytesIO and multipart.PartReader expose their memory
+        body = body.getbuffer()[body.tell():]
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        view = memoryview(body).cast("B")
+        for start in range(0, len(view), part_size):
+            yield view[start:start + part_size]
+        return
+
+    while True:
+        buffer = bytearray(part_size)
+        count = read_full(body, buffer)
+        if not count:
+            return
+        yield memoryview(buffer)[:count]
+        if count < part_size:
+            return
+
+
+def read_full(stream, buffer):
+    """
+    Fills buffer from the stream unless it ends first; returns the count
+        :param stream:
+        :param buffer: bytearray
+    """
+    view = memoryview(buffer)
+    filled = 0
+    while filled < len(view):
+        if hasattr(stream, "readinto"):
+            count = stream.readinto(view[filled:])
+        else:
+            chunk = stream.read(len(view) - filled)
+            count = len(chunk)
+            view[filled:filled + count] = chunk
+        if not count:
+            break
+        filled += count
+    return filled
+
+
+def chain_first(first, rest):
+    """
+    Yields first, then the items of rest
+    """
+    yield first
+    for part in rest:
+        yield part
+
+
+def as_payload(part):
+    """
+    Returns a seekable file object over a bytes-like part, without a copy
+        :param part:
+    """
+    if isinstance(part, (bytes, bytearray, memoryview)):
+        return PartReader(memoryview(part))
+    return part
+
+
+def is_retryable(ex):
+    """
+    Returns True for throttling, server and connection errors
+        :param ex:
+    """
+    if isinstance(ex, botocore.exceptions.ClientError):
+        return ex.response.get("Error", {}).get("Code") in RETRYABLE_ERRORS
+    return True